@@ -4,6 +4,9 @@ Components module - Integration layer between modules and app
 
 from typing import List, Dict, Any
 from fastapi import FastAPI
+from utils.loader import init_loader_context, validate_module_resources
+from utils.ratelimit import RateLimitMiddleware, collect_policies
+import config
 
 
 def validate_routes(components: List[Dict[str, Any]]) -> bool:
@@ -29,17 +32,61 @@ def validate_routes(components: List[Dict[str, Any]]) -> bool:
     return True
 
 
+def validate_resources(components: List[Dict[str, Any]]) -> bool:
+    """
+    Validate the resource tree of every component's module against the project root.
+    
+    Running this once at startup surfaces symlinks that escape the project and
+    warms the loader's path cache for request-time template and static lookups.
+    
+    Parameters:
+        components (List[Dict[str, Any]]): Component metadata dictionaries; each component's 'name' key names its module.
+    
+    Returns:
+        True if every module's resources resolve inside the project root.
+    
+    Raises:
+        ValueError: If a module contains a path that resolves outside the project root.
+    """
+    for comp in components:
+        if 'name' in comp:
+            unsafe = validate_module_resources(comp['name'])
+            if unsafe:
+                raise ValueError(f"Unsafe resource paths in module {comp['name']}: {', '.join(unsafe)}")
+    return True
+
+
+def setup_rate_limits(app: FastAPI, components: List[Dict[str, Any]]) -> int:
+    """
+    Enforce the rate limit policies declared by components with one middleware.
+    
+    Parameters:
+        app (FastAPI): The application to add the middleware to.
+        components (List[Dict[str, Any]]): Component metadata dictionaries; a component's optional 'rate_limit' key declares its policy.
+    
+    Returns:
+        int: Number of policies enforced.
+    
+    Raises:
+        ValueError: If a component declares a malformed policy.
+    """
+    policies = collect_policies(components)
+    if policies:
+        app.add_middleware(RateLimitMiddleware, policies=policies)
+    return len(policies)
+
+
 def setup_components(app: FastAPI):
     """
     Register and initialize application components on the provided FastAPI app.
 
-    This sets up the admin, forums, RTC, and alter components, collects each component's metadata, and validates their routes to detect conflicts before runtime.
+    This sets up the admin, forums, RTC, and alter components, collects each component's metadata, validates their routes to detect conflicts before runtime, and enforces their rate limit policies.
 
     Parameters:
         app (FastAPI): The FastAPI application instance to register components and routes on.
 
     Raises:
-        ValueError: If a route conflict is detected across components.
+        ValueError: If a route conflict is detected across components, a module's resources resolve outside the project root, or a rate limit policy is malformed.
     """
     # Import components - following the integration chain pattern
     from components.admin_comp import setup_admin
@@ -69,4 +116,12 @@ def setup_components(app: FastAPI):
     # Validate all routes to prevent conflicts
     validate_routes(components_info)
 
+    # Resolve the project root once, then validate module resource trees up front
+    init_loader_context()
+    validate_resources(components_info)
+
+    # Rate limit each component with the policy it declares
+    if config.RATE_LIMIT_ENABLED:
+        setup_rate_limits(app, components_info)
+
     print(f"Successfully set up {len(components_info)} components")
\ No newline at end of file
@@ -17,6 +17,7 @@ def setup_admin(app: FastAPI):
         dict: Descriptor for the admin component with keys:
             - name (str): "admin"
             - routes (list[str]): route patterns exposed by the component (e.g., ["/admin/*"])
+            - rate_limit (dict): token bucket policy; form submissions cost more than page views
             - initialized (bool): True if the component was mounted
     """
     # Mount the admin routes
@@ -25,5 +26,10 @@ def setup_admin(app: FastAPI):
     return {
         "name": "admin",
         "routes": ["/admin/*"],
+        "rate_limit": {
+            "rate": 1,  # tokens refilled per second
+            "burst": 30,
+            "costs": {"POST /admin/*": 5},
+        },
         "initialized": True
     }
\ No newline at end of file
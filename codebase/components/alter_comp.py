@@ -17,6 +17,7 @@ def setup_alter(app: FastAPI):
         dict: Descriptor for the alter component with keys:
             - name (str): "alter"
             - routes (list[str]): route patterns exposed by the component (e.g., ["/alter/*"])
+            - rate_limit (dict): token bucket policy; switches cost more than status checks
             - initialized (bool): True if the component was mounted
     """
     # Mount the alter routes
@@ -24,6 +25,15 @@ def setup_alter(app: FastAPI):
 
     return {
         "name": "alter",
-        "routes": ["/alter/*", "/alter/switch/*", "/alter/status"],
+        "routes": ["/alter/*", "/alter/switch/*", "/alter/status", "/alter/live"],
+        "rate_limit": {
+            "rate": 1,  # tokens refilled per second
+            "burst": 30,
+            "costs": {
+                "GET /alter/switch/*": 5,
+                # Every page opens this socket
+                "WEBSOCKET /alter/live": 1,
+            },
+        },
         "initialized": True
     }
\ No newline at end of file
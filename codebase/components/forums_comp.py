@@ -18,6 +18,7 @@ def setup_forums(app: FastAPI):
         dict: Metadata about the mounted component with keys:
             - name: "forums"
             - routes: list of route patterns handled by the component
+            - rate_limit: token bucket policy; searches and posts cost more than page views
             - initialized: True when mounting succeeded
     """
     # Mount the forums routes
@@ -29,5 +30,13 @@ def setup_forums(app: FastAPI):
     return {
         "name": "forums",
         "routes": ["/forums/*"],
+        "rate_limit": {
+            "rate": 2,  # tokens refilled per second
+            "burst": 60,
+            "costs": {
+                "GET /forums/threads/search": 10,
+                "POST /forums/*": 5,
+            },
+        },
         "initialized": True
     }
\ No newline at end of file
@@ -14,6 +14,7 @@ def setup_rtc(app: FastAPI):
         dict: Metadata for the RTC component with keys:
             - "name": "rtc"
             - "routes": list of mounted route patterns (e.g., ["/rtc/*"])
+            - "rate_limit": token bucket policy; sized so a reader opening a thread socket per page never hits it
             - "initialized": `True` when the routes have been included
     """
     # Mount the RTC routes
@@ -22,5 +23,11 @@ def setup_rtc(app: FastAPI):
     return {
         "name": "rtc",
         "routes": ["/rtc/*"],
+        "rate_limit": {
+            "rate": 2,  # tokens refilled per second
+            "burst": 60,
+            # Every thread page opens a socket, and reconnects after drops
+            "costs": {"WEBSOCKET /rtc/*": 1},
+        },
         "initialized": True
     }
\ No newline at end of file
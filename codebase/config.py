@@ -3,6 +3,8 @@ import os
 # Global configuration settings
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
+PREVIOUS_SECRET_KEYS = [key for key in os.getenv("PREVIOUS_SECRET_KEYS", "").split(",") if key]  # still accepted for tokens
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))  # verified access tokens kept in memory
 VPS_HOST = os.getenv("VPS_HOST", "localhost")
 PORT = int(os.getenv("PORT", "8000"))
 
@@ -11,6 +13,62 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
 REGISTRY_DB_PATH = os.getenv("REGISTRY_DB_PATH", "data/registry.db")
 APP_DB_PATH = os.getenv("APP_DB_PATH", "data/app.db")
 
+# Template settings
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "data/cache/templates")
+
+# Alter settings
+ALTER_CSV_WRITE_DELAY = float(os.getenv("ALTER_CSV_WRITE_DELAY", "0.5"))  # seconds to coalesce switches
+ALTER_WATCH_INTERVAL = float(os.getenv("ALTER_WATCH_INTERVAL", "1.0"))  # seconds between checks for switches in other workers
+
+# Static asset settings
+ASSET_PIPELINE = os.getenv("ASSET_PIPELINE", "startup")  # startup, prebuilt or off
+ASSET_BUILD_DIR = os.getenv("ASSET_BUILD_DIR", "data/assets")
+
+# Response compression settings
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+# Page cache settings
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "False").lower() == "true"
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "5"))  # seconds, keep within 1-10
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", "33554432"))  # 32MB
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "1024"))
+PAGE_CACHE_PATHS = os.getenv("PAGE_CACHE_PATHS", "/=home,/forums=forums")  # prefix=namespace pairs
+PAGE_CACHE_VERSIONS_FILE = os.getenv("PAGE_CACHE_VERSIONS_FILE", "data/pagecache.bin")  # invalidations shared by all workers; empty for per-process
+
+# Rate limit settings
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "mmap://data/ratelimits.bin")  # shared by all workers; memory:// for per-process
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"  # per-component token buckets
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))  # (component, client) pairs kept in memory
+RATE_LIMIT_TRUSTED_PROXIES = [proxy.strip() for proxy in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if proxy.strip()]  # reverse proxies whose X-Forwarded-For names the client
+
+# Password hashing settings
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))  # concurrent bcrypt hashes
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "16"))  # waiting hashes before refusing
+PASSWORD_HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS", "auto")  # bcrypt cost, or auto to benchmark this host
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))  # verify time the benchmark aims for
+PASSWORD_HASH_MIN_ROUNDS = int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", "10"))
+PASSWORD_HASH_MAX_ROUNDS = int(os.getenv("PASSWORD_HASH_MAX_ROUNDS", "16"))
+
+# RTC settings
+RTC_SEND_QUEUE_SIZE = int(os.getenv("RTC_SEND_QUEUE_SIZE", "64"))  # messages queued per connection
+RTC_MAX_DROPPED = int(os.getenv("RTC_MAX_DROPPED", "256"))  # drops without a completed send before disconnecting
+RTC_MAX_ROOMS = int(os.getenv("RTC_MAX_ROOMS", "16"))  # chat rooms one connection may join
+RTC_COALESCE_MS = float(os.getenv("RTC_COALESCE_MS", "0"))  # batch chat room events per tick; 0 sends them one by one
+RTC_COALESCE_MAX_BATCH = int(os.getenv("RTC_COALESCE_MAX_BATCH", "32"))  # events per batch frame
+RTC_DEFLATE_MIN_SIZE = int(os.getenv("RTC_DEFLATE_MIN_SIZE", "256"))  # smallest binary payload worth deflating
+RTC_DEFLATE_LEVEL = int(os.getenv("RTC_DEFLATE_LEVEL", "6"))  # zlib level for binary-deflate clients
+RTC_HISTORY_SIZE = int(os.getenv("RTC_HISTORY_SIZE", "50"))  # recent messages kept per chat room and replayed to joiners
+RTC_HISTORY_MAX_ROOMS = int(os.getenv("RTC_HISTORY_MAX_ROOMS", "1000"))  # chat rooms whose recent messages stay in memory
+RTC_HISTORY_FLUSH_INTERVAL = float(os.getenv("RTC_HISTORY_FLUSH_INTERVAL", "1.0"))  # seconds between chat history writes
+RTC_HISTORY_BATCH_SIZE = int(os.getenv("RTC_HISTORY_BATCH_SIZE", "200"))  # unsaved messages that trigger a write before the interval ends
+RTC_HISTORY_MAX_PENDING = int(os.getenv("RTC_HISTORY_MAX_PENDING", "10000"))  # unsaved messages kept while the database is unavailable
+RTC_RESUME_MAX_GAP = int(os.getenv("RTC_RESUME_MAX_GAP", "500"))  # missed messages replayed on resume; larger gaps resync
+RTC_PRESENCE_TIMEOUT = float(os.getenv("RTC_PRESENCE_TIMEOUT", "60"))  # seconds without a heartbeat before a session stops counting as present
+RTC_PRESENCE_TICK = float(os.getenv("RTC_PRESENCE_TICK", "1.0"))  # seconds between presence expiry checks
+RTC_PRESENCE_WHEEL_SLOTS = int(os.getenv("RTC_PRESENCE_WHEEL_SLOTS", "128"))  # keep above timeout / tick so a tick only visits expiring sessions
+
 # Upload settings
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "data/uploads")
 MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", "16777216"))  # 16MB
@@ -2,6 +2,7 @@
 Initialize the database with default values
 """
 from utils.db import init_db, SessionLocal, ModuleRegistry, Alter
+import modules.forums.models  # registers the forum tables and their indexes
 from modules.alter.engine import TemplateEngine
 
 def init_database():
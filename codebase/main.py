@@ -1,14 +1,17 @@
 from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from components import setup_components
-from modules.alter.engine import TemplateEngine
+from utils.assets import setup_assets
+from utils.compression import CompressionMiddleware
+from utils.pagecache import PageCacheMiddleware
+from utils.ratelimit import request_client_address  # also registers the mmap:// limiter storage
+from modules.alter.engine import get_template_engine
 import config
 
 # Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=request_client_address, storage_uri=config.RATE_LIMIT_STORAGE_URI)
 app = FastAPI(
     title="Multi-House Application",
     debug=config.DEBUG
@@ -17,6 +20,18 @@ app = FastAPI(
 # Mount global static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Serve fingerprinted, precompressed copies of all static files and CSS bundles
+setup_assets(app, alters=get_template_engine().alters_status)
+
+# Serve hot anonymous pages from memory for a few seconds
+if config.PAGE_CACHE_ENABLED:
+    app.add_middleware(PageCacheMiddleware)
+
+# Gzip HTML and JSON responses; precompressed assets pass through untouched and
+# plain /static files keep their length, strong ETag and range support
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, exclude_paths=("/static",))
+
 # Setup components (integration layer)
 setup_components(app)
 
@@ -24,8 +39,8 @@ setup_components(app)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# Initialize the alter engine
-template_engine = TemplateEngine()
+# Use the process-wide alter engine
+template_engine = get_template_engine()
 
 
 @app.get("/")
@@ -2,15 +2,13 @@
 Routes for the admin dashboard
 """
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
-import os
+from utils.templating import register_template_dir
 
 router = APIRouter()
 
-# Create templates directory if it doesn't exist
+# Register the module's templates with the shared environment
 templates_dir = "modules/admin/templates"
-os.makedirs(templates_dir, exist_ok=True)
-templates = Jinja2Templates(directory=templates_dir)
+templates = register_template_dir(templates_dir)
 
 
 @router.get("/")
@@ -18,11 +18,11 @@ def get_module_info():
     Returns:
         module_info (dict): Mapping containing module metadata:
             - name (str): Module identifier, `"alter"`.
-            - routes (list[str]): Route patterns exposed by the module, e.g. `"/alter/*"`, `"/alter/switch/*"`, `"/alter/status"`.
+            - routes (list[str]): Route patterns exposed by the module, e.g. `"/alter/*"`, `"/alter/switch/*"`, `"/alter/status"`, `"/alter/live"`.
             - local_data_path (str): Relative path to the module's local data directory, `"modules/alter/data"`.
     """
     return {
         "name": "alter",
-        "routes": ["/alter/*", "/alter/switch/*", "/alter/status"],
+        "routes": ["/alter/*", "/alter/switch/*", "/alter/status", "/alter/live"],
         "local_data_path": "modules/alter/data"
     }
\ No newline at end of file
@@ -1,12 +1,22 @@
 """
 Template Engine - Handles alter-based template rendering
 """
-import csv
 import os
-from typing import Dict, Any, Optional
-from pathlib import Path
-from fastapi.templating import Jinja2Templates
+import threading
+from typing import Dict, Any, List, Mapping, NamedTuple, Optional
 from fastapi import Request
+from fastapi.templating import Jinja2Templates
+from modules.alter.persistence import AltersCsv
+from modules.alter.state import AlterStateStore, FrontingState
+from utils.templating import template_registry
+
+
+class EngineSnapshot(NamedTuple):
+    """Everything one render needs, captured together at a single state version."""
+    version: int
+    current_alter: str
+    alters_status: Mapping[str, bool]
+    templates: Jinja2Templates
 
 
 class TemplateEngine:
@@ -19,46 +29,84 @@ class TemplateEngine:
     1. Current alter's templates (e.g., modules/alter/templates/seles/index.html)
     2. Global templates (e.g., modules/alter/templates/global/index.html)
     3. Standard global templates (e.g., templates/index.html)
+
+    Fronting state lives in an AlterStateStore shared by every worker process;
+    alters.csv seeds it and mirrors the latest status. Renders read an
+    immutable EngineSnapshot that is replaced, never modified, when the state
+    changes, so a concurrent switch cannot mix two alters in one page.
     """
     
-    def __init__(self):
-        self.alters_status: Dict[str, bool] = {}
-        self.current_alter: str = "global"
-        self._load_alters_status()
+    def __init__(self, store: Optional[AlterStateStore] = None):
+        """
+        Args:
+            store: Shared fronting state; defaults to the app database, seeded from alters.csv
+        """
+        self.alters_csv = AltersCsv()
+        self.store = store or AlterStateStore(seed=self.alters_csv.load)
+        self._templates_lock = threading.Lock()
+        self._snapshot: Optional[EngineSnapshot] = None
         self._setup_templates()
+
+    def snapshot(self) -> EngineSnapshot:
+        """
+        Return the snapshot for the current fronting state.
+
+        A new snapshot is built only when the store reports a new version; the
+        reference swap is atomic, so readers get either the old or the new one.
         
-    def _load_alters_status(self):
-        """Load alter status from CSV file."""
-        alters_csv_path = Path("modules/alter/data/alters.csv")
-        
-        # Create default CSV if it doesn't exist
-        if not alters_csv_path.exists():
-            alters_csv_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(alters_csv_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['name', 'is_fronting'])
-                writer.writerow(['seles', '1'])
-                writer.writerow(['dexen', '0'])
-                writer.writerow(['yuki', '0'])
+        Returns:
+            EngineSnapshot: State and template environment of one version
+        """
+        state = self.store.get()
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != state.version:
+            snapshot = EngineSnapshot(
+                version=state.version,
+                current_alter=state.current_alter,
+                alters_status=state.alters_status,
+                templates=self._templates_for(state.current_alter),
+            )
+            self._snapshot = snapshot
+        return snapshot
+
+    @property
+    def last_snapshot(self) -> EngineSnapshot:
+        """
+        The most recent snapshot, without revalidating against the store.
+
+        Renders and the live watcher refresh it through snapshot(); only the
+        first read, before any snapshot exists, goes to the store.
+        """
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None else self.snapshot()
+
+    @property
+    def state(self) -> FrontingState:
+        """The current fronting state, revalidated against the shared store."""
+        return self.store.get()
+
+    @property
+    def alters_status(self) -> Mapping[str, bool]:
+        """Read-only mapping of alter name to whether it is fronting."""
+        return self.snapshot().alters_status
+
+    @property
+    def current_alter(self) -> str:
+        """Name of the fronting alter, or "global" if none is fronting."""
+        return self.snapshot().current_alter
+
+    @property
+    def templates(self) -> Jinja2Templates:
+        """The prebuilt template environment of the fronting alter."""
+        return self.snapshot().templates
         
-        # Read the CSV file to populate alters_status
-        with open(alters_csv_path, 'r') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                is_fronting = row['is_fronting'].lower() in ('1', 'true', 'yes', 'on')
-                self.alters_status[row['name']] = is_fronting
-                # Set the current alter if it's fronting
-                if is_fronting:
-                    self.current_alter = row['name']
-    
-    def _setup_templates(self):
-        """Set up Jinja2 template environment with appropriate search paths."""
-        # Determine template search paths based on current alter
+    def _template_paths(self, alter_name: str) -> List[str]:
+        """Return the template search paths for an alter, in priority order."""
         template_paths = []
         
-        # Add alter-specific templates if current alter isn't global
-        if self.current_alter != "global":
-            alter_template_path = f"modules/alter/templates/{self.current_alter}"
+        # Add alter-specific templates if the alter isn't global
+        if alter_name != "global":
+            alter_template_path = f"modules/alter/templates/{alter_name}"
             if os.path.exists(alter_template_path):
                 template_paths.append(alter_template_path)
 
@@ -69,8 +117,32 @@ class TemplateEngine:
             
         # Add regular global templates as final fallback
         template_paths.append("templates")
+        return template_paths
+    
+    def _setup_templates(self):
+        """
+        Prebuild one Jinja2 template environment per alter.
         
-        self.templates = Jinja2Templates(directory=template_paths)
+        Every environment shares the registry's bytecode cache, so templates
+        that are identical across alters are compiled once. Switching alters
+        then only swaps which prebuilt environment is active.
+        """
+        self._alter_templates: Dict[str, Jinja2Templates] = {
+            alter_name: template_registry.create_templates(self._template_paths(alter_name))
+            for alter_name in [*self.state.alters_status, "global"]
+        }
+    
+    def _templates_for(self, alter_name: str) -> Jinja2Templates:
+        """Return the prebuilt environment for an alter, building it if missing."""
+        templates = self._alter_templates.get(alter_name)
+        if templates is None:
+            with self._templates_lock:
+                templates = self._alter_templates.get(alter_name)
+                if templates is None:
+                    templates = template_registry.create_templates(self._template_paths(alter_name))
+                    # Copy-on-write so lock-free readers never see the dict change
+                    self._alter_templates = {**self._alter_templates, alter_name: templates}
+        return templates
     
     def render(self, template_name: str, request: Request, **context) -> Any:
         """
@@ -84,14 +156,16 @@ class TemplateEngine:
         Returns:
             Rendered template response
         """
-        # Add alter information to the context
+        # Capture one snapshot so the context and environment agree
+        snapshot = self.snapshot()
+        request.state.alter_snapshot = snapshot
         full_context = {
-            "request": request,
-            "current_alter": self.current_alter,
-            "alters_status": self.alters_status,
+            "current_alter": snapshot.current_alter,
+            "alters_status": snapshot.alters_status,
+            "alter_version": snapshot.version,
             **context
         }
-        return self.templates.TemplateResponse(template_name, full_context)
+        return snapshot.templates.TemplateResponse(request, template_name, full_context)
     
     def switch_alter(self, alter_name: str) -> bool:
         """
@@ -103,29 +177,27 @@ class TemplateEngine:
         Returns:
             True if successful, False otherwise
         """
-        if alter_name in self.alters_status:
-            # Reset all alters to not fronting
-            for name in self.alters_status:
-                self.alters_status[name] = False
-            
-            # Set the selected alter to fronting
-            self.alters_status[alter_name] = True
-            self.current_alter = alter_name
-            
-            # Update template paths
-            self._setup_templates()
-            
-            # Save the updated status back to the CSV file
-            self._save_alters_status()
-            return True
-        return False
-    
-    def _save_alters_status(self):
-        """Save the current alter status to the CSV file."""
-        alters_csv_path = Path("modules/alter/data/alters.csv")
+        state = self.store.switch(alter_name)
+        if state is None:
+            return False
         
-        with open(alters_csv_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['name', 'is_fronting'])
-            for name, is_fronting in self.alters_status.items():
-                writer.writerow([name, str(int(is_fronting))])
\ No newline at end of file
+        # Mirror the new status to the CSV file in the background
+        self.alters_csv.save(state.alters_status)
+        return True
+
+
+# Process-wide engine shared by the app, the alter routes and the resource loader
+_template_engine: Optional[TemplateEngine] = None
+
+
+def get_template_engine() -> TemplateEngine:
+    """
+    Return the process-wide TemplateEngine, creating it on first use.
+
+    Returns:
+        TemplateEngine: The shared engine with its prebuilt per-alter environments.
+    """
+    global _template_engine
+    if _template_engine is None:
+        _template_engine = TemplateEngine()
+    return _template_engine
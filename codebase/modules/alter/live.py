@@ -0,0 +1,100 @@
+"""
+Live alter switching
+Broadcasts fronting changes over the RTC hub so open pages re-theme in place
+instead of reloading
+"""
+import asyncio
+from typing import Any, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+from modules.alter.engine import EngineSnapshot, TemplateEngine
+from modules.rtc.hub import ALTER_CHANNEL, ChannelHub
+from utils.assets import css_bundler, find_static_dirs
+import config
+
+
+def build_switch_event(snapshot: EngineSnapshot) -> Dict[str, Any]:
+    """
+    Build the hub event describing a fronting state.
+
+    The event carries everything a page needs to re-theme: the stylesheet
+    links for the global layout and for every module, keyed by module name
+    ("" for pages without a module stylesheet), and the rendered nav and
+    footer fragments.
+
+    Parameters:
+        snapshot (EngineSnapshot): State to describe.
+
+    Returns:
+        dict: JSON-serialisable "alter" event.
+    """
+    context = {"current_alter": snapshot.current_alter, "alters_status": snapshot.alters_status}
+    modules = [prefix for prefix in find_static_dirs() if prefix]
+    return {
+        "type": "alter",
+        "version": snapshot.version,
+        "current_alter": snapshot.current_alter,
+        "stylesheets": {
+            module or "": str(css_bundler.links(snapshot.current_alter, module))
+            for module in [None, *modules]
+        },
+        "nav": snapshot.templates.get_template("partials/alter_nav.html").render(context),
+        "footer": snapshot.templates.get_template("partials/alter_footer.html").render(context),
+    }
+
+
+class AlterBroadcaster:
+    """
+    Publishes alter switch events to the hub's alter channel.
+
+    Switches made through this process are published straight away by the
+    switch route. While anyone is subscribed, a watcher task also polls the
+    shared state every ``interval`` seconds so switches made by other worker
+    processes reach this process's clients too. Only versions newer than the
+    last one published are sent, so the two paths never send stale events.
+    """
+
+    def __init__(self, engine: TemplateEngine, hub: ChannelHub, interval: Optional[float] = None):
+        self.engine = engine
+        self.hub = hub
+        self.interval = config.ALTER_WATCH_INTERVAL if interval is None else interval
+        self.published_version: Optional[int] = None
+        self._event: Optional[Dict[str, Any]] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def current_event(self) -> Dict[str, Any]:
+        """Return the event for the current state, building it once per version."""
+        snapshot = await run_in_threadpool(self.engine.snapshot)
+        event = self._event
+        if event is None or event["version"] != snapshot.version:
+            event = await run_in_threadpool(build_switch_event, snapshot)
+            self._event = event
+        return event
+
+    async def publish_current(self) -> int:
+        """
+        Publish the current state if it is newer than the last published one.
+
+        Returns:
+            int: Number of subscribers the event was delivered to.
+        """
+        event = await self.current_event()
+        if self.published_version is not None and event["version"] <= self.published_version:
+            return 0
+        self.published_version = event["version"]
+        return await self.hub.publish(ALTER_CHANNEL, event)
+
+    def ensure_watching(self) -> None:
+        """Start the watcher task if it isn't running."""
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self) -> None:
+        if self.published_version is None:
+            # Clients connect with the version they rendered, so start from the current one
+            self.published_version = (await self.current_event())["version"]
+        while self.hub.subscriber_count(ALTER_CHANNEL):
+            await asyncio.sleep(self.interval)
+            try:
+                await self.publish_current()
+            except Exception as e:
+                print(f"Alter broadcast error: {e}")
@@ -0,0 +1,162 @@
+"""
+Alters CSV - Seed and mirror file for the fronting state
+Writes are atomic, happen on a background thread and coalesce rapid switches
+"""
+import atexit
+import csv
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import config
+
+# Written when no alters.csv exists yet
+DEFAULT_ALTERS: Dict[str, bool] = {"seles": True, "dexen": False, "yuki": False}
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def parse_alters_csv(text: str) -> Dict[str, bool]:
+    """
+    Parse the contents of an alters CSV file.
+
+    Parameters:
+        text (str): File contents with a ``name,is_fronting`` header.
+
+    Returns:
+        Dict[str, bool]: Mapping of alter name to fronting flag.
+
+    Raises:
+        ValueError: If the header is wrong, a row is incomplete or no alters are listed.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    if reader.fieldnames is None or not {'name', 'is_fronting'} <= set(reader.fieldnames):
+        raise ValueError("missing name,is_fronting header")
+    alters_status = {}
+    for row in reader:
+        name, is_fronting = row.get('name'), row.get('is_fronting')
+        if not name or is_fronting is None:
+            raise ValueError(f"incomplete row on line {reader.line_num}")
+        alters_status[name] = is_fronting.strip().lower() in TRUE_VALUES
+    if not alters_status:
+        raise ValueError("no alters listed")
+    return alters_status
+
+
+def format_alters_csv(alters_status: Dict[str, bool]) -> str:
+    """Render an alters status mapping as CSV text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['name', 'is_fronting'])
+    for name, is_fronting in alters_status.items():
+        writer.writerow([name, str(int(is_fronting))])
+    return buffer.getvalue()
+
+
+def write_file_atomic(path: Path, text: str) -> None:
+    """
+    Replace a file's contents so readers see either the old or the new file.
+
+    The data is written and fsynced to a unique temporary file in the same
+    directory, which is then renamed over the target.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', newline='') as tmp_file:
+            tmp_file.write(text)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class AltersCsv:
+    """
+    The alters CSV file with crash-safe, coalesced writes.
+
+    ``save`` only records the latest status and arms a timer; when it fires a
+    background thread writes whatever is newest, so a burst of switches costs
+    one write and the caller never waits on the disk. Pending writes are
+    flushed at interpreter exit. ``load`` falls back to the last good state
+    when the file cannot be parsed, leaving the damaged file for inspection.
+    """
+
+    def __init__(self, path: str = "modules/alter/data/alters.csv", write_delay: Optional[float] = None):
+        # Resolved now because writes happen later, on another thread
+        self.path = Path(path).absolute()
+        self.write_delay = config.ALTER_CSV_WRITE_DELAY if write_delay is None else write_delay
+        self.last_good: Optional[Dict[str, bool]] = None
+        self._pending: Optional[Dict[str, bool]] = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        # Serializes writes so an older snapshot can never replace a newer one
+        self._write_lock = threading.Lock()
+        self._atexit_registered = False
+
+    def load(self) -> Dict[str, bool]:
+        """
+        Read the alters status, creating the default file if there is none.
+
+        Returns:
+            Dict[str, bool]: The file's status, or the last good status (the
+            defaults if none) when the file is unreadable or corrupt.
+        """
+        if not self.path.exists():
+            write_file_atomic(self.path, format_alters_csv(DEFAULT_ALTERS))
+        try:
+            alters_status = parse_alters_csv(self.path.read_text())
+        except (OSError, UnicodeDecodeError, csv.Error, ValueError) as e:
+            print(f"Ignoring unreadable {self.path}: {e}")
+            return dict(self.last_good if self.last_good is not None else DEFAULT_ALTERS)
+        self.last_good = alters_status
+        return dict(alters_status)
+
+    def save(self, alters_status: Dict[str, bool]) -> None:
+        """
+        Schedule a write of the alters status without blocking the caller.
+
+        Parameters:
+            alters_status (Dict[str, bool]): Status to write; later calls before the write replace it.
+        """
+        with self._lock:
+            self._pending = dict(alters_status)
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.write_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def cancel(self) -> None:
+        """Drop the pending status, if there is one, without writing it."""
+        with self._lock:
+            self._pending = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def flush(self) -> None:
+        """Write the pending status now, if there is one."""
+        with self._write_lock:
+            with self._lock:
+                alters_status, self._pending = self._pending, None
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if alters_status is None:
+                return
+            try:
+                write_file_atomic(self.path, format_alters_csv(alters_status))
+            except OSError as e:
+                print(f"Failed to write {self.path}: {e}")
+                return
+            self.last_good = alters_status
@@ -1,21 +1,27 @@
 """
 Routes for the alter module - handles alter switching and related operations
 """
-from fastapi import APIRouter, Request
-from modules.alter.engine import TemplateEngine
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+from modules.alter.engine import get_template_engine
+from modules.alter.live import AlterBroadcaster
+from modules.rtc.hub import ALTER_CHANNEL, hub
 
 
 # Create router for alter module
 router = APIRouter()
 
-# Global instance of the template engine
-template_engine = TemplateEngine()
+# Process-wide instance of the template engine
+template_engine = get_template_engine()
+
+# Pushes switches to open pages over the RTC hub
+alter_broadcaster = AlterBroadcaster(template_engine, hub)
 
 
 @router.get("/switch/{alter_name}")
-def switch_alter(alter_name: str):
+async def switch_alter(alter_name: str):
     """
-    Switch the current fronting alter.
+    Switch the current fronting alter and notify open pages.
     
     Args:
         alter_name: Name of the alter to make front
@@ -23,8 +29,9 @@ def switch_alter(alter_name: str):
     Returns:
         Success or failure message
     """
-    success = template_engine.switch_alter(alter_name)
+    success = await run_in_threadpool(template_engine.switch_alter, alter_name)
     if success:
+        await alter_broadcaster.publish_current()
         return {"success": True, "message": f"Switched to alter {alter_name}"}
     else:
         return {"success": False, "message": f"Failed to switch to alter {alter_name}"}
@@ -36,9 +43,40 @@ def get_alter_status():
     Get the current status of all alters.
     
     Returns:
-        Dictionary with current alter and status of all alters
+        Dictionary with current alter, status of all alters and the state version
     """
+    state = template_engine.state
     return {
-        "current_alter": template_engine.current_alter,
-        "alters_status": template_engine.alters_status
-    }
\ No newline at end of file
+        "current_alter": state.current_alter,
+        "alters_status": state.alters_status,
+        "version": state.version
+    }
+
+
+@router.websocket("/live")
+async def live_updates(websocket: WebSocket, version: int = 0):
+    """
+    WebSocket endpoint streaming alter switch events to open pages.
+
+    A client that connects with an older version than the current one gets
+    the current state straight away, so switches missed while disconnected
+    are applied on reconnect. Messages sent by the client are ignored.
+
+    Args:
+        websocket: WebSocket connection
+        version: State version the page was rendered with
+    """
+    await websocket.accept()
+    hub.subscribe(ALTER_CHANNEL, websocket)
+    alter_broadcaster.ensure_watching()
+    try:
+        event = await alter_broadcaster.current_event()
+        if event["version"] > version:
+            # Queued so it can't race a broadcast already on its way
+            hub.send(websocket, event)
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(websocket)
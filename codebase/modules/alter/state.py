@@ -0,0 +1,145 @@
+"""
+Alter State Store - Fronting state shared by every worker process
+The database is the source of truth; each process keeps a cached copy and
+revalidates it with a cheap change probe before use
+"""
+import sqlite3
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, NamedTuple, Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from utils.db import Alter, AlterState, Base
+
+# Primary key of the single AlterState row
+STATE_ROW_ID = 1
+
+
+class FrontingState(NamedTuple):
+    """Fronting state as of one version; never mutated once read."""
+    version: int
+    alters_status: Mapping[str, bool]
+    current_alter: str
+
+
+class AlterStateStore:
+    """
+    Database-backed fronting state with a monotonically increasing version.
+
+    A switch updates the ``alters`` rows and bumps the ``alter_state`` version
+    in one transaction, so every process sees either the old or the new state.
+    Reads are served from a per-process cache. On SQLite the cache is
+    revalidated with ``PRAGMA data_version`` on a dedicated connection, which
+    only changes when another connection commits; the version row is read only
+    then, and the alters only when the version moved. Other databases compare
+    the version row on every read.
+    """
+
+    def __init__(self, db_engine: Optional[Engine] = None, seed: Optional[Callable[[], Dict[str, bool]]] = None):
+        """
+        Parameters:
+            db_engine (Optional[Engine]): Engine holding the alter tables; defaults to the app database.
+            seed (Optional[Callable]): Returns the initial alters status when the table is empty.
+        """
+        if db_engine is None:
+            from utils.db import engine as db_engine
+        self.db_engine = db_engine
+        self.seed = seed
+        self._lock = threading.RLock()
+        self._state: Optional[FrontingState] = None
+        self._probe: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+
+    def get(self) -> FrontingState:
+        """
+        Return the current fronting state, reloading it if another process changed it.
+
+        Returns:
+            FrontingState: The cached state, revalidated against the database.
+        """
+        with self._lock:
+            if self._state is None:
+                self._initialize()
+            elif self._database_changed() and self._read_version() != self._state.version:
+                self._state = self._read_state()
+            return self._state
+
+    def switch(self, alter_name: str) -> Optional[FrontingState]:
+        """
+        Make an alter the only fronting one and bump the version.
+
+        Parameters:
+            alter_name (str): Name of the alter to make front.
+
+        Returns:
+            Optional[FrontingState]: The new state, or None if the alter is unknown.
+        """
+        with self._lock:
+            if self._state is None:
+                self._initialize()
+            with Session(self.db_engine) as db, db.begin():
+                if db.scalar(select(Alter.id).where(Alter.name == alter_name)) is None:
+                    return None
+                db.execute(update(Alter).values(is_fronting=(Alter.name == alter_name)))
+                db.execute(
+                    update(AlterState)
+                    .where(AlterState.id == STATE_ROW_ID)
+                    .values(version=AlterState.version + 1)
+                )
+            self._database_changed()
+            self._state = self._read_state()
+            return self._state
+
+    def close(self) -> None:
+        """Close the change-probe connection and drop the cached state."""
+        with self._lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+            self._state = None
+            self._data_version = None
+
+    def _initialize(self) -> None:
+        """Create and seed the tables if needed, open the probe and load the state."""
+        Base.metadata.create_all(bind=self.db_engine, tables=[Alter.__table__, AlterState.__table__])
+        with Session(self.db_engine) as db, db.begin():
+            if not db.scalar(select(func.count(Alter.id))) and self.seed is not None:
+                db.add_all(Alter(name=name, is_fronting=is_fronting) for name, is_fronting in self.seed().items())
+            if db.get(AlterState, STATE_ROW_ID) is None:
+                db.add(AlterState(id=STATE_ROW_ID, version=1))
+        self._probe = self._open_probe()
+        # Take the probe baseline before reading so a concurrent switch is not missed
+        self._database_changed()
+        self._state = self._read_state()
+
+    def _open_probe(self) -> Optional[sqlite3.Connection]:
+        url = self.db_engine.url
+        if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+            return None
+        return sqlite3.connect(url.database, check_same_thread=False)
+
+    def _database_changed(self) -> bool:
+        """Return True if the database may have changed since the last call."""
+        if self._probe is None:
+            return True
+        data_version = self._probe.execute("PRAGMA data_version").fetchone()[0]
+        changed = data_version != self._data_version
+        self._data_version = data_version
+        return changed
+
+    def _read_version(self) -> int:
+        with Session(self.db_engine) as db:
+            return db.scalar(select(AlterState.version).where(AlterState.id == STATE_ROW_ID))
+
+    def _read_state(self) -> FrontingState:
+        with Session(self.db_engine) as db, db.begin():
+            version = db.scalar(select(AlterState.version).where(AlterState.id == STATE_ROW_ID))
+            rows = db.execute(select(Alter.name, Alter.is_fronting).order_by(Alter.id)).all()
+        alters_status = {}
+        current_alter = "global"
+        for name, is_fronting in rows:
+            alters_status[name] = bool(is_fronting)
+            if is_fronting:
+                current_alter = name
+        return FrontingState(version, MappingProxyType(alters_status), current_alter)
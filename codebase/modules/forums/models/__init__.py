@@ -1,7 +1,7 @@
 """
 Forums Models
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -72,6 +72,10 @@ class ForumThread(Base):
 
 class ForumPost(Base):
     __tablename__ = "forum_posts"
+    __table_args__ = (
+        # Serves "posts in thread X newer than cursor Y" as a single range scan
+        Index("ix_forum_posts_thread_id_id", "thread_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
@@ -85,36 +89,3 @@ class ForumPost(Base):
     thread = relationship("ForumThread", back_populates="posts")
     parent_post = relationship("ForumPost", remote_side=[id], back_populates="replies")
     replies = relationship("ForumPost", back_populates="parent_post")
-
-
-class ForumThread(Base):
-    __tablename__ = "forum_threads"
-
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    content = Column(Text)
-    category_id = Column(Integer, ForeignKey("forum_categories.id"))
-    author = Column(String, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    # Relationships
-    category = relationship("ForumCategory", back_populates="threads")
-    posts = relationship("ForumPost", back_populates="thread")
-
-
-class ForumPost(Base):
-    __tablename__ = "forum_posts"
-
-    id = Column(Integer, primary_key=True, index=True)
-    content = Column(Text)
-    thread_id = Column(Integer, ForeignKey("forum_threads.id"))
-    author = Column(String, index=True)
-    parent_post_id = Column(Integer, ForeignKey("forum_posts.id"), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-    # Relationships
-    thread = relationship("ForumThread", back_populates="posts")
-    parent_post = relationship("ForumPost", remote_side=[id], back_populates="replies")
-    replies = relationship("ForumPost", back_populates="parent_post")
\ No newline at end of file
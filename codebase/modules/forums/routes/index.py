@@ -1,8 +1,7 @@
 """
 Basic routes for the forums module
 """
-from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Request, Depends
 from pydantic import BaseModel
 import os
 from sqlalchemy.orm import Session
@@ -18,15 +17,14 @@ if abs_codebase_dir not in sys.path:
     sys.path.insert(0, abs_codebase_dir)
 
 from utils.db import get_db
+from utils.templating import register_template_dir
 
 
 router = APIRouter()
 
-# Create templates directory if it doesn't exist
+# Register the module's templates with the shared environment
 templates_dir = "modules/forums/templates"
-os.makedirs(templates_dir, exist_ok=True)
-
-templates = Jinja2Templates(directory=templates_dir)
+templates = register_template_dir(templates_dir)
 
 
 class ThreadCreate(BaseModel):
@@ -36,23 +34,15 @@ class ThreadCreate(BaseModel):
 
 
 @router.get("/")
-def forums_index(request: Request, db: Session = None):
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
+def forums_index(request: Request, db: Session = Depends(get_db)):
     threads = db.query(ForumThread).all()
-    return templates.TemplateResponse("forums/index.html", {"request": request, "threads": threads})
+    return templates.TemplateResponse(request, "forums/index.html", {"request": request, "threads": threads})
 
 
 @router.get("/new")
-def new_thread_form(request: Request, category_id: int = None, db: Session = None):
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
+def new_thread_form(request: Request, category_id: int = None, db: Session = Depends(get_db)):
     categories = db.query(ForumCategory).all()
-    return templates.TemplateResponse("forums/new_thread.html", {
+    return templates.TemplateResponse(request, "forums/new_thread.html", {
         "request": request,
         "categories": categories,
         "selected_category_id": category_id
@@ -60,11 +50,7 @@ def new_thread_form(request: Request, category_id: int = None, db: Session = Non
 
 
 @router.post("/threads")
-def create_thread(thread: ThreadCreate, db: Session = None):
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
+def create_thread(thread: ThreadCreate, db: Session = Depends(get_db)):
     db_thread = ForumThread(
         title=thread.title,
         content=thread.content,
@@ -1,8 +1,7 @@
 """
 Posts routes for the forums module
 """
-from fastapi import APIRouter, Request, HTTPException, Form
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Request, HTTPException, Form, Depends
 from pydantic import BaseModel
 from typing import Optional
 import os
@@ -19,14 +18,15 @@ if abs_codebase_dir not in sys.path:
     sys.path.insert(0, abs_codebase_dir)
 
 from utils.db import get_db
+from utils.templating import register_template_dir
+from modules.rtc.hub import hub, thread_channel
 
 
 router = APIRouter()
 
-# Create templates directory if it doesn't exist
+# Register the module's templates with the shared environment
 templates_dir = "modules/forums/templates"
-os.makedirs(templates_dir, exist_ok=True)
-templates = Jinja2Templates(directory=templates_dir)
+templates = register_template_dir(templates_dir)
 
 
 class PostCreate(BaseModel):
@@ -35,18 +35,51 @@ class PostCreate(BaseModel):
     author: str
 
 
+def render_post_item(post: ForumPost, thread_id: int) -> str:
+    """
+    Render a single post as the ``partials/post_item.html`` fragment.
+
+    Args:
+        post: The post to render
+        thread_id: ID of the thread the post belongs to
+
+    Returns:
+        The rendered HTML fragment
+    """
+    return templates.get_template("partials/post_item.html").render(post=post, thread_id=thread_id)
+
+
+async def publish_new_post(post: ForumPost, thread_id: int) -> int:
+    """
+    Push a newly created post to live subscribers of its thread.
+
+    Args:
+        post: The newly created post
+        thread_id: ID of the thread the post belongs to
+
+    Returns:
+        Number of subscribers the event was delivered to
+    """
+    channel = thread_channel(thread_id)
+    # Skip rendering entirely when nobody is watching the thread
+    if not hub.subscriber_count(channel):
+        return 0
+    return await hub.publish(channel, {
+        "type": "post",
+        "post_id": post.id,
+        "parent_post_id": post.parent_post_id,
+        "html": render_post_item(post, thread_id)
+    })
+
+
 @router.get("/")
-def get_posts(request: Request, db: Session = None):
+def get_posts(request: Request, db: Session = Depends(get_db)):
     """
     Get all forum posts.
 
     Returns:
         List of posts
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     posts = db.query(ForumPost).all()
 
     # Get thread details for each post
@@ -58,14 +91,14 @@ def get_posts(request: Request, db: Session = None):
             "thread": thread
         })
 
-    return templates.TemplateResponse("forums/posts.html", {
+    return templates.TemplateResponse(request, "forums/posts.html", {
         "request": request,
         "posts_with_threads": posts_with_threads
     })
 
 
 @router.get("/{post_id}")
-def get_post(request: Request, post_id: int, db: Session = None):
+def get_post(request: Request, post_id: int, db: Session = Depends(get_db)):
     """
     Get a specific forum post by ID.
 
@@ -75,16 +108,12 @@ def get_post(request: Request, post_id: int, db: Session = None):
     Returns:
         Post information
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     post = db.query(ForumPost).filter(ForumPost.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
     thread = db.query(ForumThread).filter(ForumThread.id == post.thread_id).first()
-    return templates.TemplateResponse("forums/post.html", {
+    return templates.TemplateResponse(request, "forums/post.html", {
         "request": request,
         "post": post,
         "thread": thread
@@ -92,7 +121,7 @@ def get_post(request: Request, post_id: int, db: Session = None):
 
 
 @router.post("/")
-async def create_post(content: str = Form(...), thread_id: int = Form(...), author: str = Form(...), parent_post_id: int = Form(None), db: Session = None):
+async def create_post(content: str = Form(...), thread_id: int = Form(...), author: str = Form(...), parent_post_id: int = Form(None), db: Session = Depends(get_db)):
     """
     Create a new forum post or reply.
 
@@ -105,10 +134,6 @@ async def create_post(content: str = Form(...), thread_id: int = Form(...), auth
     Returns:
         Redirect to the thread page
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     # Verify that the thread exists
     thread = db.query(ForumThread).filter(ForumThread.id == thread_id).first()
     if not thread:
@@ -130,13 +155,16 @@ async def create_post(content: str = Form(...), thread_id: int = Form(...), auth
     db.commit()
     db.refresh(db_post)
 
+    # Let readers of the thread see the new post without reloading
+    await publish_new_post(db_post, thread_id)
+
     # Redirect back to the thread page
     from fastapi.responses import RedirectResponse
     return RedirectResponse(url=f"/forums/threads/{thread_id}", status_code=303)
 
 
 @router.put("/{post_id}")
-def update_post(post_id: int, post: PostCreate, db: Session = None):
+def update_post(post_id: int, post: PostCreate, db: Session = Depends(get_db)):
     """
     Update a forum post by ID.
 
@@ -147,10 +175,6 @@ def update_post(post_id: int, post: PostCreate, db: Session = None):
     Returns:
         Updated post information
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     db_post = db.query(ForumPost).filter(ForumPost.id == post_id).first()
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -170,7 +194,7 @@ def update_post(post_id: int, post: PostCreate, db: Session = None):
 
 
 @router.delete("/{post_id}")
-def delete_post(post_id: int, db: Session = None):
+def delete_post(post_id: int, db: Session = Depends(get_db)):
     """
     Delete a forum post by ID.
 
@@ -180,10 +204,6 @@ def delete_post(post_id: int, db: Session = None):
     Returns:
         Success message
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     post = db.query(ForumPost).filter(ForumPost.id == post_id).first()
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
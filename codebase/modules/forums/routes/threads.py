@@ -1,12 +1,13 @@
 """
 Threads routes for the forums module
 """
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Request, HTTPException, Depends, Response
+from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy import create_engine
 
 # For the project structure, we need to ensure the codebase directory is in the path
@@ -20,15 +21,16 @@ if abs_codebase_dir not in sys.path:
     sys.path.insert(0, abs_codebase_dir)
 
 from utils.db import get_db
+from utils.templating import register_template_dir
 from ..models import ForumThread, ForumPost, ForumCategory
+from .posts import render_post_item
 
 
 router = APIRouter()
 
-# Create templates directory if it doesn't exist
+# Register the module's templates with the shared environment
 templates_dir = "modules/forums/templates"
-os.makedirs(templates_dir, exist_ok=True)
-templates = Jinja2Templates(directory=templates_dir)
+templates = register_template_dir(templates_dir)
 
 
 class ThreadCreate(BaseModel):
@@ -40,17 +42,13 @@ class ThreadCreate(BaseModel):
 
 
 @router.get("/")
-def get_threads(request: Request, db: Session = None):
+def get_threads(request: Request, db: Session = Depends(get_db)):
     """
     Get all forum threads.
 
     Returns:
         List of threads
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     # Get all categories (including nested)
     categories = db.query(ForumCategory).filter(ForumCategory.parent_id == None).all()
 
@@ -61,7 +59,7 @@ def get_threads(request: Request, db: Session = None):
     # Combine pinned threads first, then regular threads
     all_threads = pinned_threads + regular_threads
 
-    return templates.TemplateResponse("forums/index.html", {
+    return templates.TemplateResponse(request, "forums/index.html", {
         "request": request,
         "threads": all_threads,
         "categories": categories
@@ -69,7 +67,7 @@ def get_threads(request: Request, db: Session = None):
 
 
 @router.get("/categories/{category_id}")
-def get_threads_by_category(request: Request, category_id: int, db: Session = None):
+def get_threads_by_category(request: Request, category_id: int, db: Session = Depends(get_db)):
     """
     Get all forum threads in a specific category.
 
@@ -79,10 +77,6 @@ def get_threads_by_category(request: Request, category_id: int, db: Session = No
     Returns:
         List of threads in the category
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     category = db.query(ForumCategory).filter(ForumCategory.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -90,7 +84,7 @@ def get_threads_by_category(request: Request, category_id: int, db: Session = No
     threads = db.query(ForumThread).filter(ForumThread.category_id == category_id).all()
     categories = db.query(ForumCategory).filter(ForumCategory.parent_id == category_id).all()
 
-    return templates.TemplateResponse("forums/category.html", {
+    return templates.TemplateResponse(request, "forums/category.html", {
         "request": request,
         "threads": threads,
         "category": category,
@@ -108,7 +102,7 @@ def get_replies_for_post(post_id, db):
 
 
 @router.get("/search")
-def search_threads(request: Request, q: str = None, db: Session = None):
+def search_threads(request: Request, q: str = None, db: Session = Depends(get_db)):
     """
     Search for threads and posts based on a query string.
 
@@ -119,16 +113,12 @@ def search_threads(request: Request, q: str = None, db: Session = None):
         Search results matching the query
     """
     if not q:
-        return templates.TemplateResponse("forums/search.html", {
+        return templates.TemplateResponse(request, "forums/search.html", {
             "request": request,
             "results": [],
             "query": ""
         })
 
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     # Search in thread titles and content
     thread_results = db.query(ForumThread).filter(
         ForumThread.title.contains(q) | ForumThread.content.contains(q)
@@ -148,7 +138,7 @@ def search_threads(request: Request, q: str = None, db: Session = None):
     # Combine results
     all_threads = list(set(thread_results + post_threads))
 
-    return templates.TemplateResponse("forums/search.html", {
+    return templates.TemplateResponse(request, "forums/search.html", {
         "request": request,
         "results": all_threads,
         "query": q
@@ -156,7 +146,7 @@ def search_threads(request: Request, q: str = None, db: Session = None):
 
 
 @router.get("/{thread_id}")
-def get_thread(request: Request, thread_id: int, db: Session = None):
+def get_thread(request: Request, thread_id: int, db: Session = Depends(get_db)):
     """
     Get a specific forum thread by ID.
 
@@ -166,10 +156,6 @@ def get_thread(request: Request, thread_id: int, db: Session = None):
     Returns:
         Thread information
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     thread = db.query(ForumThread).filter(ForumThread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
@@ -184,7 +170,7 @@ def get_thread(request: Request, thread_id: int, db: Session = None):
     for post in posts:
         post.replies = get_replies_for_post(post.id, db)
 
-    return templates.TemplateResponse("forums/thread.html", {
+    return templates.TemplateResponse(request, "forums/thread.html", {
         "request": request,
         "thread": thread,
         "posts": posts,
@@ -192,8 +178,53 @@ def get_thread(request: Request, thread_id: int, db: Session = None):
     })
 
 
+@router.get("/{thread_id}/posts")
+def get_new_posts(thread_id: int, after: int = 0, db: Session = Depends(get_db)):
+    """
+    Get the posts of a thread created after a cursor, as HTML fragments.
+
+    Returns only the rendered ``partials/post_item.html`` fragments (no layout)
+    for posts whose ID is greater than ``after``, so clients can poll or catch
+    up after a reconnect without re-downloading the whole thread. Replies whose
+    parent is also new are nested inside it; the rest carry their parent ID in
+    ``data-parent-post-id`` for the client to place them.
+
+    Args:
+        thread_id: ID of the thread to fetch posts for
+        after: ID of the newest post the client already has
+
+    Returns:
+        HTML fragments with the newest post ID in the ``X-Last-Post-Id`` header,
+        or an empty 204 response when there is nothing new
+    """
+    # Range scan over the (thread_id, id) index
+    new_posts = db.query(ForumPost).filter(
+        ForumPost.thread_id == thread_id,
+        ForumPost.id > after
+    ).order_by(ForumPost.id).all()
+
+    if not new_posts:
+        return Response(status_code=204)
+
+    # Build the reply tree in memory instead of querying replies per post
+    new_ids = {post.id for post in new_posts}
+    children = {}
+    roots = []
+    for post in new_posts:
+        if post.parent_post_id in new_ids:
+            children.setdefault(post.parent_post_id, []).append(post)
+        else:
+            roots.append(post)
+    for post in new_posts:
+        # Replies always have higher IDs than their parent, so this is complete
+        set_committed_value(post, "replies", children.get(post.id, []))
+
+    html = "".join(render_post_item(post, thread_id) for post in roots)
+    return HTMLResponse(html, headers={"X-Last-Post-Id": str(new_posts[-1].id)})
+
+
 @router.post("/")
-def create_thread(thread: ThreadCreate, db: Session = None):
+def create_thread(thread: ThreadCreate, db: Session = Depends(get_db)):
     """
     Create a new forum thread.
 
@@ -203,10 +234,6 @@ def create_thread(thread: ThreadCreate, db: Session = None):
     Returns:
         Created thread information
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     db_thread = ForumThread(
         title=thread.title,
         content=thread.content,
@@ -232,7 +259,7 @@ def create_thread(thread: ThreadCreate, db: Session = None):
 
 
 @router.put("/{thread_id}")
-def update_thread(thread_id: int, thread: ThreadCreate, db: Session = None):
+def update_thread(thread_id: int, thread: ThreadCreate, db: Session = Depends(get_db)):
     """
     Update a forum thread by ID.
 
@@ -243,10 +270,6 @@ def update_thread(thread_id: int, thread: ThreadCreate, db: Session = None):
     Returns:
         Updated thread information
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     db_thread = db.query(ForumThread).filter(ForumThread.id == thread_id).first()
     if not db_thread:
         raise HTTPException(status_code=404, detail="Thread not found")
@@ -262,7 +285,7 @@ def update_thread(thread_id: int, thread: ThreadCreate, db: Session = None):
 
 
 @router.delete("/{thread_id}")
-def delete_thread(thread_id: int, db: Session = None):
+def delete_thread(thread_id: int, db: Session = Depends(get_db)):
     """
     Delete a forum thread by ID.
 
@@ -272,10 +295,6 @@ def delete_thread(thread_id: int, db: Session = None):
     Returns:
         Success message
     """
-    if db is None:
-        from utils.db import get_db
-        db = next(get_db())
-
     thread = db.query(ForumThread).filter(ForumThread.id == thread_id).first()
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
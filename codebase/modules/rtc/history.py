@@ -0,0 +1,366 @@
+"""
+Chat History - Recent and past messages of the RTC chat rooms
+Each room keeps its latest messages in memory for joiners; a background task
+appends new messages to the database in batches
+"""
+import asyncio
+import atexit
+import json
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from utils.db import ChatMessage
+import config
+
+
+class RoomHistory:
+    """The latest messages of one room and the last sequence number it handed out."""
+
+    __slots__ = ("name", "messages", "last_seq", "unsaved")
+
+    def __init__(self, name: str, size: int, last_seq: int = 0):
+        self.name = name
+        # Ring buffer: appending to a full deque drops its oldest message
+        self.messages: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self.last_seq = last_seq
+        # Messages not yet written to the database
+        self.unsaved = 0
+
+
+class ChatHistory:
+    """
+    Chat room messages, numbered per room and persisted in batches.
+
+    ``append`` numbers a message, puts it in its room's ring buffer and queues
+    it for writing; it never touches the database for a room already in
+    memory, so joiners get a room's latest messages without a query. A writer
+    task, started on demand, inserts everything queued in one transaction
+    every ``flush_interval`` seconds, or as soon as ``batch_size`` messages
+    are waiting. Failed writes are retried, keeping at most ``max_pending``
+    messages; anything still queued at interpreter exit is written then.
+
+    At most ``max_rooms`` rooms stay in memory. The least recently used room
+    whose messages are all saved is dropped first and reloaded from the
+    database when it is next used, so its numbering carries on where it
+    stopped.
+
+    Numbers handed out in memory are provisional: the batch transaction
+    continues each room after the highest number already in the database,
+    so when another worker has written to the same room meanwhile, the batch
+    and the room's buffered messages are renumbered to follow it. The unique
+    (room, seq) index rejects any duplicate that slips through, and the
+    batch is then retried like any other failed write.
+
+    Sequence numbers let a reconnecting client ask for just what it missed
+    (``since``), served from memory when the gap is recent and from the
+    database otherwise.
+    """
+
+    def __init__(
+        self,
+        db_engine: Optional[Engine] = None,
+        buffer_size: Optional[int] = None,
+        max_rooms: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        """
+        Parameters:
+            db_engine (Optional[Engine]): Engine holding the chat_messages table; defaults to the app database.
+        """
+        self._db_engine = db_engine
+        self.buffer_size = config.RTC_HISTORY_SIZE if buffer_size is None else buffer_size
+        self.max_rooms = config.RTC_HISTORY_MAX_ROOMS if max_rooms is None else max_rooms
+        self.flush_interval = config.RTC_HISTORY_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.batch_size = config.RTC_HISTORY_BATCH_SIZE if batch_size is None else batch_size
+        self.max_pending = config.RTC_HISTORY_MAX_PENDING if max_pending is None else max_pending
+        self.rooms: "OrderedDict[str, RoomHistory]" = OrderedDict()
+        # (room, message) pairs waiting for the writer, oldest first
+        self.pending: List[Tuple[str, Dict[str, Any]]] = []
+        self._writing: List[Tuple[str, Dict[str, Any]]] = []
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._flushing: Optional[asyncio.Lock] = None
+        # Serializes database writes with the one made at exit
+        self._write_lock = threading.Lock()
+        self._table_ready = False
+        self._atexit_registered = False
+
+    @property
+    def db_engine(self) -> Engine:
+        if self._db_engine is None:
+            from utils.db import engine
+            self._db_engine = engine
+        return self._db_engine
+
+    async def room(self, name: str) -> RoomHistory:
+        """Return a room's history, loading its latest messages from the database if it isn't in memory."""
+        room = self.rooms.get(name)
+        if room is not None:
+            self.rooms.move_to_end(name)
+            return room
+        # Concurrent joiners of a cold room share one query
+        loading = self._loading.get(name)
+        if loading is None:
+            loading = self._loading[name] = asyncio.ensure_future(self._load(name))
+            loading.add_done_callback(lambda _: self._loading.pop(name, None))
+        return await asyncio.shield(loading)
+
+    async def recent(self, name: str) -> List[Dict[str, Any]]:
+        """Return a room's buffered messages, oldest first."""
+        return list((await self.room(name)).messages)
+
+    async def append(self, name: str, data: Any) -> Dict[str, Any]:
+        """
+        Record a message sent to a room.
+
+        Parameters:
+            name (str): Room name.
+            data (Any): JSON-serialisable message content.
+
+        Returns:
+            dict: The message with its ``seq`` and ``created_at``.
+        """
+        room = await self.room(name)
+        room.last_seq += 1
+        message = {"seq": room.last_seq, "data": data, "created_at": datetime.utcnow().isoformat()}
+        room.messages.append(message)
+        room.unsaved += 1
+        self.pending.append((name, message))
+        self._ensure_writing()
+        return message
+
+    async def page(self, name: str, before: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Return up to ``limit`` messages of a room older than ``before``, oldest first.
+
+        Messages still in memory are served from there; the database is only
+        queried for the part of the page older than everything in memory.
+
+        Parameters:
+            name (str): Room name.
+            before (Optional[int]): Sequence number to page back from; None for the latest messages.
+            limit (int): Largest number of messages to return.
+        """
+        in_memory = self._in_memory(name)
+        # Memory holds the newest messages without gaps, the database everything older
+        newer = sorted(seq for seq in in_memory if before is None or seq < before)[-limit:]
+        messages = [in_memory[seq] for seq in newer]
+        if len(messages) < limit:
+            bound = min(in_memory, default=before)
+            if before is not None and bound is not None:
+                bound = min(bound, before)
+            if bound is None or bound > 1:
+                messages[:0] = await run_in_threadpool(self._read_page, name, bound, limit - len(messages))
+        return messages
+
+    async def since(self, name: str, after: int, max_gap: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the messages of a room newer than ``after``, oldest first, for a client resuming.
+
+        Parameters:
+            name (str): Room name.
+            after (int): Sequence number of the last message the client has.
+            max_gap (Optional[int]): Most messages worth replaying; defaults to RTC_RESUME_MAX_GAP.
+
+        Returns:
+            Optional[List[dict]]: The missed messages, or None if the client
+            must resync because it missed too many or has numbers this room
+            never handed out.
+        """
+        max_gap = config.RTC_RESUME_MAX_GAP if max_gap is None else max_gap
+        room = await self.room(name)
+        gap = room.last_seq - after
+        if after < 0 or gap < 0 or gap > max_gap:
+            return None
+        if gap == 0:
+            return []
+        messages = await self.page(name, limit=gap)
+        # Messages sent while the database was read are still in memory
+        last = messages[-1]["seq"] if messages else after
+        in_memory = self._in_memory(name)
+        messages.extend(in_memory[seq] for seq in sorted(in_memory) if seq > last)
+        return [message for message in messages if message["seq"] > after]
+
+    async def flush(self) -> None:
+        """Write every queued message now."""
+        async with self._flush_lock():
+            if self.pending:
+                await self._write_batch()
+
+    def _in_memory(self, name: str) -> Dict[int, Dict[str, Any]]:
+        """Return a room's buffered and unsaved messages by sequence number."""
+        in_memory = {}
+        for room_name, message in self._writing + self.pending:
+            if room_name == name:
+                in_memory[message["seq"]] = message
+        room = self.rooms.get(name)
+        if room is not None:
+            in_memory.update((message["seq"], message) for message in room.messages)
+        return in_memory
+
+    def _ensure_writing(self) -> None:
+        if self._writer is None or self._writer.done():
+            self._wake = asyncio.Event()
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+            if not self._atexit_registered:
+                atexit.register(self._write_at_exit)
+                self._atexit_registered = True
+        elif len(self.pending) >= self.batch_size:
+            self._wake.set()
+
+    def _flush_lock(self) -> asyncio.Lock:
+        if self._flushing is None:
+            self._flushing = asyncio.Lock()
+        return self._flushing
+
+    async def _write_loop(self) -> None:
+        while self.pending:
+            if len(self.pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            async with self._flush_lock():
+                if not self.pending:
+                    continue
+                if not await self._write_batch():
+                    await asyncio.sleep(self.flush_interval)
+
+    async def _write_batch(self) -> bool:
+        batch, self.pending = self.pending, []
+        self._writing = batch
+        try:
+            shifts = await run_in_threadpool(self._write, batch)
+        except Exception as e:
+            print(f"Chat history write error: {e}")
+            self.pending[:0] = batch
+            self._drop_overflow()
+            return False
+        finally:
+            self._writing = []
+        for name, shift in shifts.items():
+            self._renumber(name, batch, shift)
+        for name, _ in batch:
+            room = self.rooms.get(name)
+            if room is not None:
+                room.unsaved -= 1
+        return True
+
+    def _renumber(self, name: str, batch: List[Tuple[str, Dict[str, Any]]], shift: int) -> None:
+        """Move a room's unsaved numbers past those another worker wrote, as the batch was."""
+        # Every unsaved message is in the batch or queued after it; buffered ones are the same dicts
+        for room_name, message in batch + self.pending:
+            if room_name == name:
+                message["seq"] += shift
+        room = self.rooms.get(name)
+        if room is None:
+            return
+        first = next(message["seq"] for room_name, message in batch if room_name == name)
+        # Older buffered messages no longer precede them without a gap; the database serves them
+        kept = [message for message in room.messages if message["seq"] >= first]
+        room.messages.clear()
+        room.messages.extend(kept)
+        room.last_seq += shift
+
+    def _drop_overflow(self) -> None:
+        overflow = len(self.pending) - self.max_pending
+        if overflow <= 0:
+            return
+        print(f"Chat history dropping {overflow} unsaved messages")
+        for name, _ in self.pending[:overflow]:
+            room = self.rooms.get(name)
+            if room is not None:
+                room.unsaved -= 1
+        del self.pending[:overflow]
+
+    def _write_at_exit(self) -> None:
+        batch, self.pending = self.pending, []
+        if batch:
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"Chat history write error: {e}")
+
+    def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Insert a batch in one transaction, numbering each room after the database's highest number.
+
+        Returns:
+            dict: How far each renumbered room's messages were moved; empty when none were.
+        """
+        first_seqs: Dict[str, int] = {}
+        for name, message in batch:
+            first_seqs.setdefault(name, message["seq"])
+        with self._write_lock:
+            self._ensure_table()
+            with Session(self.db_engine) as db, db.begin():
+                # One index lookup per room: MAX(seq) is the last entry of its (room, seq) range
+                last_seqs = db.execute(
+                    select(ChatMessage.room, func.max(ChatMessage.seq))
+                    .where(ChatMessage.room.in_(first_seqs))
+                    .group_by(ChatMessage.room)
+                ).all()
+                shifts = {
+                    name: last_seq + 1 - first_seqs[name]
+                    for name, last_seq in last_seqs
+                    if last_seq >= first_seqs[name]
+                }
+                rows = [
+                    {
+                        "room": name,
+                        "seq": message["seq"] + shifts.get(name, 0),
+                        "data": json.dumps(message["data"]),
+                        "created_at": datetime.fromisoformat(message["created_at"]),
+                    }
+                    for name, message in batch
+                ]
+                db.execute(insert(ChatMessage), rows)
+        return shifts
+
+    async def _load(self, name: str) -> RoomHistory:
+        messages = await run_in_threadpool(self._read_page, name, None, self.buffer_size)
+        room = RoomHistory(name, self.buffer_size, messages[-1]["seq"] if messages else 0)
+        room.messages.extend(messages)
+        self.rooms[name] = room
+        self._evict(keep=name)
+        return room
+
+    def _evict(self, keep: str) -> None:
+        excess = len(self.rooms) - self.max_rooms
+        if excess <= 0:
+            return
+        # Rooms with unsaved messages stay, or a reload would number from a stale database
+        idle = [name for name, room in self.rooms.items() if not room.unsaved and name != keep]
+        for name in idle[:excess]:
+            del self.rooms[name]
+
+    def _read_page(self, name: str, before: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        self._ensure_table()
+        # Range scan over the (room, seq) index
+        query = select(ChatMessage).where(ChatMessage.room == name)
+        if before is not None:
+            query = query.where(ChatMessage.seq < before)
+        with Session(self.db_engine) as db:
+            rows = db.scalars(query.order_by(ChatMessage.seq.desc()).limit(limit)).all()
+            return [
+                {"seq": row.seq, "data": json.loads(row.data), "created_at": row.created_at.isoformat()}
+                for row in reversed(rows)
+            ]
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            ChatMessage.__table__.create(bind=self.db_engine, checkfirst=True)
+            self._table_ready = True
+
+
+# Process-wide chat history used by the websocket routes
+history = ChatHistory()
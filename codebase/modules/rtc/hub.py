@@ -0,0 +1,379 @@
+"""
+Subscription hub for the RTC module
+Tracks websocket subscribers per channel (room) and fans out published events
+through a bounded send queue per connection
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from fnmatch import fnmatchcase
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Set, Union
+from modules.rtc.protocol import BINARY_CODEC, DEFLATE_CODEC, JSON_CODEC, encode_batch, encode_binary
+import config
+
+# Channel carrying alter switch events to every open page
+ALTER_CHANNEL = "alter"
+
+# Close code for consumers dropped for falling behind (1013: try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def thread_channel(thread_id: int) -> str:
+    """
+    Return the channel name used for live updates of a forum thread.
+
+    Parameters:
+        thread_id (int): ID of the forum thread.
+
+    Returns:
+        str: Channel name of the form "thread:{thread_id}".
+    """
+    return f"thread:{thread_id}"
+
+
+def chat_channel(room: str) -> str:
+    """
+    Return the channel name of a client-named chat room.
+
+    Clients only ever name rooms inside the "chat:" namespace, so they can't
+    join or publish to server channels such as threads or alter switches.
+
+    Parameters:
+        room (str): Room name chosen by the client.
+
+    Returns:
+        str: Channel name of the form "chat:{room}".
+    """
+    return f"chat:{room}"
+
+
+class CoalescePolicy(NamedTuple):
+    """
+    Batching of a busy room's events.
+
+    Events are held for up to ``interval`` seconds and then sent to each
+    member as one frame of at most ``max_batch`` events.
+    """
+    interval: float
+    max_batch: int
+
+
+class OutgoingMessage:
+    """
+    An event queued for delivery.
+
+    Each wire encoding is built at most once, however many members receive
+    the event in it.
+    """
+
+    __slots__ = ("event", "policy", "room_id", "seq", "created", "_text", "_binary", "_deflated")
+
+    def __init__(self, event: Dict[str, Any], policy: Optional[CoalescePolicy] = None, room_id: int = 0, seq: int = 0):
+        self.event = event
+        self.policy = policy
+        self.room_id = room_id
+        self.seq = seq
+        self.created = time.monotonic()
+        self._text: Optional[str] = None
+        self._binary: Optional[bytes] = None
+        self._deflated: Optional[bytes] = None
+
+    @property
+    def text(self) -> str:
+        """The event as a JSON text frame."""
+        if self._text is None:
+            self._text = json.dumps(self.event, separators=(",", ":"))
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        """The event as an uncompressed binary frame."""
+        if self._binary is None:
+            self._binary = encode_binary(self.event, self.room_id, self.seq)
+        return self._binary
+
+    def encoded(self, codec: str) -> Union[str, bytes]:
+        """Return the frame for a connection's codec."""
+        if codec == JSON_CODEC:
+            return self.text
+        if codec == BINARY_CODEC:
+            return self.binary
+        if self._deflated is None:
+            self._deflated = encode_binary(self.event, self.room_id, self.seq, deflate=True)
+        return self._deflated
+
+
+class Connection:
+    """
+    A subscribed websocket with its send queue.
+
+    Idle connections hold only an empty queue; a writer task exists only
+    while there is something to send, so memory per idle connection stays
+    flat however many are open.
+    """
+
+    __slots__ = ("websocket", "codec", "channels", "queue", "writer", "dropped")
+
+    def __init__(self, websocket: Any, codec: str = JSON_CODEC):
+        self.websocket = websocket
+        self.codec = codec
+        self.channels: Set[str] = set()
+        self.queue: Deque[OutgoingMessage] = deque()
+        self.writer: Optional[asyncio.Task] = None
+        # Messages discarded since the last successful send
+        self.dropped = 0
+
+
+class Room:
+    """Members of one channel and how its events are delivered."""
+
+    __slots__ = ("id", "name", "members", "policy")
+
+    def __init__(self, room_id: int, name: str, policy: Optional[CoalescePolicy] = None):
+        # Numeric id naming the room in binary frame headers
+        self.id = room_id
+        self.name = name
+        self.members: Set[Connection] = set()
+        self.policy = policy
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+
+class ChannelHub:
+    """
+    In-process registry of websocket subscribers keyed by channel name.
+
+    Other modules publish events (JSON-serialisable dicts) to a channel and the
+    hub queues them for every websocket currently subscribed to it. Publishing
+    never waits on a socket: each connection has its own queue of at most
+    ``queue_size`` messages, drained by a writer task. When a slow consumer's
+    queue is full the oldest message is dropped, so it sees a downsampled
+    stream; once it has dropped ``max_dropped`` messages without completing a
+    send it is disconnected. Subscribers whose send fails are treated as
+    disconnected and removed.
+
+    Channels matching a coalescing policy have their events batched: a
+    connection's writer waits out the policy's interval after the first event
+    and sends everything queued by then as one
+    ``{"type": "batch", "events": [...]}`` frame, cutting send calls in busy
+    rooms by the batch size.
+
+    Each connection receives frames in its own codec: JSON text, or binary
+    frames, optionally deflated (see modules.rtc.protocol). Every encoding of
+    an event is built once per publish, so compression costs the same for
+    one member as for a thousand.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, max_dropped: Optional[int] = None):
+        self.queue_size = config.RTC_SEND_QUEUE_SIZE if queue_size is None else queue_size
+        self.max_dropped = config.RTC_MAX_DROPPED if max_dropped is None else max_dropped
+        self.channels: Dict[str, Room] = {}
+        self.connections: Dict[Any, Connection] = {}
+        self.rooms_by_id: Dict[int, Room] = {}
+        self._room_ids = itertools.count(1)
+        # Channel name or fnmatch pattern -> coalescing policy
+        self.policies: Dict[str, CoalescePolicy] = {}
+        if config.RTC_COALESCE_MS > 0:
+            self.set_policy(chat_channel("*"), CoalescePolicy(config.RTC_COALESCE_MS / 1000, config.RTC_COALESCE_MAX_BATCH))
+
+    def set_policy(self, pattern: str, policy: Optional[CoalescePolicy]) -> None:
+        """
+        Set or clear the coalescing policy of a channel or of every channel matching a pattern.
+
+        Parameters:
+            pattern (str): Channel name or fnmatch pattern, e.g. "chat:*".
+            policy (Optional[CoalescePolicy]): Batching to apply, or None to send events one by one.
+        """
+        if policy is None:
+            self.policies.pop(pattern, None)
+        else:
+            self.policies[pattern] = policy
+        for room in self.channels.values():
+            room.policy = self.policy_for(room.name)
+
+    def policy_for(self, channel: str) -> Optional[CoalescePolicy]:
+        """Return the coalescing policy of a channel; an exact name beats a pattern."""
+        if channel in self.policies:
+            return self.policies[channel]
+        for pattern, policy in self.policies.items():
+            if fnmatchcase(channel, pattern):
+                return policy
+        return None
+
+    def subscribe(self, channel: str, websocket: Any, codec: str = JSON_CODEC) -> None:
+        """Add a websocket to the subscribers of a channel, receiving frames in the given codec."""
+        connection = self.connections.get(websocket)
+        if connection is None:
+            connection = self.connections[websocket] = Connection(websocket, codec)
+        connection.codec = codec
+        room = self.channels.get(channel)
+        if room is None:
+            room = Room(next(self._room_ids), channel, self.policy_for(channel))
+            self.channels[channel] = self.rooms_by_id[room.id] = room
+        room.members.add(connection)
+        connection.channels.add(channel)
+
+    def unsubscribe(self, channel: str, websocket: Any) -> None:
+        """Remove a websocket from a channel, dropping the channel once it is empty."""
+        connection = self.connections.get(websocket)
+        room = self.channels.get(channel)
+        if connection is None or room is None:
+            return
+        room.members.discard(connection)
+        connection.channels.discard(channel)
+        if not room.members:
+            del self.channels[channel]
+            del self.rooms_by_id[room.id]
+        if not connection.channels and not connection.queue:
+            self._forget(connection)
+
+    def disconnect(self, websocket: Any) -> None:
+        """Remove a websocket from every channel and discard anything still queued for it."""
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        for channel in list(connection.channels):
+            self.unsubscribe(channel, websocket)
+        connection.queue.clear()
+        self._forget(connection)
+
+    def subscriber_count(self, channel: str) -> int:
+        """Return the number of websockets subscribed to a channel."""
+        room = self.channels.get(channel)
+        return len(room) if room else 0
+
+    def room_id(self, channel: str) -> int:
+        """Return the numeric id of a channel's room, or 0 if nobody is subscribed."""
+        room = self.channels.get(channel)
+        return room.id if room else 0
+
+    def channel_of(self, room_id: int) -> Optional[str]:
+        """Return the channel name of a room id, or None if no such room exists."""
+        room = self.rooms_by_id.get(room_id)
+        return room.name if room else None
+
+    def channels_of(self, websocket: Any) -> Set[str]:
+        """Return the channels a websocket is subscribed to."""
+        connection = self.connections.get(websocket)
+        return set(connection.channels) if connection else set()
+
+    async def publish(self, channel: str, event: Dict[str, Any]) -> int:
+        """
+        Queue an event for every subscriber of a channel.
+
+        Args:
+            channel: Name of the channel to publish to
+            event: JSON-serialisable event payload; its "seq", if any, goes
+                in the header of binary frames
+
+        Returns:
+            Number of subscribers the event was queued for
+        """
+        room = self.channels.get(channel)
+        if room is None:
+            return 0
+        message = OutgoingMessage(event, room.policy, room.id, event.get("seq", 0))
+        # Iterate over a copy so slow consumers can be dropped while we queue
+        for connection in list(room.members):
+            self._enqueue(connection, message)
+        return len(room.members)
+
+    def send(self, websocket: Any, event: Dict[str, Any]) -> bool:
+        """
+        Queue an event for one subscribed websocket, behind anything already queued for it.
+
+        Returns:
+            bool: False if the websocket isn't subscribed to anything.
+        """
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return False
+        self._enqueue(connection, OutgoingMessage(event))
+        return True
+
+    async def flush(self) -> None:
+        """Wait until every queued message has been sent or dropped."""
+        while True:
+            writers = [connection.writer for connection in self.connections.values() if connection.writer]
+            if not writers:
+                return
+            await asyncio.gather(*writers, return_exceptions=True)
+
+    def _enqueue(self, connection: Connection, message: OutgoingMessage) -> None:
+        if len(connection.queue) >= self.queue_size:
+            connection.queue.popleft()
+            connection.dropped += 1
+            if connection.dropped >= self.max_dropped:
+                self._drop_slow_consumer(connection)
+                return
+        connection.queue.append(message)
+        if connection.writer is None:
+            connection.writer = asyncio.get_running_loop().create_task(self._drain(connection))
+
+    async def _drain(self, connection: Connection) -> None:
+        queue = connection.queue
+        try:
+            while queue:
+                policy = queue[0].policy
+                if policy is None:
+                    frame = queue.popleft().encoded(connection.codec)
+                else:
+                    # Let the room's events pile up until the tick, then send them together
+                    delay = queue[0].created + policy.interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    frame = batch_frame(self._take_batch(queue, policy.max_batch), connection.codec)
+                if isinstance(frame, bytes):
+                    await connection.websocket.send_bytes(frame)
+                else:
+                    await connection.websocket.send_text(frame)
+                connection.dropped = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(connection.websocket)
+        finally:
+            connection.writer = None
+            # A connection that left every channel lingers only until its queue drains
+            if not connection.channels:
+                self._forget(connection)
+
+    def _take_batch(self, queue: Deque[OutgoingMessage], max_batch: int) -> List[OutgoingMessage]:
+        # Events from rooms without a policy stay queued, in order, behind the batch
+        batch = []
+        while queue and queue[0].policy is not None and len(batch) < max_batch:
+            batch.append(queue.popleft())
+        return batch
+
+    def _drop_slow_consumer(self, connection: Connection) -> None:
+        websocket = connection.websocket
+        writer = connection.writer
+        self.disconnect(websocket)
+        if writer is not None:
+            writer.cancel()
+        asyncio.get_running_loop().create_task(_close_quietly(websocket, SLOW_CONSUMER_CLOSE_CODE))
+
+    def _forget(self, connection: Connection) -> None:
+        if self.connections.get(connection.websocket) is connection:
+            del self.connections[connection.websocket]
+
+
+def batch_frame(messages: List[OutgoingMessage], codec: str = JSON_CODEC) -> Union[str, bytes]:
+    """Join already-encoded events into one batch frame without encoding them again."""
+    if codec == JSON_CODEC:
+        return '{"type":"batch","events":[' + ",".join(message.text for message in messages) + "]}"
+    return encode_batch((message.binary for message in messages), deflate=codec == DEFLATE_CODEC)
+
+
+async def _close_quietly(websocket: Any, code: int) -> None:
+    try:
+        await asyncio.wait_for(websocket.close(code=code), timeout=5)
+    except Exception:
+        pass
+
+
+# Process-wide hub shared by the RTC routes and publishing modules
+hub = ChannelHub()
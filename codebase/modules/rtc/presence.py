@@ -0,0 +1,233 @@
+"""
+Presence - Who is connected to each RTC channel
+Heartbeat deadlines live on a hashed timer wheel advanced by a single task,
+so idle sessions cost no task or timer handle of their own
+"""
+import asyncio
+import math
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+import config
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel of deadlines counted in ticks.
+
+    A timer due on tick ``t`` lives in slot ``t % slots``; advancing the wheel
+    visits only the slots of the ticks that passed since the last advance.
+    With more slots than the longest delay in ticks, a slot holds nothing but
+    the timers due on its tick, so an advance costs O(expired) however many
+    timers are armed. Arming, rearming and cancelling are O(1).
+    """
+
+    def __init__(self, slots: int, tick: float, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self.slots: List[Dict[Hashable, int]] = [{} for _ in range(slots)]
+        self.deadlines: Dict[Hashable, int] = {}
+        self.current = math.floor(clock() / tick)
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def schedule(self, key: Hashable, delay: float) -> None:
+        """Arm the timer of a key to fire ``delay`` seconds from now, replacing any earlier one."""
+        self.cancel(key)
+        deadline = max(math.ceil((self.clock() + delay) / self.tick), self.current + 1)
+        self.deadlines[key] = deadline
+        self.slots[deadline % len(self.slots)][key] = deadline
+
+    def cancel(self, key: Hashable) -> bool:
+        """Disarm the timer of a key; returns False if it had none."""
+        deadline = self.deadlines.pop(key, None)
+        if deadline is None:
+            return False
+        del self.slots[deadline % len(self.slots)][key]
+        return True
+
+    def advance(self) -> List[Hashable]:
+        """Remove the timers due by now and return their keys."""
+        target = math.floor(self.clock() / self.tick)
+        expired: List[Hashable] = []
+        # After falling more than a turn behind, every slot is visited once
+        for tick in range(max(self.current + 1, target - len(self.slots) + 1), target + 1):
+            slot = self.slots[tick % len(self.slots)]
+            # Timers due on a later turn of the wheel stay where they are
+            due = [key for key, deadline in slot.items() if deadline <= target]
+            for key in due:
+                del slot[key]
+                del self.deadlines[key]
+            expired.extend(due)
+        self.current = max(self.current, target)
+        return expired
+
+
+class PresenceSession:
+    """One connection's identity, the channels it is in and whether its heartbeat is current."""
+
+    __slots__ = ("websocket", "user", "channels", "active")
+
+    def __init__(self, websocket: Any, user: Optional[str] = None):
+        self.websocket = websocket
+        self.user = user
+        self.channels: Set[str] = set()
+        self.active = True
+
+
+class ChannelPresence:
+    """Connections counted in one channel: named users by connection count, plus anonymous ones."""
+
+    __slots__ = ("users", "anonymous")
+
+    def __init__(self):
+        self.users: Dict[str, int] = {}
+        self.anonymous = 0
+
+    def __len__(self) -> int:
+        # A user with several tabs open is one person
+        return len(self.users) + self.anonymous
+
+
+class Presence:
+    """
+    Who is in each hub channel, kept current by heartbeats.
+
+    Every frame a client sends counts as a heartbeat and rearms its session's
+    timer on a ``TimerWheel``. One ticker task, running only while sessions
+    exist, advances the wheel every ``tick`` seconds; sessions silent for
+    ``timeout`` seconds stop being counted until they are heard from again.
+    Counts per channel are maintained as sessions come and go, so snapshots
+    are O(1) for the count and O(users) for the names.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        tick: Optional[float] = None,
+        slots: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.timeout = config.RTC_PRESENCE_TIMEOUT if timeout is None else timeout
+        self.tick = config.RTC_PRESENCE_TICK if tick is None else tick
+        slots = config.RTC_PRESENCE_WHEEL_SLOTS if slots is None else slots
+        self.wheel = TimerWheel(slots, self.tick, clock)
+        self.sessions: Dict[Any, PresenceSession] = {}
+        self.channels: Dict[str, ChannelPresence] = {}
+        self._ticker: Optional[asyncio.Task] = None
+
+    def connect(self, websocket: Any, user: Optional[str] = None) -> None:
+        """Start tracking a websocket, optionally as a named user."""
+        if websocket not in self.sessions:
+            self.sessions[websocket] = PresenceSession(websocket, user)
+        self.touch(websocket)
+
+    def identify(self, websocket: Any, user: Optional[str]) -> None:
+        """Name the user behind a tracked websocket, moving its counts to the new identity."""
+        session = self.sessions.get(websocket)
+        if session is None or session.user == user:
+            return
+        if session.active:
+            for channel in session.channels:
+                self._count(session, channel, -1)
+        session.user = user
+        if session.active:
+            for channel in session.channels:
+                self._count(session, channel, 1)
+
+    def enter(self, websocket: Any, channel: str) -> None:
+        """Count a tracked websocket as present in a channel."""
+        session = self.sessions.get(websocket)
+        if session is None or channel in session.channels:
+            return
+        session.channels.add(channel)
+        if session.active:
+            self._count(session, channel, 1)
+
+    def leave(self, websocket: Any, channel: str) -> None:
+        """Stop counting a websocket in a channel."""
+        session = self.sessions.get(websocket)
+        if session is None or channel not in session.channels:
+            return
+        session.channels.discard(channel)
+        if session.active:
+            self._count(session, channel, -1)
+
+    def touch(self, websocket: Any) -> None:
+        """Record a heartbeat, counting the session again if it had expired."""
+        session = self.sessions.get(websocket)
+        if session is None:
+            return
+        if not session.active:
+            session.active = True
+            for channel in session.channels:
+                self._count(session, channel, 1)
+        self.wheel.schedule(websocket, self.timeout)
+        self._ensure_ticking()
+
+    def disconnect(self, websocket: Any) -> None:
+        """Stop tracking a websocket."""
+        session = self.sessions.pop(websocket, None)
+        if session is None:
+            return
+        self.wheel.cancel(websocket)
+        if session.active:
+            for channel in session.channels:
+                self._count(session, channel, -1)
+
+    def count(self, channel: str) -> int:
+        """Return the number of people present in a channel."""
+        presence = self.channels.get(channel)
+        return len(presence) if presence else 0
+
+    def snapshot(self, channel: str) -> Dict[str, Any]:
+        """Return the count and the named users present in a channel."""
+        presence = self.channels.get(channel)
+        if presence is None:
+            return {"online": 0, "users": []}
+        return {"online": len(presence), "users": sorted(presence.users)}
+
+    def expire(self) -> int:
+        """
+        Stop counting the sessions whose heartbeat is overdue.
+
+        Returns:
+            int: Number of sessions that expired.
+        """
+        expired = self.wheel.advance()
+        for websocket in expired:
+            session = self.sessions.get(websocket)
+            if session is None or not session.active:
+                continue
+            session.active = False
+            for channel in session.channels:
+                self._count(session, channel, -1)
+        return len(expired)
+
+    def _count(self, session: PresenceSession, channel: str, delta: int) -> None:
+        presence = self.channels.get(channel)
+        if presence is None:
+            presence = self.channels[channel] = ChannelPresence()
+        if session.user is None:
+            presence.anonymous += delta
+        else:
+            connections = presence.users.get(session.user, 0) + delta
+            if connections:
+                presence.users[session.user] = connections
+            else:
+                del presence.users[session.user]
+        if not len(presence):
+            del self.channels[channel]
+
+    def _ensure_ticking(self) -> None:
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.get_running_loop().create_task(self._tick())
+
+    async def _tick(self) -> None:
+        while len(self.wheel):
+            await asyncio.sleep(self.tick)
+            self.expire()
+
+
+# Process-wide presence used by the websocket routes
+presence = Presence()
@@ -0,0 +1,134 @@
+"""
+Wire formats for the RTC websocket
+JSON text frames for old clients, and compact binary frames with optional
+deflate for clients that negotiate them
+"""
+import json
+import struct
+import zlib
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+import config
+
+# Codecs a client can ask for with ?protocol=
+JSON_CODEC = "json"
+BINARY_CODEC = "binary"
+DEFLATE_CODEC = "binary-deflate"
+CODECS = (JSON_CODEC, BINARY_CODEC, DEFLATE_CODEC)
+
+# Binary frame header: flags, type, room id, sequence number (10 bytes, network order)
+HEADER = struct.Struct("!BBII")
+FLAG_DEFLATE = 0x01
+
+# Length prefix of each frame inside a batch
+BATCH_LENGTH = struct.Struct("!I")
+
+# Event types with a code of their own; any other type is sent as TYPE_EVENT
+# with its "type" key left in the payload
+TYPE_EVENT = 0
+TYPE_CODES = {"message": 1, "batch": 2, "joined": 3, "left": 4, "error": 5, "post": 6, "alter": 7}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+
+class Frame(NamedTuple):
+    """A decoded binary frame."""
+    type: str
+    room_id: int
+    seq: int
+    body: Any
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _deflate(payload: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(payload) + compressor.flush()
+
+
+def _pack(type_code: int, room_id: int, seq: int, payload: bytes, deflate: bool) -> bytes:
+    flags = 0
+    if deflate and len(payload) >= config.RTC_DEFLATE_MIN_SIZE:
+        compressed = _deflate(payload, config.RTC_DEFLATE_LEVEL)
+        # Small or already dense payloads can grow; send those as they are
+        if len(compressed) < len(payload):
+            payload, flags = compressed, FLAG_DEFLATE
+    return HEADER.pack(flags, type_code, room_id & 0xFFFFFFFF, seq & 0xFFFFFFFF) + payload
+
+
+def encode_binary(event: Dict[str, Any], room_id: int = 0, seq: int = 0, deflate: bool = False) -> bytes:
+    """
+    Encode an event as a binary frame.
+
+    The header carries the event's type, room and sequence number, so those
+    keys are left out of the JSON payload.
+
+    Parameters:
+        event (Dict[str, Any]): JSON-serialisable event with a "type" key.
+        room_id (int): Numeric id of the room the event belongs to, 0 for none.
+        seq (int): Sequence number of the event in its room, 0 for none.
+        deflate (bool): Compress payloads of at least RTC_DEFLATE_MIN_SIZE bytes.
+
+    Returns:
+        bytes: The frame.
+    """
+    type_code = TYPE_CODES.get(event.get("type"), TYPE_EVENT)
+    omit = {"seq", "room"} if room_id else {"seq"}
+    if type_code != TYPE_EVENT:
+        omit.add("type")
+    body = {key: value for key, value in event.items() if key not in omit}
+    return _pack(type_code, room_id, seq, _dumps(body), deflate)
+
+
+def encode_batch(frames: Iterable[bytes], deflate: bool = False) -> bytes:
+    """
+    Wrap uncompressed binary frames in one batch frame.
+
+    The batch is deflated as a whole, which compresses far better than its
+    frames would one by one.
+    """
+    payload = b"".join(BATCH_LENGTH.pack(len(frame)) + frame for frame in frames)
+    return _pack(TYPE_CODES["batch"], 0, 0, payload, deflate)
+
+
+def decode_binary(frame: bytes) -> Frame:
+    """
+    Decode a binary frame; the body of a batch is the list of its decoded frames.
+
+    Raises:
+        ValueError: If the frame is truncated or its payload isn't valid.
+    """
+    if len(frame) < HEADER.size:
+        raise ValueError("Truncated frame")
+    flags, type_code, room_id, seq = HEADER.unpack_from(frame)
+    payload = frame[HEADER.size:]
+    if flags & FLAG_DEFLATE:
+        try:
+            payload = zlib.decompress(payload, -zlib.MAX_WBITS)
+        except zlib.error as e:
+            raise ValueError(f"Invalid compressed payload: {e}")
+    type_name = TYPE_NAMES.get(type_code)
+    if type_name == "batch":
+        return Frame("batch", room_id, seq, list(_split_batch(payload)))
+    body = json.loads(payload) if payload else {}
+    if type_name is None:
+        type_name = body.get("type", "event") if isinstance(body, dict) else "event"
+    return Frame(type_name, room_id, seq, body)
+
+
+def _split_batch(payload: bytes) -> Iterable[Frame]:
+    offset = 0
+    while offset < len(payload):
+        if offset + BATCH_LENGTH.size > len(payload):
+            raise ValueError("Truncated batch")
+        (length,) = BATCH_LENGTH.unpack_from(payload, offset)
+        offset += BATCH_LENGTH.size
+        if offset + length > len(payload):
+            raise ValueError("Truncated batch")
+        yield decode_binary(payload[offset:offset + length])
+        offset += length
+
+
+def select_codec(requested: Optional[str]) -> str:
+    """Return the codec a client asked for, falling back to JSON for unknown or missing values."""
+    return requested if requested in CODECS else JSON_CODEC
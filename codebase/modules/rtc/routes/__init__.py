@@ -2,11 +2,13 @@
 Routes for the RTC module
 """
 from fastapi import APIRouter
-from . import ws
+from . import history, presence, ws
 
 
 # Create main router for RTC module
 router = APIRouter()
 
 # Include sub-routes
-router.include_router(ws.router, prefix="/ws", tags=["websocket"])
\ No newline at end of file
+router.include_router(ws.router, prefix="/ws", tags=["websocket"])
+router.include_router(history.router, prefix="/rooms", tags=["history"])
+router.include_router(presence.router, prefix="/presence", tags=["presence"])
\ No newline at end of file
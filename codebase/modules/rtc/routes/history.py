@@ -0,0 +1,37 @@
+"""
+Chat history routes for the RTC module
+"""
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from modules.rtc.history import history
+from modules.rtc.routes.ws import MAX_ROOM_NAME
+
+
+router = APIRouter()
+
+# Largest page of messages one request may ask for
+MAX_PAGE_SIZE = 200
+
+
+@router.get("/{room}/history")
+async def get_room_history(room: str, before: Optional[int] = None, limit: int = 50):
+    """
+    Get a page of a chat room's messages, for scrolling back past what joiners are replayed.
+
+    Args:
+        room: Name of the chat room
+        before: Sequence number of the oldest message the client already has;
+            omit it for the latest messages
+        limit: Number of messages to return, at most 200
+
+    Returns:
+        The messages, oldest first, and the ``next_before`` cursor for the
+        page before them, or None when there are no older messages
+    """
+    if not 0 < len(room) <= MAX_ROOM_NAME:
+        raise HTTPException(status_code=400, detail="Invalid room")
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    messages = await history.page(room, before, limit)
+    oldest = messages[0]["seq"] if messages else None
+    return {"room": room, "messages": messages, "next_before": oldest if oldest and oldest > 1 else None}
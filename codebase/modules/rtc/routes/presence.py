@@ -0,0 +1,43 @@
+"""
+Presence routes for the RTC module
+"""
+from fastapi import APIRouter, HTTPException
+from modules.rtc.hub import chat_channel, thread_channel
+from modules.rtc.presence import presence
+from modules.rtc.routes.ws import MAX_ROOM_NAME
+
+
+router = APIRouter()
+
+# Presence is only ever touched on the event loop, so these handlers are async
+# rather than sync endpoints run in the threadpool
+
+
+@router.get("/threads/{thread_id}")
+async def get_thread_presence(thread_id: int):
+    """
+    Get the number of people viewing a forum thread.
+
+    Args:
+        thread_id: ID of the thread
+
+    Returns:
+        The thread ID and the number of people with it open
+    """
+    return {"thread_id": thread_id, "viewing": presence.count(thread_channel(thread_id))}
+
+
+@router.get("/rooms/{room}")
+async def get_room_presence(room: str):
+    """
+    Get who is in a chat room.
+
+    Args:
+        room: Name of the chat room
+
+    Returns:
+        The number of people in the room and the names of those who signed in
+    """
+    if not 0 < len(room) <= MAX_ROOM_NAME:
+        raise HTTPException(status_code=400, detail="Invalid room")
+    return {"room": room, **presence.snapshot(chat_channel(room))}
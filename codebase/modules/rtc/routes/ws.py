@@ -1,29 +1,268 @@
 """
 WebSocket routes for the RTC module
 """
-from fastapi import APIRouter
+import json
+from typing import Any, Dict, Optional, Union
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+from modules.rtc.history import history
+from modules.rtc.hub import OutgoingMessage, chat_channel, hub, thread_channel
+from modules.rtc.presence import presence
+from modules.rtc.protocol import JSON_CODEC, decode_binary, select_codec
+from utils.security import verify_access_token
+import config
 
 
 router = APIRouter()
 
+# Longest chat room name a client may use
+MAX_ROOM_NAME = 64
+
+
+def parse_command(data: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a client text frame as a room command.
+
+    Returns:
+        dict: The command, or None if the frame isn't a JSON object with an "action".
+    """
+    if not data.startswith("{"):
+        return None
+    try:
+        command = json.loads(data)
+    except ValueError:
+        return None
+    return command if isinstance(command, dict) and "action" in command else None
+
+
+def parse_binary_command(data: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Parse a client binary frame as a room command.
+
+    A "message" frame sends its "data" to the chat room named by the room id
+    in its header; any other frame must carry a JSON command as its payload.
+
+    Returns:
+        dict: The command, or None if the frame isn't a valid command.
+    """
+    try:
+        frame = decode_binary(data)
+    except ValueError:
+        return None
+    body = frame.body if isinstance(frame.body, dict) else {}
+    if frame.type == "message":
+        channel = hub.channel_of(frame.room_id)
+        if channel is None or not channel.startswith("chat:"):
+            return None
+        return {"action": "send", "room": channel[len("chat:"):], "data": body.get("data")}
+    return body if "action" in body else None
+
+
+def token_user(token: Optional[str]) -> Optional[str]:
+    """Return the user an access token was issued to, or None for a missing or invalid token."""
+    if not token:
+        return None
+    result = verify_access_token(token)
+    return result["payload"].get("sub") if result["valid"] else None
+
+
+async def handle_command(websocket: Any, command: Dict[str, Any], codec: str = JSON_CODEC) -> Optional[Dict[str, Any]]:
+    """
+    Carry out a room command from a client.
+
+    Args:
+        websocket: WebSocket connection the command came from
+        command: Parsed command
+        codec: Codec room events are sent to the client in
+
+    Returns:
+        Reply event for the client, or None if there is nothing to reply
+    """
+    if command["action"] == "ping":
+        # Any frame is a heartbeat; this one just asks for proof the server is there
+        return {"type": "pong"}
+    if command["action"] == "auth":
+        user = token_user(command.get("token"))
+        if user is None:
+            return {"type": "error", "error": "Invalid token"}
+        presence.identify(websocket, user)
+        return {"type": "authenticated", "user": user}
+    room = command.get("room")
+    if not isinstance(room, str) or not 0 < len(room) <= MAX_ROOM_NAME:
+        return {"type": "error", "error": "Invalid room"}
+    channel = chat_channel(room)
+    joined = channel in hub.channels_of(websocket)
+    action = command["action"]
+
+    if action == "join":
+        rooms = [name for name in hub.channels_of(websocket) if name.startswith("chat:")]
+        if not joined and len(rooms) >= config.RTC_MAX_ROOMS:
+            return {"type": "error", "error": "Too many rooms", "room": room}
+        resume_from = command.get("resume_from")
+        if resume_from is not None and (type(resume_from) is not int or resume_from < 0):
+            return {"type": "error", "error": "Invalid resume_from", "room": room}
+        # Replay is gathered before subscribing so no live message can arrive ahead of it
+        room_history = await history.room(room)
+        replay = None if resume_from is None else await history.since(room, resume_from)
+        resync = resume_from is not None and replay is None
+        if replay is None:
+            replay = list(room_history.messages)
+        hub.subscribe(channel, websocket, codec)
+        presence.enter(websocket, channel)
+        reply = {
+            "type": "joined",
+            "room": room,
+            "room_id": hub.room_id(channel),
+            "members": hub.subscriber_count(channel),
+            "seq": room_history.last_seq,
+            "history": replay,
+        }
+        if resume_from is not None:
+            reply["resync"] = resync
+        return reply
+    if action == "leave":
+        hub.unsubscribe(channel, websocket)
+        presence.leave(websocket, channel)
+        return {"type": "left", "room": room}
+    if action == "send":
+        if not joined:
+            return {"type": "error", "error": "Not in room", "room": room}
+        message = await history.append(room, command.get("data"))
+        await hub.publish(channel, {"type": "message", "room": room, "seq": message["seq"], "data": message["data"]})
+        return None
+    return {"type": "error", "error": f"Unknown action: {action}"}
+
+
+async def receive_frame(websocket: Any, codec: str = JSON_CODEC) -> Union[str, bytes]:
+    """Receive a frame from a client; binary clients may send text or binary frames."""
+    if codec == JSON_CODEC:
+        return await websocket.receive_text()
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message.get("text") or ""
+
+
+async def send_reply(websocket: Any, event: Dict[str, Any], codec: str = JSON_CODEC) -> None:
+    """Send a reply to a client, behind any room messages already on their way to it."""
+    if hub.send(websocket, event):
+        return
+    frame = OutgoingMessage(event).encoded(codec)
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket):
+async def websocket_endpoint(
+    websocket: WebSocket,
+    protocol: str = JSON_CODEC,
+    room: Optional[str] = None,
+    resume_from: Optional[int] = None,
+):
     """
-    WebSocket endpoint for real-time communication.
+    WebSocket endpoint for chat rooms.
+
+    Clients send JSON commands to join, leave and talk in named rooms:
+    ``{"action": "join", "room": "lobby"}``, ``{"action": "leave", "room": "lobby"}``
+    and ``{"action": "send", "room": "lobby", "data": ...}``. Every member of
+    the room, the sender included, receives
+    ``{"type": "message", "room": "lobby", "seq": 7, "data": ...}`` through
+    the hub, numbered per room. The "joined" reply carries the room's latest
+    messages in ``history`` and the room's newest number in ``seq``.
+
+    A reconnecting client adds ``"resume_from": <seq>`` to its join, or opens
+    the socket with ``?room=lobby&resume_from=<seq>``, to be replayed only the
+    messages after that number. When it missed more than RTC_RESUME_MAX_GAP
+    messages, or the number is unknown, the reply has ``"resync": true`` and
+    the usual latest messages, and the client should reload the room.
+
+    With ``?protocol=binary`` or ``?protocol=binary-deflate`` the server sends
+    binary frames instead (see modules.rtc.protocol), and the client may send
+    messages as binary "message" frames addressed by the room id it got when
+    joining. In JSON mode any other text is echoed back with an "Echo: " prefix.
+
+    Every frame counts as a presence heartbeat; idle clients should send
+    ``{"action": "ping"}`` more often than RTC_PRESENCE_TIMEOUT. Clients that
+    send ``{"action": "auth", "token": <access token>}``, normally as their
+    first frame, are listed by name in presence snapshots, others are only
+    counted. Tokens are never read from the URL, which ends up in access logs.
     
     Args:
         websocket: WebSocket connection
+        protocol: Codec to send frames in; unknown values fall back to JSON
+        room: Chat room to join straight away
+        resume_from: Sequence number of the last message the client has in ``room``
     """
-    await websocket.accept()
+    codec = select_codec(protocol)
     try:
+        await websocket.accept()
+        presence.connect(websocket)
+        if room is not None:
+            command = {"action": "join", "room": room}
+            if resume_from is not None:
+                command["resume_from"] = resume_from
+            await send_reply(websocket, await handle_command(websocket, command, codec), codec)
         while True:
-            data = await websocket.receive_text()
-            await websocket.send_text(f"Echo: {data}")
+            data = await receive_frame(websocket, codec)
+            presence.touch(websocket)
+            if isinstance(data, bytes):
+                command = parse_binary_command(data)
+            else:
+                command = parse_command(data)
+                if command is None and codec == JSON_CODEC:
+                    await websocket.send_text(f"Echo: {data}")
+                    continue
+            if command is None:
+                await send_reply(websocket, {"type": "error", "error": "Invalid frame"}, codec)
+                continue
+            reply = await handle_command(websocket, command, codec)
+            if reply is not None:
+                await send_reply(websocket, reply, codec)
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        await websocket.close()
+        hub.disconnect(websocket)
+        presence.disconnect(websocket)
+        if websocket.client_state != WebSocketState.DISCONNECTED:
+            await websocket.close()
+
+
+@router.websocket("/threads/{thread_id}")
+async def thread_updates(websocket: WebSocket, thread_id: int):
+    """
+    WebSocket endpoint streaming live updates for a forum thread.
+
+    The connection is subscribed to the thread's hub channel until the client
+    disconnects, and counts as viewing the thread while it keeps sending
+    heartbeats. A ``{"action": "auth", "token": <access token>}`` frame names
+    the viewer in presence snapshots; other messages are otherwise ignored.
+
+    Args:
+        websocket: WebSocket connection
+        thread_id: ID of the thread to follow
+    """
+    channel = thread_channel(thread_id)
+    await websocket.accept()
+    hub.subscribe(channel, websocket)
+    presence.connect(websocket)
+    presence.enter(websocket, channel)
+    try:
+        while True:
+            command = parse_command(await websocket.receive_text())
+            presence.touch(websocket)
+            if command is not None and command["action"] == "auth":
+                presence.identify(websocket, token_user(command.get("token")))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(websocket)
+        presence.disconnect(websocket)
 
 
 @router.get("/")
@@ -34,4 +273,4 @@ def get_rtc_info():
     Returns:
         Information about the RTC module
     """
-    return {"message": "RTC module is running", "features": ["websockets", "real-time messaging"]}
\ No newline at end of file
+    return {"message": "RTC module is running", "features": ["websockets", "real-time messaging", "chat rooms", "chat history", "presence"]}
\ No newline at end of file
@@ -0,0 +1,96 @@
+// Re-theme open pages in place when the fronting alter switches
+document.addEventListener('DOMContentLoaded', function() {
+    function currentVersion() {
+        return parseInt(document.body.dataset.alterVersion, 10) || 0;
+    }
+
+    // Swap one group of stylesheet links, removing the old ones once the new ones load
+    function swapStylesheets(oldLinks, html) {
+        const fragment = document.createElement('template');
+        fragment.innerHTML = html;
+        const newLinks = Array.from(fragment.content.querySelectorAll('link'));
+        if (!newLinks.length) {
+            return;
+        }
+
+        let pending = newLinks.length;
+        function done() {
+            pending -= 1;
+            if (pending === 0) {
+                oldLinks.forEach(link => link.remove());
+            }
+        }
+        newLinks.forEach(link => {
+            link.addEventListener('load', done);
+            link.addEventListener('error', done);
+        });
+        oldLinks[oldLinks.length - 1].after(...newLinks);
+    }
+
+    function applySwitch(event) {
+        if (event.version <= currentVersion()) {
+            return;
+        }
+        document.body.dataset.alterVersion = event.version;
+
+        // Group the page's links by the module they were rendered for
+        const groups = {};
+        document.querySelectorAll('link[data-stylesheet-module]').forEach(link => {
+            const module = link.dataset.stylesheetModule;
+            (groups[module] = groups[module] || []).push(link);
+        });
+        Object.keys(groups).forEach(module => {
+            const html = event.stylesheets[module];
+            if (html !== undefined) {
+                swapStylesheets(groups[module], html);
+            }
+        });
+
+        const nav = document.getElementById('alter-nav');
+        if (nav) {
+            nav.outerHTML = event.nav;
+        }
+        const footer = document.getElementById('alter-footer');
+        if (footer) {
+            footer.outerHTML = event.footer;
+        }
+    }
+
+    let socket = null;
+
+    // Switch without leaving the page; the broadcast re-themes every open tab
+    document.addEventListener('click', function(e) {
+        const button = e.target.closest('.alter-btn');
+        if (!button) {
+            return;
+        }
+        e.preventDefault();
+        fetch(button.href).then(response => {
+            if (!socket || socket.readyState !== WebSocket.OPEN) {
+                window.location.reload();
+            }
+        });
+    });
+
+    let retryDelay = 1000;
+    function connect() {
+        const scheme = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+        socket = new WebSocket(scheme + window.location.host + '/alter/live?version=' + currentVersion());
+
+        socket.onopen = function() {
+            retryDelay = 1000;
+        };
+        socket.onmessage = function(message) {
+            const event = JSON.parse(message.data);
+            if (event.type === 'alter') {
+                applySwitch(event);
+            }
+        };
+        socket.onclose = function() {
+            // Reconnect with capped exponential backoff
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    }
+    connect();
+});
@@ -0,0 +1,514 @@
+"""
+Static asset pipeline
+Content-hashes static files, bundles per-alter stylesheets, writes
+gzip-precompressed variants and serves the fingerprinted copies with
+long-lived immutable caching
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import stat
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import anyio
+from fastapi import FastAPI
+from markupsafe import Markup, escape
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+import config
+from utils.compression import accepts_gzip
+
+# URL prefix the fingerprinted assets are served under
+ASSET_URL_PREFIX = "/assets"
+
+# Fingerprinted URLs never change content, so browsers may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Text formats worth precompressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".html", ".json", ".txt", ".map"}
+
+# Files smaller than this are not worth a gzip variant
+MIN_COMPRESS_SIZE = 256
+
+
+def find_static_dirs() -> Dict[str, str]:
+    """
+    Return the static directories to fingerprint, keyed by URL prefix under /static.
+
+    Returns:
+        dict: Mapping of prefix ("" for the global directory, the module name for
+        module directories) to the directory path.
+    """
+    static_dirs = {}
+    if os.path.isdir("static"):
+        static_dirs[""] = "static"
+    modules_dir = Path("modules")
+    if modules_dir.is_dir():
+        for module_static in sorted(modules_dir.glob("*/static")):
+            if module_static.is_dir():
+                static_dirs[module_static.parent.name] = str(module_static)
+    return static_dirs
+
+
+def fingerprint_name(path: str, digest: str) -> str:
+    """
+    Insert a content digest before a path's extension, e.g. css/main.css -> css/main.<digest>.css.
+
+    Parameters:
+        path (str): Logical asset path.
+        digest (str): Content digest of the file.
+
+    Returns:
+        str: The fingerprinted path.
+    """
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+class AssetManifest:
+    """
+    Mapping of logical static paths to their fingerprinted copies.
+
+    Logical paths are relative to /static, so "css/main.css" is a global asset
+    and "forums/css/forums.css" belongs to the forums module. The build writes
+    each file once under its content hash into the build directory, together
+    with a ``.gz`` variant for compressible formats, and records the mapping in
+    ``manifest.json`` so other workers and restarts can reuse it.
+    """
+
+    def __init__(self, build_dir: str):
+        self.build_dir = build_dir
+        self.assets: Dict[str, str] = {}
+        # Set once the build directory is mounted and fingerprinted URLs are servable
+        self.enabled = False
+
+    @property
+    def manifest_path(self) -> Path:
+        return Path(self.build_dir) / "manifest.json"
+
+    def build(self, static_dirs: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Fingerprint and precompress every file in the static directories.
+
+        Parameters:
+            static_dirs (Optional[Dict[str, str]]): Directories keyed by URL prefix; defaults to find_static_dirs().
+
+        Returns:
+            dict: The logical-to-fingerprinted path mapping.
+        """
+        if static_dirs is None:
+            static_dirs = find_static_dirs()
+
+        self.assets = {}
+        for prefix, directory in static_dirs.items():
+            for source in sorted(Path(directory).rglob("*")):
+                if not source.is_file():
+                    continue
+                logical = source.relative_to(directory).as_posix()
+                if prefix:
+                    logical = f"{prefix}/{logical}"
+                self.add(logical, source.read_bytes())
+
+        self.save()
+        return self.assets
+
+    def add(self, logical: str, data: bytes) -> str:
+        """
+        Write a fingerprinted copy of an asset (plus a gzip variant when worthwhile) and record it.
+
+        Parameters:
+            logical (str): Logical asset path relative to /static.
+            data (bytes): Asset contents.
+
+        Returns:
+            str: The fingerprinted path relative to the build directory.
+        """
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        fingerprinted = fingerprint_name(logical, digest)
+        target = Path(self.build_dir) / fingerprinted
+        # Content-addressed, so an existing file is already up to date
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(target, data)
+            if target.suffix in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    _write_atomic(target.with_name(target.name + ".gz"), compressed)
+        self.assets[logical] = fingerprinted
+        return fingerprinted
+
+    def save(self) -> None:
+        """Write the manifest so other workers and later restarts can load it."""
+        Path(self.build_dir).mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.manifest_path, json.dumps(self.assets, indent=2, sort_keys=True).encode())
+
+    def load(self) -> bool:
+        """
+        Load a manifest written by a previous build.
+
+        Returns:
+            bool: True if a manifest was found and loaded, False otherwise.
+        """
+        try:
+            self.assets = json.loads(self.manifest_path.read_text())
+            return True
+        except (OSError, ValueError):
+            self.assets = {}
+            return False
+
+    def url(self, path: str) -> str:
+        """
+        Return the URL to reference a static asset by.
+
+        Parameters:
+            path (str): Logical asset path relative to /static.
+
+        Returns:
+            str: The fingerprinted /assets URL, or the plain /static URL when the asset isn't in the manifest.
+        """
+        path = path.lstrip("/")
+        fingerprinted = self.assets.get(path)
+        if fingerprinted is None:
+            return f"/static/{path}"
+        return f"{ASSET_URL_PREFIX}/{fingerprinted}"
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    """Write a file through a temporary sibling so readers never see a partial file."""
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, target)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for fingerprinted assets.
+
+    Responses carry an immutable Cache-Control header, and a precompressed
+    ``.gz`` variant is served with ``Content-Encoding: gzip`` when the client
+    accepts it.
+    """
+
+    async def get_response(self, path: str, scope):
+        response = None
+        if accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + ".gz")
+            if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["Content-Encoding"] = "gzip"
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+# Strings, unquoted url() arguments and comments, which minify_css must not rewrite
+_CSS_VERBATIM = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\(\s*[^)"'\s]*\s*\)|/\*.*?\*/)""",
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+def minify_css(css: str) -> str:
+    """
+    Minify a stylesheet conservatively.
+
+    Strips comments and redundant whitespace around braces, semicolons and
+    commas. Quoted strings and ``url(...)`` contents are copied verbatim, and
+    selector and value spacing is otherwise left untouched, so the result is
+    always equivalent to the input.
+
+    Parameters:
+        css (str): Stylesheet source.
+
+    Returns:
+        str: The minified stylesheet.
+    """
+    # Alternating runs of plain CSS, where comments become a space, and verbatim parts
+    parts: List[Tuple[bool, str]] = []
+    for index, part in enumerate(_CSS_VERBATIM.split(css)):
+        verbatim = index % 2 == 1
+        if verbatim and part.startswith("/*"):
+            # A comment still separates the tokens around it
+            verbatim, part = False, " "
+        if not verbatim and parts and not parts[-1][0]:
+            parts[-1] = (False, parts[-1][1] + part)
+        else:
+            parts.append((verbatim, part))
+
+    minified = []
+    for verbatim, part in parts:
+        if not verbatim:
+            part = re.sub(r"\s+", " ", part)
+            part = re.sub(r"\s*([{};,])\s*", r"\1", part)
+            part = part.replace(";}", "}")
+        minified.append(part)
+    return "".join(minified).strip()
+
+
+class CssBundler:
+    """
+    Builds one minified stylesheet per alter (and per alter plus module).
+
+    A bundle concatenates the global stylesheets, the alter's stylesheet and,
+    optionally, a module's stylesheet, so a page needs a single CSS request.
+    Bundles are added to the asset manifest under ``bundles/`` and served
+    fingerprinted and precompressed like any other asset. Sources are
+    re-checked at most every ``check_interval`` seconds and the bundle is
+    rebuilt when one of them changes.
+    """
+
+    # Global stylesheets every bundle starts with, relative to /static
+    BASE_STYLESHEETS = ["css/main.css", "css/theme-toggle.css"]
+
+    def __init__(self, manifest: AssetManifest, check_interval: float = 2.0):
+        self.manifest = manifest
+        self.check_interval = check_interval
+        # (alter, module) -> (bundle URL, source paths, their mtimes, last check time)
+        self._bundles: Dict[Tuple[str, Optional[str]], Tuple[str, Tuple[str, ...], Tuple[Optional[float], ...], float]] = {}
+
+    def stylesheet_paths(self, alter: str, module: Optional[str] = None) -> List[str]:
+        """
+        Return the logical stylesheet paths that make up a bundle, in cascade order.
+
+        Parameters:
+            alter (str): Name of the alter the bundle is for.
+            module (Optional[str]): Module whose stylesheet is appended, if any.
+
+        Returns:
+            List[str]: Logical paths relative to /static.
+        """
+        paths = list(self.BASE_STYLESHEETS)
+        if alter != "global":
+            paths.append(f"css/{alter}.css")
+        if module:
+            paths.append(f"{module}/css/{module}.css")
+        return paths
+
+    def bundle_path(self, alter: str, module: Optional[str] = None) -> str:
+        """
+        Return the logical path a bundle is recorded under in the manifest.
+
+        Parameters:
+            alter (str): Name of the alter the bundle is for.
+            module (Optional[str]): Module whose stylesheet is appended, if any.
+
+        Returns:
+            str: Logical path relative to /static, e.g. "bundles/seles-forums.css".
+        """
+        return f"bundles/{alter}-{module}.css" if module else f"bundles/{alter}.css"
+
+    def _source_files(self, alter: str, module: Optional[str]) -> Tuple[str, ...]:
+        """Return the existing source files of a bundle."""
+        static_dirs = find_static_dirs()
+        files = []
+        for path in self.stylesheet_paths(alter, module):
+            prefix, _, rest = path.partition("/")
+            if prefix and prefix in static_dirs:
+                source = os.path.join(static_dirs[prefix], rest)
+            else:
+                source = os.path.join(static_dirs.get("", "static"), path)
+            if os.path.isfile(source):
+                files.append(source)
+        return tuple(files)
+
+    def build(self, alter: str, module: Optional[str] = None) -> str:
+        """
+        Build (or rebuild) a bundle and record it in the manifest.
+
+        Parameters:
+            alter (str): Name of the alter the bundle is for.
+            module (Optional[str]): Module whose stylesheet is appended, if any.
+
+        Returns:
+            str: URL of the fingerprinted bundle.
+        """
+        sources = self._source_files(alter, module)
+        # Snapshot mtimes before reading so a concurrent edit triggers another rebuild
+        mtimes = _file_mtimes(sources)
+        css = "\n".join(minify_css(Path(source).read_text()) for source in sources)
+
+        logical = self.bundle_path(alter, module)
+        self.manifest.add(logical, css.encode())
+        url = self.manifest.url(logical)
+        self._bundles[(alter, module)] = (url, sources, mtimes, time.monotonic())
+        return url
+
+    def build_all(self, alters: Iterable[str], modules: Iterable[Optional[str]] = (None,)) -> None:
+        """
+        Build every alter and module bundle combination and save the manifest.
+
+        Parameters:
+            alters (Iterable[str]): Alters to build bundles for.
+            modules (Iterable[Optional[str]]): Modules to build bundles for; None builds the module-less bundle.
+        """
+        modules = list(modules)
+        for alter in alters:
+            for module in modules:
+                self.build(alter, module)
+        self.manifest.save()
+
+    def load_all(self, alters: Iterable[str], modules: Iterable[Optional[str]] = (None,)) -> int:
+        """
+        Reuse the bundles recorded in a prebuilt manifest instead of building them.
+
+        Bundles missing from the manifest are left to be built on first use.
+        Source files changed after the build still trigger a rebuild as usual.
+
+        Parameters:
+            alters (Iterable[str]): Alters to load bundles for.
+            modules (Iterable[Optional[str]]): Modules to load bundles for; None loads the module-less bundle.
+
+        Returns:
+            int: Number of bundles found in the manifest.
+        """
+        modules = list(modules)
+        loaded = 0
+        for alter in alters:
+            for module in modules:
+                logical = self.bundle_path(alter, module)
+                if logical not in self.manifest.assets:
+                    continue
+                sources = self._source_files(alter, module)
+                self._bundles[(alter, module)] = (
+                    self.manifest.url(logical), sources, _file_mtimes(sources), time.monotonic()
+                )
+                loaded += 1
+        return loaded
+
+    def url(self, alter: str, module: Optional[str] = None) -> str:
+        """
+        Return the URL of a bundle, rebuilding it if a source file changed.
+
+        Parameters:
+            alter (str): Name of the alter the bundle is for.
+            module (Optional[str]): Module whose stylesheet is appended, if any.
+
+        Returns:
+            str: URL of the fingerprinted bundle.
+        """
+        entry = self._bundles.get((alter, module))
+        if entry is None:
+            return self.build(alter, module)
+
+        url, sources, mtimes, checked_at = entry
+        now = time.monotonic()
+        if now - checked_at < self.check_interval:
+            return url
+        if _file_mtimes(sources) != mtimes or self._source_files(alter, module) != sources:
+            return self.build(alter, module)
+        self._bundles[(alter, module)] = (url, sources, mtimes, now)
+        return url
+
+    def links(self, alter: Optional[str] = None, module: Optional[str] = None) -> Markup:
+        """
+        Return the stylesheet link tags for a page.
+
+        Parameters:
+            alter (Optional[str]): Fronting alter; treated as "global" when unset.
+            module (Optional[str]): Module whose stylesheet the page needs, if any.
+
+        Returns:
+            Markup: One link to the bundle, or one link per stylesheet when the asset pipeline is off.
+        """
+        alter = alter or "global"
+        if self.manifest.enabled:
+            hrefs = [self.url(alter, module)]
+        else:
+            hrefs = [f"/static/{path}" for path in self.stylesheet_paths(alter, module)]
+        # Tagged with the module so live alter switches can replace the right links
+        module_attr = escape(module or "")
+        return Markup("\n".join(
+            f'<link href="{escape(href)}" rel="stylesheet" data-stylesheet-module="{module_attr}">' for href in hrefs
+        ))
+
+
+def _file_mtimes(paths: Tuple[str, ...]) -> Tuple[Optional[float], ...]:
+    """Return the modification time of each file, or `None` if it doesn't exist."""
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+# Process-wide manifest and bundler used by the template helpers
+asset_manifest = AssetManifest(config.ASSET_BUILD_DIR)
+css_bundler = CssBundler(asset_manifest)
+
+
+def asset_url(path: str) -> str:
+    """
+    Template helper returning the fingerprinted URL of a static asset.
+
+    Parameters:
+        path (str): Logical asset path relative to /static (e.g. "css/main.css").
+
+    Returns:
+        str: URL to reference the asset by.
+    """
+    return asset_manifest.url(path)
+
+
+def stylesheets(alter: Optional[str] = None, module: Optional[str] = None) -> Markup:
+    """
+    Template helper returning the stylesheet links for a page.
+
+    Parameters:
+        alter (Optional[str]): Fronting alter.
+        module (Optional[str]): Module whose stylesheet the page needs, if any.
+
+    Returns:
+        Markup: Link tag(s) for the page's CSS bundle.
+    """
+    return css_bundler.links(alter, module)
+
+
+def setup_assets(app: FastAPI, mode: Optional[str] = None, alters: Iterable[str] = ()) -> AssetManifest:
+    """
+    Prepare fingerprinted assets and mount them on the application.
+
+    Parameters:
+        app (FastAPI): The application to mount the assets on.
+        mode (Optional[str]): "startup" to build at startup, "prebuilt" to load the
+            manifest written by ``python -m utils.assets``, or "off" to keep plain
+            /static URLs. Defaults to config.ASSET_PIPELINE.
+        alters (Iterable[str]): Alters whose CSS bundles are built ("startup") or loaded ("prebuilt").
+
+    Returns:
+        AssetManifest: The process-wide manifest.
+    """
+    mode = mode or config.ASSET_PIPELINE
+    if mode == "off":
+        return asset_manifest
+
+    # Every alter's bundle, alone and with each module's stylesheet
+    modules = [None] + [module for module in find_static_dirs() if module]
+    if mode == "prebuilt":
+        # The bundles were built along with the manifest; only their URLs are needed
+        asset_manifest.load()
+        css_bundler.load_all([*alters, "global"], modules)
+    else:
+        asset_manifest.build()
+        css_bundler.build_all([*alters, "global"], modules)
+
+    Path(asset_manifest.build_dir).mkdir(parents=True, exist_ok=True)
+    app.mount(ASSET_URL_PREFIX, ImmutableStaticFiles(directory=asset_manifest.build_dir), name="assets")
+    asset_manifest.enabled = True
+    return asset_manifest
+
+
+if __name__ == "__main__":
+    from modules.alter.engine import TemplateEngine
+
+    asset_manifest.build()
+    modules = [None] + [module for module in find_static_dirs() if module]
+    css_bundler.build_all([*TemplateEngine().alters_status, "global"], modules)
+    print(f"Built {len(asset_manifest.assets)} assets into {asset_manifest.build_dir}")
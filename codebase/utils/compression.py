@@ -0,0 +1,235 @@
+"""
+Response compression
+ASGI middleware that gzips HTML, JSON and other text responses on the fly,
+including streamed bodies, and leaves already-encoded responses untouched
+"""
+import zlib
+from typing import Callable, Iterable, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import config
+
+# Media types worth compressing besides text/*; images, fonts and archives
+# are already compressed and only get bigger
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/xhtml+xml",
+    "application/manifest+json",
+    "image/svg+xml",
+}
+
+# Streams the client expects to read event by event are left uncompressed
+STREAMING_TYPES = {"text/event-stream"}
+
+# Attribute set on endpoints by `no_compression`
+NO_COMPRESSION_ATTR = "_no_compression"
+
+
+def no_compression(endpoint: Callable) -> Callable:
+    """
+    Opt a route out of response compression.
+
+    Usage:
+        @router.get("/download")
+        @no_compression
+        async def download(): ...
+
+    Parameters:
+        endpoint (Callable): Route endpoint function.
+
+    Returns:
+        Callable: The same endpoint, marked as not to be compressed.
+    """
+    setattr(endpoint, NO_COMPRESSION_ATTR, True)
+    return endpoint
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Check whether an Accept-Encoding header allows a gzip response.
+
+    Parameters:
+        accept_encoding (str): Raw Accept-Encoding header value.
+
+    Returns:
+        bool: True unless gzip is absent or explicitly refused with q=0.
+    """
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip() not in ("gzip", "*"):
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def is_compressible(content_type: str) -> bool:
+    """
+    Check whether a response media type benefits from compression.
+
+    Parameters:
+        content_type (str): Content-Type header value.
+
+    Returns:
+        bool: True for text and text-like application types.
+    """
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in STREAMING_TYPES:
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class CompressionMiddleware:
+    """
+    Gzip responses for clients that accept it.
+
+    Responses are compressed when their media type is compressible, their
+    body is at least ``minimum_size`` bytes and they do not already carry a
+    Content-Encoding (such as the precompressed files served from /assets).
+    Streamed bodies are compressed chunk by chunk and flushed after every
+    chunk so clients keep receiving data as it is produced. Routes opt out
+    with ``@no_compression`` and whole path prefixes with ``exclude_paths``.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        compresslevel: Optional[int] = None,
+        exclude_paths: Iterable[str] = (),
+    ):
+        self.app = app
+        self.minimum_size = config.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+        self.compresslevel = config.COMPRESSION_LEVEL if compresslevel is None else compresslevel
+        self.exclude_paths: Tuple[str, ...] = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        if not accepts_gzip(Headers(scope=scope).get("accept-encoding", "")):
+            await self.app(scope, receive, send)
+            return
+        responder = _GzipResponder(scope, send, self.minimum_size, self.compresslevel)
+        await self.app(scope, receive, responder.send)
+
+
+class _GzipResponder:
+    """Per-request state of `CompressionMiddleware`, wrapping the ASGI send channel."""
+
+    def __init__(self, scope: Scope, send: Send, minimum_size: int, compresslevel: int):
+        self.scope = scope
+        self._send = send
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            # Hold the headers back until the first body chunk shows the size
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            # e.g. http.response.pathsend; the server sends the file as is
+            await self._start_passthrough()
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is not None:
+            data = self.compressor.compress(body)
+            data += self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        headers = Headers(raw=self.start_message["headers"])
+        if not self._should_compress(headers):
+            await self._start_passthrough()
+            await self._send(message)
+            return
+
+        if not more_body:
+            # Whole body in one message: compress it in one go if it is big enough
+            if len(body) < self.minimum_size:
+                await self._start_passthrough()
+                await self._send(message)
+                return
+            compressed = gzip_compress(body, self.compresslevel)
+            self._set_encoding_headers(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streamed body: trust a declared length if there is one, otherwise compress
+        content_length = headers.get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) < self.minimum_size:
+            await self._start_passthrough()
+            await self._send(message)
+            return
+        self.compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._set_encoding_headers(None)
+        await self._send(self.start_message)
+        data = self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        await self._send({"type": "http.response.body", "body": data, "more_body": True})
+
+    def _should_compress(self, headers: Headers) -> bool:
+        if getattr(self.scope.get("endpoint"), NO_COMPRESSION_ATTR, False):
+            return False
+        if self.start_message["status"] in (204, 206, 304) or self.scope["method"] == "HEAD":
+            return False
+        # Byte ranges refer to the identity body, so partial content must not be re-encoded
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        return is_compressible(headers.get("content-type", ""))
+
+    def _set_encoding_headers(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        # A strong validator no longer matches the encoded bytes
+        etag = headers.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def _start_passthrough(self) -> None:
+        self.passthrough = True
+        await self._send(self.start_message)
+
+
+def gzip_compress(data: bytes, compresslevel: int) -> bytes:
+    """
+    Gzip a complete body.
+
+    Parameters:
+        data (bytes): Uncompressed body.
+        compresslevel (int): zlib compression level, 1-9.
+
+    Returns:
+        bytes: Gzip-framed compressed body.
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
@@ -1,9 +1,11 @@
 """
 Database models and initialization
 """
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex, DropIndex
 from datetime import datetime
 import config
 import os
@@ -46,6 +48,33 @@ class Alter(Base):
     bio = Column(Text)
     style = Column(String)
 
+class AlterState(Base):
+    """
+    Single-row version counter for the fronting state, bumped by every alter switch
+    """
+    __tablename__ = "alter_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ChatMessage(Base):
+    """
+    A message sent to an RTC chat room, numbered within its room
+    """
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Serves "messages in room X before sequence number Y" as a single range scan,
+        # and keeps two workers from saving the same number in one room
+        Index("ix_chat_messages_room_seq", "room", "seq", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    room = Column(String, nullable=False)
+    seq = Column(Integer, nullable=False)
+    data = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class AuditLog(Base):
     """
     Audit log for admin actions
@@ -79,4 +108,26 @@ def init_db():
 
     This ensures the database schema for all mapped models is created in the configured engine if the tables do not already exist.
     """
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+
+
+def ensure_indexes(bind) -> None:
+    """
+    Create any index declared on a mapped table that the database lacks.
+
+    ``create_all`` skips tables that already exist, so indexes added to a model
+    later would never reach existing databases; ``CREATE INDEX IF NOT EXISTS``
+    adds them and is a no-op once they are there. An index since declared
+    unique is dropped and created again, so its constraint applies too.
+    """
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspect(connection).has_table(table.name):
+                continue
+            existing = {index["name"]: index for index in inspect(connection).get_indexes(table.name)}
+            for index in table.indexes:
+                current = existing.get(index.name)
+                if current is not None and index.unique and not current["unique"]:
+                    connection.execute(DropIndex(index))
+                connection.execute(CreateIndex(index, if_not_exists=True))
\ No newline at end of file
@@ -3,8 +3,134 @@ Utility functions for loading module resources
 Validates local/global paths and loads module resources
 """
 import os
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Iterable, Optional, List, Tuple
+
+
+# Seconds a memoized path resolution is trusted before it is resolved again
+PATH_CACHE_CHECK_INTERVAL = 2.0
+
+
+class LoaderContext:
+    """
+    Path validation bound to a project root that is resolved once.
+
+    Resolved paths are memoized in an LRU cache, so repeat validations of the
+    same template or static path skip the ``resolve()`` syscalls. Entries are
+    keyed by a time window of ``recheck_interval`` seconds, so a symlink that
+    is changed inside the project is followed again at most that long after
+    the change; call ``clear()`` to re-resolve immediately.
+    """
+
+    def __init__(self, root, cache_size: int = 4096, recheck_interval: Optional[float] = None):
+        self.root = Path(root).resolve()
+        self.recheck_interval = PATH_CACHE_CHECK_INTERVAL if recheck_interval is None else recheck_interval
+        self._resolve = lru_cache(maxsize=cache_size)(self._resolve_uncached)
+
+    def _resolve_uncached(self, path: str, window: int) -> Path:
+        """Resolve a path, interpreting relative paths against the project root."""
+        return (self.root / path).resolve()
+
+    def _window(self) -> int:
+        """Index of the current revalidation window."""
+        return int(time.monotonic() // self.recheck_interval)
+
+    def validate(self, path: str) -> bool:
+        """
+        Determine whether a path is located inside the project root.
+
+        Parameters:
+            path (str): Path to validate; may be absolute or relative to the project root.
+
+        Returns:
+            bool: True if the resolved path is inside the project root, False otherwise.
+        """
+        try:
+            self._resolve(str(path), self._window()).relative_to(self.root)
+            return True
+        except ValueError:
+            return False
+
+    def validate_many(self, paths: Iterable[str]) -> Dict[str, bool]:
+        """
+        Validate several paths at once.
+
+        Parameters:
+            paths (Iterable[str]): Paths to validate.
+
+        Returns:
+            dict: Mapping of each path to its validation result.
+        """
+        return {path: self.validate(path) for path in paths}
+
+    def validate_module_resources(self, module_name: str) -> List[str]:
+        """
+        Validate every file and directory in a module's resource tree.
+
+        Walks the module's templates, static and data directories without
+        descending into symlinked directories, validating each entry. This
+        surfaces links that escape the project and warms the cache for the
+        paths later checked on the request path.
+
+        Parameters:
+            module_name (str): Name of the module to validate.
+
+        Returns:
+            List[str]: Paths that resolve outside the project root (empty when the tree is safe).
+        """
+        unsafe = []
+        for resource in ("templates", "static", "data"):
+            resource_dir = os.path.join("modules", module_name, resource)
+            if not os.path.isdir(self.root / resource_dir):
+                continue
+            for dirpath, dirnames, filenames in os.walk(self.root / resource_dir):
+                relative_dir = os.path.relpath(dirpath, self.root)
+                for name in dirnames + filenames:
+                    path = os.path.join(relative_dir, name)
+                    if not self.validate(path):
+                        unsafe.append(path)
+        return unsafe
+
+    def clear(self) -> None:
+        """Forget all memoized path resolutions."""
+        self._resolve.cache_clear()
+
+
+# Process-wide loader context, created once at startup
+_context: Optional[LoaderContext] = None
+
+
+def init_loader_context(root=None) -> LoaderContext:
+    """
+    Create the process-wide loader context.
+
+    Called once at startup; later validations reuse its resolved root
+    instead of looking at the working directory again.
+
+    Parameters:
+        root: Project root; defaults to the current working directory.
+
+    Returns:
+        LoaderContext: The new context.
+    """
+    global _context
+    _context = LoaderContext(Path.cwd() if root is None else root)
+    return _context
+
+
+def get_loader_context() -> LoaderContext:
+    """
+    Return the process-wide loader context, creating it on first use.
+
+    Returns:
+        LoaderContext: Context whose root and resolved paths are cached.
+    """
+    context = _context
+    if context is None:
+        context = init_loader_context()
+    return context
 
 
 def validate_path(path: str) -> bool:
@@ -17,26 +143,93 @@ def validate_path(path: str) -> bool:
     Returns:
         bool: True if the resolved path is inside the project root, False otherwise.
     """
-    # Convert to Path object for easier manipulation
-    path_obj = Path(path).resolve()
+    return get_loader_context().validate(path)
+
+
+def validate_module_resources(module_name: str) -> List[str]:
+    """
+    Validate a module's whole resource tree against the project root.
     
-    # Get the project root directory
-    project_root = Path.cwd().resolve()
+    Parameters:
+        module_name (str): Name of the module to validate.
     
-    # Check if the path is within the project root
+    Returns:
+        List[str]: Paths that resolve outside the project root (empty when the tree is safe).
+    """
+    return get_loader_context().validate_module_resources(module_name)
+
+
+# Resolved template paths keyed by (template_name, module_name, current_alter).
+# Each entry is (path or None, candidate directories, their mtimes, last check time).
+_template_cache: Dict[Tuple[str, Optional[str], Optional[str]], Tuple[Optional[str], Tuple[str, ...], Tuple[Optional[float], ...], float]] = {}
+
+# Seconds a cached resolution is trusted before its directories are re-checked
+TEMPLATE_CACHE_CHECK_INTERVAL = 2.0
+
+# Upper bound on cached resolutions (template names may come from callers)
+TEMPLATE_CACHE_MAX_ENTRIES = 1024
+
+
+def clear_template_cache() -> None:
+    """Discard every cached template resolution."""
+    _template_cache.clear()
+
+
+def _current_alter() -> Optional[str]:
+    """
+    Return the fronting alter, or `None` when the alter engine isn't available.
+
+    Reads the engine's last snapshot so template lookups never touch the
+    shared store; the snapshot is revalidated by renders and the live watcher.
+    """
     try:
-        path_obj.relative_to(project_root)
-        return True
-    except ValueError:
-        # Path is outside the project root
-        return False
+        from modules.alter.engine import get_template_engine
+    except ImportError:
+        return None
+    return get_template_engine().last_snapshot.current_alter
+
+
+def _template_candidates(template_name: str, module_name: Optional[str], current_alter: Optional[str]) -> List[str]:
+    """Return the paths a template may resolve to, in priority order."""
+    # Absolute paths are only ever checked as-is
+    if template_name.startswith('/'):
+        return [template_name]
+
+    candidates = []
+    # If module is specified, check module's templates first
+    if module_name:
+        candidates.append(f"modules/{module_name}/templates/{template_name}")
+
+    # Then check global templates
+    candidates.append(f"templates/{template_name}")
+
+    # Check for alter-specific templates, then the alter module's global templates
+    if current_alter is not None:
+        if current_alter != "global":
+            candidates.append(f"modules/alter/templates/{current_alter}/{template_name}")
+        candidates.append(f"modules/alter/templates/global/{template_name}")
+
+    return candidates
+
+
+def _dir_mtimes(directories: Tuple[str, ...]) -> Tuple[Optional[float], ...]:
+    """Return the modification time of each directory, or `None` if it doesn't exist."""
+    mtimes = []
+    for directory in directories:
+        try:
+            mtimes.append(os.stat(directory).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
 
 
 def resolve_template_path(template_name: str, module_name: Optional[str] = None) -> Optional[str]:
     """
     Resolve a template filename to an existing, safe filesystem path.
 
-    Checks a module-specific templates directory first (if module_name is provided), then the global templates directory, and also accepts an absolute path when it resides inside the project root. Only returns a path that exists and passes the module's path-safety checks.
+    Checks a module-specific templates directory first (if module_name is provided), then the global templates directory, then the fronting alter's templates, and also accepts an absolute path when it resides inside the project root. Only returns a path that exists and passes the module's path-safety checks.
+
+    Results, including misses, are cached per (template_name, module_name, current_alter), so an alter switch naturally selects a different entry. A cached entry is re-validated against the mtimes of its candidate directories at most once every TEMPLATE_CACHE_CHECK_INTERVAL seconds, so adding or removing a template is picked up without a restart.
 
     Parameters:
         template_name (str): Template filename or absolute path.
@@ -45,44 +238,34 @@ def resolve_template_path(template_name: str, module_name: Optional[str] = None)
     Returns:
         Optional[str]: The resolved filesystem path to the template if found and valid, or `None` if not found or not permitted.
     """
-    # First, check if it's an absolute path (but still validate)
-    if template_name.startswith('/'):
-        if validate_path(template_name):
-            return template_name if os.path.exists(template_name) else None
-        return None
-
-    # If module is specified, check module's templates first
-    if module_name:
-        module_template_path = f"modules/{module_name}/templates/{template_name}"
-        if validate_path(module_template_path) and os.path.exists(module_template_path):
-            return module_template_path
-
-    # Then check global templates
-    global_template_path = f"templates/{template_name}"
-    if validate_path(global_template_path) and os.path.exists(global_template_path):
-        return global_template_path
+    current_alter = _current_alter()
+    key = (template_name, module_name, current_alter)
+    now = time.monotonic()
 
-    # Check for alter-specific templates (requires importing template engine)
-    try:
-        from modules.alter.engine import TemplateEngine
-        template_engine = TemplateEngine()
+    entry = _template_cache.get(key)
+    if entry is not None:
+        path, directories, mtimes, checked_at = entry
+        if now - checked_at < TEMPLATE_CACHE_CHECK_INTERVAL:
+            return path
+        if _dir_mtimes(directories) == mtimes:
+            _template_cache[key] = (path, directories, mtimes, now)
+            return path
 
-        # Check alter-specific templates
-        if template_engine.current_alter and template_engine.current_alter != "global":
-            alter_template_path = f"modules/alter/templates/{template_engine.current_alter}/{template_name}"
-            if validate_path(alter_template_path) and os.path.exists(alter_template_path):
-                return alter_template_path
+    candidates = _template_candidates(template_name, module_name, current_alter)
+    directories = tuple(dict.fromkeys(os.path.dirname(candidate) for candidate in candidates))
+    # Snapshot mtimes before probing so a concurrent change invalidates the entry
+    mtimes = _dir_mtimes(directories)
 
-        # Then check global templates in the template module
-        global_template_path = f"modules/alter/templates/global/{template_name}"
-        if validate_path(global_template_path) and os.path.exists(global_template_path):
-            return global_template_path
+    path = None
+    for candidate in candidates:
+        if validate_path(candidate) and os.path.exists(candidate):
+            path = candidate
+            break
 
-    except ImportError:
-        # If template engine isn't available, just continue with regular resolution
-        pass
-
-    return None
+    if len(_template_cache) >= TEMPLATE_CACHE_MAX_ENTRIES:
+        _template_cache.clear()
+    _template_cache[key] = (path, directories, mtimes, now)
+    return path
 
 
 def resolve_static_path(static_name: str, module_name: Optional[str] = None) -> Optional[str]:
@@ -0,0 +1,378 @@
+"""
+Full-page microcache
+Serves repeated anonymous GETs of hot pages from memory for a few seconds,
+keyed by the fronting alter and invalidated by writes
+"""
+import asyncio
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple, Union
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import config
+
+# Methods that change data; a successful one bumps its namespace's version
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Version file header: magic, format version, number of slots
+VERSIONS_HEADER = struct.Struct("<4sIQ")
+VERSIONS_MAGIC = b"PCVN"
+VERSIONS_FORMAT = 1
+
+# One 64-bit namespace version per slot
+VERSION_SLOT = struct.Struct("<Q")
+
+
+class CachedPage(NamedTuple):
+    """A complete response held by the page cache."""
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    expires_at: float
+
+
+def parse_cache_paths(spec: str) -> Dict[str, str]:
+    """
+    Parse a ``PAGE_CACHE_PATHS`` value into path prefixes and namespaces.
+
+    Parameters:
+        spec (str): Comma-separated ``prefix=namespace`` pairs, e.g. "/=home,/forums=forums".
+            A bare prefix uses itself as the namespace.
+
+    Returns:
+        Dict[str, str]: Mapping of path prefix to version namespace.
+    """
+    rules = {}
+    for item in spec.split(","):
+        prefix, _, namespace = item.strip().partition("=")
+        if prefix:
+            rules[prefix] = namespace or prefix
+    return rules
+
+
+def current_alter_key() -> Tuple[Optional[str], int]:
+    """Return the fronting alter and state version, or (None, 0) without the alter module."""
+    try:
+        from modules.alter.engine import get_template_engine
+    except ImportError:
+        return None, 0
+    snapshot = get_template_engine().snapshot()
+    return snapshot.current_alter, snapshot.version
+
+
+class LocalVersions:
+    """Namespace versions held by this process only."""
+
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+
+    def get(self, namespace: str) -> int:
+        return self.versions.get(namespace, 0)
+
+    def bump(self, namespace: str) -> int:
+        self.versions[namespace] = self.get(namespace) + 1
+        return self.versions[namespace]
+
+
+class SharedVersions:
+    """
+    Namespace versions in a memory-mapped file shared by every worker.
+
+    Namespaces are hashed into a fixed table of 64-bit counters; two
+    namespaces sharing a slot only invalidate each other's pages more often.
+    A read is one aligned 8-byte load from the map, so cache lookups take no
+    lock; a bump holds an exclusive ``flock`` on the file so increments from
+    different workers are never lost.
+    """
+
+    def __init__(self, path: Union[str, Path], slots: int = 256):
+        """
+        Parameters:
+            path: Version file, created on first use.
+            slots (int): Number of counters when the file is created.
+        """
+        self.path = Path(path)
+        self.slots = int(slots)
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+
+    def get(self, namespace: str) -> int:
+        table = self._table()
+        return VERSION_SLOT.unpack_from(table, self._offset(namespace))[0]
+
+    def bump(self, namespace: str) -> int:
+        table = self._table()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                offset = self._offset(namespace)
+                version = VERSION_SLOT.unpack_from(table, offset)[0] + 1
+                VERSION_SLOT.pack_into(table, offset, version)
+                return version
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offset(self, namespace: str) -> int:
+        digest = hashlib.blake2b(namespace.encode(), digest_size=8).digest()
+        return VERSIONS_HEADER.size + int.from_bytes(digest, "little") % self.slots * VERSION_SLOT.size
+
+    def _table(self) -> mmap.mmap:
+        # flock is per open file, so a forked worker needs its own descriptor
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._open()
+        return self._map
+
+    def _open(self) -> None:
+        """Map the version file, creating it if needed; reopened after a fork."""
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < VERSIONS_HEADER.size:
+                os.ftruncate(fd, VERSIONS_HEADER.size + self.slots * VERSION_SLOT.size)
+                os.pwrite(fd, VERSIONS_HEADER.pack(VERSIONS_MAGIC, VERSIONS_FORMAT, self.slots), 0)
+            magic, version, slots = VERSIONS_HEADER.unpack(os.pread(fd, VERSIONS_HEADER.size, 0))
+            if magic != VERSIONS_MAGIC or version != VERSIONS_FORMAT:
+                raise ValueError(f"{self.path} is not a page cache version file")
+            # A file created by another worker decides the table size
+            self.slots = slots
+            self._map = mmap.mmap(fd, VERSIONS_HEADER.size + slots * VERSION_SLOT.size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._pid = os.getpid()
+
+
+def default_versions() -> Union[LocalVersions, SharedVersions]:
+    """Return the configured namespace versions: shared through PAGE_CACHE_VERSIONS_FILE, or per process."""
+    if config.PAGE_CACHE_VERSIONS_FILE:
+        return SharedVersions(config.PAGE_CACHE_VERSIONS_FILE)
+    return LocalVersions()
+
+
+class PageCache:
+    """
+    Bounded in-memory LRU of complete responses with a short TTL.
+
+    Each cached path belongs to a namespace with a version number that is
+    part of every key; bumping the version makes all of the namespace's
+    entries unreachable at once, and they age out of the LRU. Entries are
+    per process, but versions are shared by every worker by default, so a
+    write handled by one worker invalidates the pages cached by all of them.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        versions: Optional[Union[LocalVersions, SharedVersions]] = None,
+    ):
+        self.ttl = config.PAGE_CACHE_TTL if ttl is None else ttl
+        self.max_bytes = config.PAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_entries = config.PAGE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.entries: "OrderedDict[Hashable, CachedPage]" = OrderedDict()
+        self.size = 0
+        self.versions = default_versions() if versions is None else versions
+
+    def version(self, namespace: str) -> int:
+        """Return the current version of a namespace."""
+        return self.versions.get(namespace)
+
+    def bump(self, namespace: str) -> int:
+        """
+        Invalidate every cached page of a namespace.
+
+        Parameters:
+            namespace (str): Namespace whose pages changed.
+
+        Returns:
+            int: The namespace's new version.
+        """
+        return self.versions.bump(namespace)
+
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        """Return a live entry, dropping it if it has expired."""
+        page = self.entries.get(key)
+        if page is None:
+            return None
+        if page.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return page
+
+    def put(self, key: Hashable, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> bool:
+        """
+        Store a response, evicting the least recently used entries to stay in bounds.
+
+        Returns:
+            bool: False if the body is too large to cache.
+        """
+        # One page may not crowd out most of the cache
+        if len(body) > self.max_bytes // 4:
+            return False
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = CachedPage(status, headers, body, time.monotonic() + self.ttl)
+        self.size += len(body)
+        while self.size > self.max_bytes or len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+        return True
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self.entries.clear()
+        self.size = 0
+
+    def _remove(self, key: Hashable) -> None:
+        page = self.entries.pop(key)
+        self.size -= len(page.body)
+
+
+class PageCacheMiddleware:
+    """
+    Cache anonymous GET responses of selected paths in a PageCache.
+
+    Keys are ``(path, query, vary(), namespace version)`` where ``vary``
+    defaults to the fronting alter and its state version, so an alter switch
+    in any worker moves every page to a new key. A successful POST, PUT,
+    PATCH or DELETE under a cached prefix bumps that prefix's namespace,
+    in every worker when the cache's versions are shared. Concurrent misses for one key are single-flighted: one request renders
+    while the others wait for its result. Requests with cookies or an
+    Authorization header, and responses that are not plain 200s or that set
+    cookies or forbid caching, bypass the cache.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        cache: Optional[PageCache] = None,
+        rules: Optional[Dict[str, str]] = None,
+        vary: Callable[[], Hashable] = current_alter_key,
+    ):
+        self.app = app
+        self.cache = cache or page_cache
+        self.rules = parse_cache_paths(config.PAGE_CACHE_PATHS) if rules is None else rules
+        self.vary = vary
+        self._inflight: Dict[Hashable, asyncio.Event] = {}
+
+    def namespace_for(self, path: str) -> Optional[str]:
+        """Return the namespace of the longest matching prefix, or None if the path isn't cached."""
+        best = None
+        for prefix, namespace in self.rules.items():
+            if path == prefix or (prefix != "/" and path.startswith(prefix.rstrip("/") + "/")):
+                if best is None or len(prefix) > len(best[0]):
+                    best = (prefix, namespace)
+        return best[1] if best else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        namespace = self.namespace_for(scope["path"]) if scope["type"] == "http" else None
+        if namespace is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in UNSAFE_METHODS:
+            await self._handle_write(scope, receive, send, namespace)
+            return
+
+        headers = Headers(scope=scope)
+        if scope["method"] != "GET" or "cookie" in headers or "authorization" in headers:
+            await self.app(scope, receive, send)
+            return
+
+        # The alter lookup may briefly wait on the state store's lock
+        vary = await run_in_threadpool(self.vary)
+        key = (scope["path"], scope["query_string"], vary, self.cache.version(namespace))
+
+        page = self.cache.get(key)
+        if page is None and key in self._inflight:
+            # Another request is rendering this page; wait for its result
+            try:
+                await asyncio.wait_for(self._inflight[key].wait(), timeout=self.cache.ttl)
+            except asyncio.TimeoutError:
+                pass
+            page = self.cache.get(key)
+        if page is not None:
+            await self._send_cached(page, send)
+            return
+        if key in self._inflight:
+            await self.app(scope, receive, send)
+            return
+
+        done = self._inflight[key] = asyncio.Event()
+        try:
+            await self._render_and_store(scope, receive, send, key)
+        finally:
+            del self._inflight[key]
+            done.set()
+
+    async def _handle_write(self, scope: Scope, receive: Receive, send: Send, namespace: str) -> None:
+        async def send_and_invalidate(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                self.cache.bump(namespace)
+            await send(message)
+
+        await self.app(scope, receive, send_and_invalidate)
+
+    async def _render_and_store(self, scope: Scope, receive: Receive, send: Send, key: Hashable) -> None:
+        start: Dict[str, Any] = {}
+        chunks: List[bytes] = []
+        cacheable = True
+
+        async def send_and_record(message: Message) -> None:
+            nonlocal cacheable
+            if message["type"] == "http.response.start":
+                start.update(message)
+                cacheable = _is_cacheable(message)
+                message = {**message, "headers": [*message.get("headers", []), (b"x-page-cache", b"miss")]}
+            elif message["type"] == "http.response.body":
+                if cacheable:
+                    chunks.append(message.get("body", b""))
+                    # Stop recording bodies too large to ever be stored
+                    cacheable = sum(map(len, chunks)) <= self.cache.max_bytes // 4
+                if not message.get("more_body", False) and cacheable:
+                    self.cache.put(key, start["status"], list(start.get("headers", [])), b"".join(chunks))
+            else:
+                cacheable = False
+            await send(message)
+
+        await self.app(scope, receive, send_and_record)
+
+    async def _send_cached(self, page: CachedPage, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": page.status,
+            "headers": [*page.headers, (b"x-page-cache", b"hit")],
+        })
+        await send({"type": "http.response.body", "body": page.body})
+
+
+def _is_cacheable(start: Message) -> bool:
+    """Check whether a response start message allows shared caching of the response."""
+    if start["status"] != 200:
+        return False
+    headers = Headers(raw=start.get("headers", []))
+    if "set-cookie" in headers:
+        return False
+    cache_control = headers.get("cache-control", "").lower()
+    return not any(directive in cache_control for directive in ("no-store", "private", "no-cache"))
+
+
+# Process-wide page cache used by the middleware in main.py
+page_cache = PageCache()
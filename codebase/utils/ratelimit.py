@@ -0,0 +1,392 @@
+"""
+Rate limiting
+A ``limits`` storage backend keeping fixed-window counters in a memory-mapped
+file, so every uvicorn worker enforces the same limit without Redis, and the
+per-component token bucket middleware
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+from limits.storage import Storage
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.websockets import WebSocketClose
+import config
+
+# File header: magic, format version, number of slots
+HEADER = struct.Struct("<4sIQ")
+MAGIC = b"RLMT"
+FORMAT_VERSION = 1
+
+# Slot: 64-bit key hash (0 = empty), expiry as a Unix timestamp, counter
+SLOT = struct.Struct("<QdQ")
+
+# Slots probed for a key before the one expiring soonest is recycled
+MAX_PROBE = 16
+
+
+def key_hash(key: str) -> int:
+    """Return a non-zero 64-bit hash of a rate limit key."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") | 1
+
+
+class MmapStorage(Storage):
+    """
+    Fixed-window rate limit counters in a memory-mapped file.
+
+    Register with ``storage_uri="mmap://<path>"``. Keys are hashed into a
+    fixed table of slots (open addressing with a short linear probe); when
+    every probed slot is live, the one whose window ends first is reused.
+    Each operation holds an exclusive ``flock`` on the file, so counters are
+    exact across processes while a check stays in the microseconds. Only the
+    fixed-window strategy, slowapi's default, is supported.
+    """
+
+    STORAGE_SCHEME = ["mmap"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, slots: int = 65536, **options):
+        """
+        Parameters:
+            uri (str): ``mmap://relative/path`` or ``mmap:///absolute/path`` of the counter file.
+            wrap_exceptions (bool): Wrap storage errors in ``limits.errors.StorageError``.
+            slots (int): Number of counter slots when the file is created.
+        """
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = Path(uri[len("mmap://"):])
+        self.slots = int(slots)
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def base_exceptions(self) -> Tuple[type, ...]:
+        return (OSError, ValueError, struct.error)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        with self._locked() as table:
+            now = time.time()
+            index, slot_hash, expires_at, count = self._find(table, key_hash(key), now)
+            if slot_hash and expires_at > now:
+                count += amount
+            else:
+                expires_at, count = now + expiry, amount
+            self._write(table, index, key_hash(key), expires_at, count)
+            return count
+
+    def get(self, key: str) -> int:
+        with self._locked() as table:
+            now = time.time()
+            _, slot_hash, expires_at, count = self._find(table, key_hash(key), now)
+            return count if slot_hash and expires_at > now else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._locked() as table:
+            now = time.time()
+            _, slot_hash, expires_at, _ = self._find(table, key_hash(key), now)
+            return expires_at if slot_hash and expires_at > now else now
+
+    def check(self) -> bool:
+        try:
+            with self._locked():
+                return True
+        except OSError:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._locked() as table:
+            cleared = 0
+            for index in range(self.slots):
+                if SLOT.unpack_from(table, self._offset(index))[0]:
+                    self._write(table, index, 0, 0.0, 0)
+                    cleared += 1
+            return cleared
+
+    def clear(self, key: str) -> None:
+        with self._locked() as table:
+            index, slot_hash, _, _ = self._find(table, key_hash(key), time.time())
+            if slot_hash:
+                self._write(table, index, 0, 0.0, 0)
+
+    def _locked(self) -> "_TableLock":
+        return _TableLock(self)
+
+    def _open(self) -> None:
+        """Map the counter file, creating it if needed; reopened after a fork."""
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < HEADER.size:
+                os.ftruncate(fd, HEADER.size + self.slots * SLOT.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, FORMAT_VERSION, self.slots), 0)
+            magic, version, slots = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"{self.path} is not a rate limit counter file")
+            # A file created by another worker decides the table size
+            self.slots = slots
+            self._map = mmap.mmap(fd, HEADER.size + slots * SLOT.size)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._pid = os.getpid()
+
+    def _offset(self, index: int) -> int:
+        return HEADER.size + index * SLOT.size
+
+    def _find(self, table: mmap.mmap, wanted: int, now: float) -> Tuple[int, int, float, int]:
+        """
+        Locate the slot for a key hash.
+
+        Returns:
+            tuple: (index, hash, expiry, count) of the key's slot, or of the slot
+            to claim for it with a zero hash.
+        """
+        start = wanted % self.slots
+        claim = None
+        for probe in range(MAX_PROBE):
+            index = (start + probe) % self.slots
+            slot_hash, expires_at, count = SLOT.unpack_from(table, self._offset(index))
+            if slot_hash == wanted:
+                return index, slot_hash, expires_at, count
+            if slot_hash == 0 or expires_at <= now:
+                if claim is None or claim[1] > 0:
+                    claim = (index, 0.0)
+            elif claim is None or (claim[1] > 0 and expires_at < claim[1]):
+                claim = (index, expires_at)
+        return claim[0], 0, 0.0, 0
+
+    def _write(self, table: mmap.mmap, index: int, slot_hash: int, expires_at: float, count: int) -> None:
+        SLOT.pack_into(table, self._offset(index), slot_hash, expires_at, count)
+
+
+class _TableLock:
+    """Hold the thread lock and the cross-process file lock around one table operation."""
+
+    def __init__(self, storage: MmapStorage):
+        self.storage = storage
+
+    def __enter__(self) -> mmap.mmap:
+        storage = self.storage
+        storage._lock.acquire()
+        try:
+            # flock is per open file, so a forked worker needs its own descriptor
+            if storage._pid != os.getpid():
+                storage._open()
+            fcntl.flock(storage._fd, fcntl.LOCK_EX)
+        except BaseException:
+            storage._lock.release()
+            raise
+        return storage._map
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            fcntl.flock(self.storage._fd, fcntl.LOCK_UN)
+        finally:
+            self.storage._lock.release()
+
+
+class RateLimitPolicy(NamedTuple):
+    """
+    A component's token bucket policy.
+
+    Every client gets one bucket per component holding up to ``burst``
+    tokens and refilled at ``rate`` tokens per second. A request takes the
+    cost of the first ``(method, pattern)`` entry in ``costs`` that matches
+    it, or 1.
+    """
+    name: str
+    routes: Tuple[str, ...]
+    rate: float
+    burst: float
+    costs: Tuple[Tuple[str, str, float], ...]
+
+    @classmethod
+    def from_descriptor(cls, descriptor: Dict[str, Any]) -> Optional["RateLimitPolicy"]:
+        """
+        Build the policy declared by a component descriptor.
+
+        The descriptor's ``rate_limit`` entry holds ``rate`` (tokens per
+        second), ``burst`` (bucket size) and optionally ``costs``, a mapping
+        of ``"METHOD /path/pattern"`` to tokens per request. Methods are HTTP
+        methods, ``WEBSOCKET`` or ``*``; patterns use ``fnmatch`` syntax like
+        the descriptor's ``routes``.
+
+        Parameters:
+            descriptor (Dict[str, Any]): Metadata returned by a ``setup_*`` function.
+
+        Returns:
+            Optional[RateLimitPolicy]: The policy, or None if the component declares none.
+
+        Raises:
+            ValueError: If the policy is malformed or a request could never fit in the bucket.
+        """
+        spec = descriptor.get("rate_limit")
+        if not spec:
+            return None
+        name = descriptor.get("name", "")
+        rate, burst = float(spec["rate"]), float(spec["burst"])
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Rate limit of component {name} needs a positive rate and a burst of at least 1")
+        costs = []
+        for rule, cost in spec.get("costs", {}).items():
+            method, _, pattern = rule.partition(" ")
+            if not pattern or not 0 < cost <= burst:
+                raise ValueError(f"Invalid rate limit cost for component {name}: {rule!r} = {cost}")
+            costs.append((method.upper(), pattern, float(cost)))
+        return cls(name, tuple(descriptor.get("routes", ())), rate, burst, tuple(costs))
+
+    def matches(self, path: str) -> bool:
+        """Check whether a path belongs to the component."""
+        return any(_path_matches(pattern, path) for pattern in self.routes)
+
+    def cost_for(self, method: str, path: str) -> float:
+        """Return the tokens a request takes."""
+        for rule_method, pattern, cost in self.costs:
+            if rule_method in ("*", method) and _path_matches(pattern, path):
+                return cost
+        return 1.0
+
+
+def _path_matches(pattern: str, path: str) -> bool:
+    # "/forums/*" also covers the bare "/forums" mount point
+    return fnmatchcase(path, pattern) or (pattern.endswith("/*") and path == pattern[:-2])
+
+
+class TokenBuckets:
+    """
+    In-memory token buckets keyed by (component, client).
+
+    Buckets are created full and kept in least recently used order; past
+    ``max_buckets`` the stalest are dropped, which at worst hands an idle
+    client a full bucket again. Nothing here touches the database or the
+    shared counter file, so a check is a dict lookup and some arithmetic.
+    """
+
+    def __init__(self, max_buckets: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_buckets = config.RATE_LIMIT_MAX_BUCKETS if max_buckets is None else max_buckets
+        self.clock = clock
+        # key -> [tokens, last refill time]
+        self.buckets: "OrderedDict[Hashable, List[float]]" = OrderedDict()
+
+    def take(self, key: Hashable, cost: float, rate: float, burst: float) -> float:
+        """
+        Take ``cost`` tokens from a bucket if it holds enough.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until they will be available.
+        """
+        now = self.clock()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [burst, now]
+            if len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate
+
+
+def client_address(scope: Scope, trusted_proxies: Optional[Iterable[str]] = None) -> str:
+    """
+    Return the client's IP address.
+
+    Requests arriving from one of the trusted proxies (RATE_LIMIT_TRUSTED_PROXIES
+    by default) are attributed to the address in ``X-Forwarded-For``: the
+    rightmost one not itself a trusted proxy, since clients can put anything
+    on the left. Otherwise the peer address is used, like slowapi's
+    ``get_remote_address``.
+    """
+    trusted = set(config.RATE_LIMIT_TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies)
+    client = scope.get("client")
+    address = client[0] if client else "127.0.0.1"
+    if address not in trusted:
+        return address
+    forwarded = [
+        value.decode("latin-1") for name, value in scope.get("headers", ()) if name == b"x-forwarded-for"
+    ]
+    hops = [hop.strip() for value in forwarded for hop in value.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in trusted:
+            return hop
+    return address
+
+
+def request_client_address(request: Any) -> str:
+    """``client_address`` for slowapi's ``key_func``, which is passed the request."""
+    return client_address(request.scope)
+
+
+class RateLimitMiddleware:
+    """
+    Enforce component rate limit policies on HTTP requests and websocket handshakes.
+
+    A request is charged to the first policy whose routes match its path.
+    Rejected HTTP requests get a 429 with ``Retry-After``; rejected websocket
+    handshakes are closed with code 1008 (policy violation) before they are
+    accepted. Buckets are per process, so with several workers a client's
+    effective burst is multiplied by the number of workers it reaches.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        policies: Iterable[RateLimitPolicy],
+        buckets: Optional[TokenBuckets] = None,
+        key_func: Callable[[Scope], str] = client_address,
+    ):
+        self.app = app
+        self.policies = list(policies)
+        self.buckets = buckets or TokenBuckets()
+        self.key_func = key_func
+
+    def policy_for(self, path: str) -> Optional[RateLimitPolicy]:
+        """Return the policy governing a path, if any."""
+        for policy in self.policies:
+            if policy.matches(path):
+                return policy
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        policy = self.policy_for(scope["path"]) if scope["type"] in ("http", "websocket") else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = "WEBSOCKET" if scope["type"] == "websocket" else scope["method"]
+        cost = policy.cost_for(method, scope["path"])
+        retry_after = self.buckets.take((policy.name, self.key_func(scope)), cost, policy.rate, policy.burst)
+        if not retry_after:
+            await self.app(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await WebSocketClose(code=1008, reason="Rate limit exceeded")(scope, receive, send)
+        else:
+            response = JSONResponse(
+                {"error": f"Rate limit exceeded: {policy.name}"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+
+
+def collect_policies(components: Iterable[Dict[str, Any]]) -> List[RateLimitPolicy]:
+    """Return the rate limit policies declared by component descriptors."""
+    policies = (RateLimitPolicy.from_descriptor(comp) for comp in components)
+    return [policy for policy in policies if policy is not None]
@@ -2,12 +2,110 @@
 Security utilities for the application
 """
 from passlib.context import CryptContext
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import math
 import secrets
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import config
 
-# Password hashing context
+# Password hashing context; the bcrypt cost is tuned for this host on first use
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt cost the benchmark hashes at; each extra round doubles the time
+BENCHMARK_ROUNDS = 8
+
+_tuned_rounds: Optional[int] = None
+_tune_lock = threading.Lock()
+
+
+def benchmark_bcrypt(rounds: int = BENCHMARK_ROUNDS, samples: int = 3) -> float:
+    """
+    Time a bcrypt hash on this host.
+
+    Parameters:
+        rounds (int): bcrypt cost to hash at.
+        samples (int): Hashes to run; the fastest is reported to discount scheduling noise.
+
+    Returns:
+        float: Milliseconds taken by one hash.
+    """
+    import bcrypt
+    fastest = math.inf
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"benchmark", bcrypt.gensalt(rounds))
+        fastest = min(fastest, time.perf_counter() - started)
+    return fastest * 1000
+
+
+def select_bcrypt_rounds(
+    target_ms: Optional[float] = None,
+    min_rounds: Optional[int] = None,
+    max_rounds: Optional[int] = None,
+    measure: Callable[[int], float] = benchmark_bcrypt,
+) -> int:
+    """
+    Pick the highest bcrypt cost whose hash time stays within a target on this host.
+
+    One hash is timed at a low cost and extrapolated, since every extra
+    round doubles the work. The result is clamped so slow hosts keep a
+    secure minimum and fast hosts don't overshoot.
+
+    Parameters:
+        target_ms (Optional[float]): Wanted time for one hash or verify, in milliseconds.
+        min_rounds (Optional[int]): Lowest cost to return.
+        max_rounds (Optional[int]): Highest cost to return.
+        measure (Callable[[int], float]): Returns the milliseconds a hash takes at a given cost.
+
+    Returns:
+        int: The bcrypt cost to use.
+    """
+    target_ms = config.PASSWORD_HASH_TARGET_MS if target_ms is None else target_ms
+    min_rounds = config.PASSWORD_HASH_MIN_ROUNDS if min_rounds is None else min_rounds
+    max_rounds = config.PASSWORD_HASH_MAX_ROUNDS if max_rounds is None else max_rounds
+    elapsed = max(measure(BENCHMARK_ROUNDS), 1e-3)
+    rounds = BENCHMARK_ROUNDS + math.floor(math.log2(target_ms / elapsed))
+    return max(min_rounds, min(max_rounds, rounds))
+
+
+def tune_password_hashing(rounds: Optional[int] = None) -> int:
+    """
+    Set the bcrypt cost new hashes use and stored hashes are upgraded to.
+
+    Hashes at any other cost are reported by ``pwd_context.needs_update``,
+    so ``verify_password_and_update`` moves stored hashes to this cost as
+    users log in.
+
+    Parameters:
+        rounds (Optional[int]): Cost to use; defaults to PASSWORD_HASH_ROUNDS, benchmarking when that is "auto".
+
+    Returns:
+        int: The cost in effect.
+    """
+    global _tuned_rounds
+    if rounds is None:
+        configured = config.PASSWORD_HASH_ROUNDS
+        rounds = select_bcrypt_rounds() if configured == "auto" else int(configured)
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+    _tuned_rounds = rounds
+    return rounds
+
+
+def _ensure_tuned() -> None:
+    if _tuned_rounds is None:
+        with _tune_lock:
+            if _tuned_rounds is None:
+                tune_password_hashing()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -23,9 +121,29 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     # bcrypt has a 72-byte password limit, so truncate if necessary
     if len(plain_password.encode('utf-8')) > 72:
         plain_password = plain_password[:72]
+    _ensure_tuned()
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_password_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password and, when it matches a hash made at an outdated cost, rehash it.
+
+    Parameters:
+        plain_password (str): The plaintext password to verify.
+        hashed_password (str): The stored password hash to compare against.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matches, and a replacement
+        hash to store, or None if the stored hash is current or the password is wrong.
+    """
+    # bcrypt has a 72-byte password limit, so truncate if necessary
+    if len(plain_password.encode('utf-8')) > 72:
+        plain_password = plain_password[:72]
+    _ensure_tuned()
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """
     Hash a plain-text password using the module's configured password hashing context.
@@ -39,9 +157,125 @@ def get_password_hash(password: str) -> str:
     # bcrypt has a 72-byte password limit, so truncate if necessary
     if len(password.encode('utf-8')) > 72:
         password = password[:72]
+    _ensure_tuned()
     return pwd_context.hash(password)
 
 
+class PasswordHashBusy(RuntimeError):
+    """Raised when the password hash pool's queue is full; callers should answer 503."""
+
+
+class PasswordHashPool:
+    """
+    Bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL while hashing, so a few dedicated threads hash in
+    parallel without blocking the event loop or the shared threadpool used by
+    sync routes. At most ``workers`` hashes run at once and at most
+    ``queue_depth`` more wait; anything beyond that is refused immediately
+    with PasswordHashBusy instead of queueing behind a login burst.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_depth: Optional[int] = None):
+        self.workers = config.PASSWORD_HASH_WORKERS if workers is None else workers
+        self.queue_depth = config.PASSWORD_HASH_QUEUE_DEPTH if queue_depth is None else queue_depth
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def capacity(self) -> int:
+        """Number of jobs that may be running or waiting at once."""
+        return self.workers + self.queue_depth
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a function on the pool and wait for its result.
+
+        Raises:
+            PasswordHashBusy: If the pool is running and queueing as many jobs as it allows.
+        """
+        with self._lock:
+            if self.pending >= self.capacity:
+                raise PasswordHashBusy("Too many password hashing requests")
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # A cancelled caller doesn't stop the hash, so the slot is freed when the job finishes
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once queued jobs finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _release(self, _future: Any = None) -> None:
+        with self._lock:
+            self.pending -= 1
+
+
+# Process-wide pool used by the async password helpers
+password_hash_pool = PasswordHashPool()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Check a password against a stored hash on the password hash pool.
+
+    Parameters:
+        plain_password (str): The plaintext password to verify.
+        hashed_password (str): The stored password hash to compare against.
+
+    Returns:
+        bool: `true` if the plaintext password matches the hash, `false` otherwise.
+
+    Raises:
+        PasswordHashBusy: If too many hashes are already running or queued.
+    """
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def verify_password_and_update_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password on the password hash pool, rehashing it if its cost is outdated.
+
+    Parameters:
+        plain_password (str): The plaintext password to verify.
+        hashed_password (str): The stored password hash to compare against.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matches, and a replacement hash to store or None.
+
+    Raises:
+        PasswordHashBusy: If too many hashes are already running or queued.
+    """
+    return await password_hash_pool.run(verify_password_and_update, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a plain-text password on the password hash pool.
+
+    Parameters:
+        password (str): Plain-text password to hash.
+
+    Returns:
+        str: Hashed password suitable for secure storage.
+
+    Raises:
+        PasswordHashBusy: If too many hashes are already running or queued.
+    """
+    return await password_hash_pool.run(get_password_hash, password)
+
+
 def generate_secret_key(length: int = 32) -> str:
     """
     Generate a URL-safe random secret key.
@@ -55,47 +289,142 @@ def generate_secret_key(length: int = 32) -> str:
     return secrets.token_urlsafe(length)
 
 
+class InvalidToken(ValueError):
+    """Raised when an access token is malformed, forged, signed with an unknown key or expired."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    # Strict: only the one unpadded base64url spelling _b64encode produces is accepted,
+    # so a token cannot be varied (padding, +/, trailing bits) and still verify
+    data = base64.b64decode(text + "=" * (-len(text) % 4), altchars=b"-_", validate=True)
+    if _b64encode(data) != text:
+        raise ValueError("Non-canonical base64url")
+    return data
+
+
+class TokenSigner:
+    """
+    HMAC-SHA256 signed compact access tokens.
+
+    A token is ``<key id>.<payload>.<signature>``, the payload being
+    base64url JSON with an ``exp`` timestamp, so it verifies without any
+    server-side lookup. Tokens are signed with a key derived from the current
+    secret and verify against it or any previous secret: to rotate
+    SECRET_KEY, move the old value to PREVIOUS_SECRET_KEYS until the tokens
+    it signed have expired. Verified tokens are kept in a small LRU, so
+    checking the same token again on every websocket frame or HTMX call is a
+    dict lookup.
+    """
+
+    def __init__(self, secret_key: Optional[str] = None, previous_keys: Optional[List[str]] = None, cache_size: Optional[int] = None):
+        secret_key = config.SECRET_KEY if secret_key is None else secret_key
+        previous_keys = config.PREVIOUS_SECRET_KEYS if previous_keys is None else previous_keys
+        self.cache_size = config.TOKEN_CACHE_SIZE if cache_size is None else cache_size
+        # key id -> signing key; the first is the current one
+        self.keys: Dict[str, bytes] = {}
+        for secret in [secret_key, *previous_keys]:
+            # Derive a token-only key rather than signing with the app secret itself
+            key = hmac.new(secret.encode(), b"access-token", hashlib.sha256).digest()
+            self.keys.setdefault(_b64encode(hashlib.sha256(key).digest()[:6]), key)
+        self.current_key_id = next(iter(self.keys))
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sign(self, payload: Dict[str, Any]) -> str:
+        """
+        Sign a payload with the current key.
+
+        Parameters:
+            payload (Dict[str, Any]): JSON-serialisable claims, normally including ``exp``.
+
+        Returns:
+            str: The compact token.
+        """
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        signing_input = f"{self.current_key_id}.{body}"
+        signature = hmac.new(self.keys[self.current_key_id], signing_input.encode(), hashlib.sha256).digest()
+        return f"{signing_input}.{_b64encode(signature)}"
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Check a token's signature and expiry and return its payload.
+
+        Raises:
+            InvalidToken: If the token is malformed, its signature or key is wrong, or it has expired.
+        """
+        with self._lock:
+            payload = self._cache.get(token)
+            if payload is not None:
+                self._cache.move_to_end(token)
+        if payload is None:
+            payload = self._verify_signature(token)
+        if payload.get("exp", math.inf) <= time.time():
+            with self._lock:
+                self._cache.pop(token, None)
+            raise InvalidToken("Token has expired")
+        with self._lock:
+            self._cache[token] = payload
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(payload)
+
+    def _verify_signature(self, token: str) -> Dict[str, Any]:
+        if not isinstance(token, str) or token.count(".") != 2:
+            raise InvalidToken("Malformed token")
+        key_id, body, signature = token.split(".")
+        key = self.keys.get(key_id)
+        if key is None:
+            raise InvalidToken("Token signed with an unknown key")
+        expected = hmac.new(key, f"{key_id}.{body}".encode(), hashlib.sha256).digest()
+        try:
+            valid = hmac.compare_digest(expected, _b64decode(signature))
+            payload = json.loads(_b64decode(body)) if valid else None
+        except (ValueError, binascii.Error):
+            raise InvalidToken("Malformed token")
+        if not valid:
+            raise InvalidToken("Invalid token signature")
+        if not isinstance(payload, dict):
+            raise InvalidToken("Malformed token")
+        return payload
+
+
+# Process-wide signer for access tokens
+token_signer = TokenSigner()
+
+
 def create_access_token(data: dict, expires_delta: Optional[int] = None) -> str:
     """
-    Create an opaque access token that encodes the given payload and an expiration timestamp.
+    Create a signed access token that encodes the given payload and an expiration timestamp.
     
     Parameters:
-        data (dict): Payload to include in the token; will be recorded together with an expiration timestamp.
+        data (dict): JSON-serialisable payload to include in the token; will be recorded together with an expiration timestamp and a unique token id.
         expires_delta (Optional[int]): Expiration lifetime in seconds; when omitted, a default of 3600 seconds (1 hour) is used.
     
     Returns:
-        token (str): A string token that represents the encoded payload and expiration.
+        token (str): A compact token signed with the current SECRET_KEY.
     """
-    # For now, we'll implement a simple token mechanism
-    # In a real application, you'd use python-jose or similar
-    import time
-    import hashlib
-    
-    # Create a simple token by hashing the data + timestamp
     to_encode = data.copy()
-    if expires_delta:
-        expire = time.time() + expires_delta
-    else:
-        expire = time.time() + 3600  # 1 hour default
-    
-    to_encode.update({"exp": expire})
-    
-    # Create a token by hashing the data
-    token_data = str(to_encode)
-    token = hashlib.sha256((token_data + generate_secret_key()).encode()).hexdigest()
-    
-    return token
+    if expires_delta is None:
+        expires_delta = 3600  # 1 hour default
+    to_encode.update({"exp": int(time.time()) + expires_delta, "jti": generate_secret_key(9)})
+    return token_signer.sign(to_encode)
 
 
 def verify_access_token(token: str) -> Optional[dict]:
     """
-    Perform a placeholder verification of an access token.
+    Verify an access token's signature and expiry without any database access.
     
-    This implementation does not decode or validate the token and always indicates the token is valid.
+    Parameters:
+        token (str): Token made by create_access_token with the current or a previous SECRET_KEY.
     
     Returns:
-        dict: A dictionary with key `"valid"` set to `True`.
+        dict: `{"valid": True, "payload": <claims>}` for a good token, otherwise `{"valid": False, "error": <reason>}`.
     """
-    # In a real application, you'd decode the JWT here
-    # This is just a placeholder implementation
-    return {"valid": True}
\ No newline at end of file
+    try:
+        return {"valid": True, "payload": token_signer.verify(token)}
+    except InvalidToken as e:
+        return {"valid": False, "error": str(e)}
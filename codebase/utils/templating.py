@@ -0,0 +1,172 @@
+"""
+Shared Jinja2 template environment
+Modules register their template directories with one registry so every route
+renders through a single environment backed by a persistent bytecode cache
+"""
+import os
+from pathlib import Path
+from types import CodeType
+from typing import Any, Dict, List, Optional
+from fastapi import Request
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache
+from jinja2.bccache import Bucket
+import config
+from utils.assets import asset_url, stylesheets
+
+
+class SharedBytecodeCache(FileSystemBytecodeCache):
+    """
+    Bytecode cache keyed by template name and source, with an in-memory layer.
+
+    Identical template files reached through different search paths (for
+    example a base layout that no alter overrides) share one cache entry and
+    one compiled code object, instead of being compiled once per environment.
+    Compiled code is kept in memory so repeat loads skip the disk entirely.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self._compiled: Dict[str, CodeType] = {}
+
+    def get_bucket(self, environment: Environment, name: str, filename: Optional[str], source: str) -> Bucket:
+        checksum = self.get_source_checksum(source)
+        # Key on content rather than location so identical files share bytecode
+        bucket = Bucket(environment, self.get_cache_key(name, checksum), checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        code = self._compiled.get(bucket.key)
+        if code is not None:
+            bucket.code = code
+            return
+        super().load_bytecode(bucket)
+        if bucket.code is not None:
+            self._compiled[bucket.key] = bucket.code
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        self._compiled[bucket.key] = bucket.code
+        super().dump_bytecode(bucket)
+
+    def clear(self) -> None:
+        self._compiled.clear()
+        super().clear()
+
+
+def alter_context(request: Request) -> Dict[str, Any]:
+    """
+    Context processor giving every page the fronting state the shared layouts need.
+
+    Pages rendered by ``TemplateEngine.render`` reuse the snapshot the engine
+    picked their environment from; other module pages take the current one.
+
+    Parameters:
+        request (Request): The request being rendered.
+
+    Returns:
+        dict: ``current_alter``, ``alters_status`` and ``alter_version``.
+    """
+    from modules.alter.engine import get_template_engine
+
+    snapshot = getattr(request.state, "alter_snapshot", None) or get_template_engine().snapshot()
+    return {
+        "current_alter": snapshot.current_alter,
+        "alters_status": snapshot.alters_status,
+        "alter_version": snapshot.version,
+    }
+
+
+class TemplateRegistry:
+    """
+    Registry of template directories sharing one Jinja2 environment.
+
+    Module directories are searched in registration order, followed by the
+    global ``templates`` directory so module pages can extend the base layouts.
+    Compiled templates are written to a ``SharedBytecodeCache`` that is
+    shared by every worker process and survives restarts.
+    """
+
+    def __init__(self, global_dir: str = "templates", cache_dir: Optional[str] = None):
+        self.global_dir = global_dir
+        self.cache_dir = cache_dir or config.TEMPLATE_CACHE_DIR
+        self.module_dirs: List[str] = []
+        self._bytecode_cache: Optional[SharedBytecodeCache] = None
+        self._templates: Optional[Jinja2Templates] = None
+
+    @property
+    def search_path(self) -> List[str]:
+        """Directories searched for templates, in priority order."""
+        return self.module_dirs + [self.global_dir]
+
+    @property
+    def bytecode_cache(self) -> SharedBytecodeCache:
+        """Bytecode cache shared by every environment created by the registry."""
+        if self._bytecode_cache is None:
+            Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+            self._bytecode_cache = SharedBytecodeCache(self.cache_dir)
+        return self._bytecode_cache
+
+    @property
+    def templates(self) -> Jinja2Templates:
+        """The shared ``Jinja2Templates`` instance, created on first use."""
+        if self._templates is None:
+            self._templates = self.create_templates(self.search_path)
+        return self._templates
+
+    def register(self, directory: str) -> Jinja2Templates:
+        """
+        Add a module's template directory to the shared search path.
+
+        The directory is created if it does not exist. Registering the same
+        directory again is a no-op.
+
+        Parameters:
+            directory (str): Template directory of the module.
+
+        Returns:
+            Jinja2Templates: The shared templates instance.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if directory not in self.module_dirs:
+            self.module_dirs.append(directory)
+            if self._templates is not None:
+                # FileSystemLoader keeps its own copy of the search path
+                self._templates.env.loader.searchpath = self.search_path
+        return self.templates
+
+    def create_templates(self, search_path: List[str]) -> Jinja2Templates:
+        """
+        Build a ``Jinja2Templates`` over the given directories that shares the registry's bytecode cache.
+
+        The environment also gets the shared template helpers ``asset_url`` and
+        ``stylesheets``, and every response the fronting state from ``alter_context``.
+
+        Parameters:
+            search_path (List[str]): Directories to search, in priority order.
+
+        Returns:
+            Jinja2Templates: A templates instance for the given search path.
+        """
+        templates = Jinja2Templates(directory=list(search_path), context_processors=[alter_context])
+        templates.env.bytecode_cache = self.bytecode_cache
+        templates.env.globals["asset_url"] = asset_url
+        templates.env.globals["stylesheets"] = stylesheets
+        return templates
+
+
+# Process-wide registry used by every module's routes
+template_registry = TemplateRegistry()
+
+
+def register_template_dir(directory: str) -> Jinja2Templates:
+    """
+    Register a module template directory with the shared registry.
+
+    Parameters:
+        directory (str): Template directory of the module.
+
+    Returns:
+        Jinja2Templates: The shared templates instance.
+    """
+    return template_registry.register(directory)
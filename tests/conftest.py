@@ -4,6 +4,7 @@ Pytest configuration and shared fixtures
 import pytest
 import sys
 import os
+import threading
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
@@ -11,6 +12,18 @@ from unittest.mock import MagicMock, patch
 codebase_path = Path(__file__).parent.parent / "codebase"
 sys.path.insert(0, str(codebase_path))
 
+@pytest.fixture(autouse=True)
+def cancel_alters_csv_writes():
+    """Drop alters.csv writes a test left pending so their timers can't fire during later tests"""
+    yield
+    persistence = sys.modules.get("modules.alter.persistence")
+    if persistence is None:
+        return
+    for thread in threading.enumerate():
+        owner = getattr(getattr(thread, "function", None), "__self__", None)
+        if isinstance(owner, persistence.AltersCsv):
+            owner.cancel()
+
 @pytest.fixture
 def mock_config():
     """Mock configuration for testing"""
@@ -10,7 +10,8 @@ from pathlib import Path
 # Add codebase to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
 
-from components import validate_routes, setup_components
+from components import validate_routes, setup_components, setup_rate_limits
+from utils.ratelimit import RateLimitMiddleware
 
 
 class TestValidateRoutes:
@@ -115,6 +116,35 @@ class TestValidateRoutes:
         assert result is True
 
 
+class TestSetupRateLimits:
+    """Tests for setup_rate_limits function"""
+    
+    def test_one_middleware_for_all_policies(self):
+        """Test that every declared policy is enforced by a single middleware"""
+        mock_app = MagicMock()
+        components = [
+            {"name": "forums", "routes": ["/forums/*"], "rate_limit": {"rate": 2, "burst": 60}},
+            {"name": "rtc", "routes": ["/rtc/*"], "rate_limit": {"rate": 1, "burst": 20}},
+            {"name": "admin", "routes": ["/admin/*"]}
+        ]
+        
+        assert setup_rate_limits(mock_app, components) == 2
+        mock_app.add_middleware.assert_called_once()
+        assert mock_app.add_middleware.call_args[0][0] is RateLimitMiddleware
+        assert [policy.name for policy in mock_app.add_middleware.call_args[1]["policies"]] == ["forums", "rtc"]
+    
+    def test_no_policies_no_middleware(self):
+        """Test that nothing is added when no component declares a policy"""
+        mock_app = MagicMock()
+        assert setup_rate_limits(mock_app, [{"name": "admin", "routes": ["/admin/*"]}]) == 0
+        mock_app.add_middleware.assert_not_called()
+    
+    def test_malformed_policy(self):
+        """Test that a malformed policy fails setup"""
+        with pytest.raises(ValueError):
+            setup_rate_limits(MagicMock(), [{"name": "forums", "rate_limit": {"rate": 0, "burst": 10}}])
+
+
 class TestSetupComponents:
     """Tests for setup_components function"""
     
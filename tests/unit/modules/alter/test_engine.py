@@ -0,0 +1,201 @@
+"""
+Unit tests for modules/alter/engine.py
+Tests for per-alter template environments in TemplateEngine
+"""
+import itertools
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from sqlalchemy import create_engine
+from starlette.requests import Request
+from modules.alter.engine import TemplateEngine
+from modules.alter.state import AlterStateStore
+from utils.templating import TemplateRegistry
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """Minimal project tree with three alters, one of which overrides index.html"""
+    data_dir = tmp_path / "modules" / "alter" / "data"
+    data_dir.mkdir(parents=True)
+    (data_dir / "alters.csv").write_text("name,is_fronting\nseles,1\ndexen,0\nyuki,0\n")
+
+    seles_dir = tmp_path / "modules" / "alter" / "templates" / "seles"
+    seles_dir.mkdir(parents=True)
+    (seles_dir / "index.html").write_text("seles home")
+
+    global_dir = tmp_path / "templates"
+    global_dir.mkdir()
+    (global_dir / "index.html").write_text("global home for {{ current_alter }}")
+
+    monkeypatch.chdir(tmp_path)
+    registry = TemplateRegistry(cache_dir=str(tmp_path / "cache"))
+    store = partial(AlterStateStore, create_engine(f"sqlite:///{tmp_path / 'app.db'}"))
+    with patch("modules.alter.engine.template_registry", registry), \
+            patch("modules.alter.engine.AlterStateStore", store):
+        yield registry
+
+
+class TestAlterTemplateEnvironments:
+    """Tests for prebuilt per-alter template environments"""
+
+    def test_prebuilds_environment_per_alter(self, project):
+        """Test that every alter and the global fallback get an environment"""
+        engine = TemplateEngine()
+        assert set(engine._alter_templates) == {"seles", "dexen", "yuki", "global"}
+        assert engine.templates is engine._alter_templates["seles"]
+
+    def test_switch_swaps_prebuilt_environment(self, project):
+        """Test that switching reuses the prebuilt environment instead of rebuilding"""
+        engine = TemplateEngine()
+        with patch.object(project, "create_templates") as mock_create:
+            assert engine.switch_alter("dexen") is True
+            mock_create.assert_not_called()
+        assert engine.templates is engine._alter_templates["dexen"]
+
+    def test_alter_override_takes_priority(self, project):
+        """Test that an alter's own templates win over the global ones"""
+        engine = TemplateEngine()
+        assert engine.templates.get_template("index.html").render() == "seles home"
+
+        engine.switch_alter("yuki")
+        rendered = engine.templates.get_template("index.html").render(current_alter="yuki")
+        assert rendered == "global home for yuki"
+
+    def test_identical_templates_compiled_once(self, project):
+        """Test that alters resolving to the same file share compiled bytecode"""
+        engine = TemplateEngine()
+        engine._alter_templates["dexen"].get_template("index.html")
+        compiled = dict(project.bytecode_cache._compiled)
+
+        engine._alter_templates["yuki"].get_template("index.html")
+        assert project.bytecode_cache._compiled == compiled
+
+    def test_switch_to_unknown_alter_keeps_environment(self, project):
+        """Test that a failed switch leaves the active environment untouched"""
+        engine = TemplateEngine()
+        templates = engine.templates
+        assert engine.switch_alter("nobody") is False
+        assert engine.templates is templates
+
+
+class TestAlterStatePersistence:
+    """Tests for TemplateEngine backed by the shared alter state store"""
+
+    def test_seeds_state_from_csv(self, project):
+        """Test that the alter table is seeded from alters.csv"""
+        engine = TemplateEngine()
+        assert engine.alters_status == {"seles": True, "dexen": False, "yuki": False}
+        assert engine.current_alter == "seles"
+
+    def test_switch_seen_by_other_engine(self, project):
+        """Test that an engine in another worker sees a switch without reloading the CSV"""
+        first, second = TemplateEngine(), TemplateEngine()
+        first.switch_alter("yuki")
+        assert second.current_alter == "yuki"
+        assert second.templates is second._alter_templates["yuki"]
+
+    def test_switch_mirrors_csv(self, project, tmp_path):
+        """Test that a switch is written back to alters.csv"""
+        engine = TemplateEngine()
+        engine.switch_alter("dexen")
+        engine.alters_csv.flush()
+        csv_text = (tmp_path / "modules" / "alter" / "data" / "alters.csv").read_text()
+        assert "dexen,1" in csv_text
+        assert "seles,0" in csv_text
+
+
+# Page that exposes which environment rendered it and what the context said
+STRESS_PAGE = "{source}|{{{{ current_alter }}}}|{{% for name, front in alters_status.items() %}}{{% if front %}}{{{{ name }}}}{{% endif %}}{{% endfor %}}"
+
+
+def render_while_switching(engine, renders=400, workers=8, alters=("seles", "dexen", "yuki")):
+    """
+    Stress harness: render concurrently while another thread keeps switching alters.
+
+    Returns:
+        tuple: (pages rendered, errors raised by renders or switches)
+    """
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+    errors = []
+
+    def render(_):
+        try:
+            return engine.render("stress.html", request).body.decode()
+        except Exception as e:
+            errors.append(e)
+
+    def switch():
+        for alter_name in itertools.islice(itertools.cycle(alters), renders // 4):
+            try:
+                engine.switch_alter(alter_name)
+            except Exception as e:
+                errors.append(e)
+
+    with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+        switcher = pool.submit(switch)
+        pages = list(pool.map(render, range(renders)))
+        switcher.result()
+    return [page for page in pages if page is not None], errors
+
+
+class TestConcurrentRendering:
+    """Stress tests for rendering while alters are switched"""
+
+    @pytest.fixture
+    def stress_engine(self, project, tmp_path):
+        """Engine whose stress.html shows both its template source and its context"""
+        (tmp_path / "modules" / "alter" / "templates" / "seles" / "stress.html").write_text(STRESS_PAGE.format(source="seles"))
+        (tmp_path / "templates" / "stress.html").write_text(STRESS_PAGE.format(source="global"))
+        engine = TemplateEngine()
+        yield engine
+        engine.alters_csv.flush()
+
+    def test_render_uses_one_snapshot(self, stress_engine):
+        """Test that each page's environment, current alter and status all agree"""
+        pages, errors = render_while_switching(stress_engine)
+        assert errors == []
+        assert pages
+        for page in pages:
+            source, current_alter, fronting = page.split("|")
+            assert fronting == current_alter
+            assert source == ("seles" if current_alter == "seles" else "global")
+
+    def test_snapshot_is_immutable(self, project):
+        """Test that a captured snapshot can't be changed and survives a switch"""
+        engine = TemplateEngine()
+        snapshot = engine.snapshot()
+        with pytest.raises(TypeError):
+            snapshot.alters_status["dexen"] = True
+
+        engine.switch_alter("dexen")
+        assert snapshot.current_alter == "seles"
+        assert snapshot.templates is engine._alter_templates["seles"]
+        assert engine.snapshot().current_alter == "dexen"
+
+    def test_last_snapshot_skips_store(self, project):
+        """Test that last_snapshot returns the current snapshot without revalidating"""
+        engine = TemplateEngine()
+        snapshot = engine.snapshot()
+        with patch.object(engine.store, "get") as mock_get:
+            assert engine.last_snapshot is snapshot
+            mock_get.assert_not_called()
+
+    def test_last_snapshot_takes_first_snapshot(self, project):
+        """Test that last_snapshot builds a snapshot when none exists yet"""
+        engine = TemplateEngine()
+        assert engine.last_snapshot.current_alter == "seles"
+
+    def test_snapshot_reused_until_version_changes(self, project):
+        """Test that unchanged state returns the same snapshot object"""
+        engine = TemplateEngine()
+        assert engine.snapshot() is engine.snapshot()
+        engine.switch_alter("yuki")
+        assert engine.snapshot().version == 2
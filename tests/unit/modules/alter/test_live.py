@@ -0,0 +1,160 @@
+"""
+Unit tests for modules/alter/live.py
+Tests for broadcasting alter switches to open pages
+"""
+import json
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock, patch
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from modules.alter.engine import TemplateEngine
+from modules.alter.live import AlterBroadcaster, build_switch_event
+from modules.alter.state import AlterStateStore
+from modules.rtc.hub import ALTER_CHANNEL, ChannelHub
+from utils.templating import TemplateRegistry
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Engine over a minimal project with nav and footer partials"""
+    data_dir = tmp_path / "modules" / "alter" / "data"
+    data_dir.mkdir(parents=True)
+    (data_dir / "alters.csv").write_text("name,is_fronting\nseles,1\ndexen,0\n")
+
+    partials = tmp_path / "templates" / "partials"
+    partials.mkdir(parents=True)
+    (partials / "alter_nav.html").write_text(
+        "<nav id=\"alter-nav\">{% for name, front in alters_status.items() %}{{ name }}={{ front }};{% endfor %}</nav>"
+    )
+    (partials / "alter_footer.html").write_text("<footer id=\"alter-footer\">{{ current_alter }}</footer>")
+
+    monkeypatch.chdir(tmp_path)
+    registry = TemplateRegistry(cache_dir=str(tmp_path / "cache"))
+    store = partial(AlterStateStore, create_engine(f"sqlite:///{tmp_path / 'app.db'}"))
+    with patch("modules.alter.engine.template_registry", registry), \
+            patch("modules.alter.engine.AlterStateStore", store):
+        engine = TemplateEngine()
+        yield engine
+        engine.alters_csv.flush()
+
+
+class TestBuildSwitchEvent:
+    """Tests for build_switch_event"""
+
+    def test_event_carries_fragments(self, engine):
+        """Test that the event has the rendered nav and footer of the new state"""
+        engine.switch_alter("dexen")
+        event = build_switch_event(engine.snapshot())
+        assert event["type"] == "alter"
+        assert event["version"] == 2
+        assert event["current_alter"] == "dexen"
+        assert event["nav"] == '<nav id="alter-nav">seles=False;dexen=True;</nav>'
+        assert event["footer"] == '<footer id="alter-footer">dexen</footer>'
+
+    def test_event_carries_tagged_stylesheets(self, engine):
+        """Test that stylesheet links are keyed by module and point at the new alter"""
+        engine.switch_alter("dexen")
+        links = build_switch_event(engine.snapshot())["stylesheets"][""]
+        assert "/static/css/dexen.css" in links
+        assert 'data-stylesheet-module=""' in links
+
+
+class TestAlterBroadcaster:
+    """Tests for AlterBroadcaster"""
+
+    @pytest.mark.asyncio
+    async def test_publish_sends_to_alter_channel(self, engine):
+        """Test that a switch is published to alter channel subscribers"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+        hub.subscribe(ALTER_CHANNEL, websocket)
+        broadcaster = AlterBroadcaster(engine, hub)
+
+        engine.switch_alter("dexen")
+        assert await broadcaster.publish_current() == 1
+        await hub.flush()
+        assert json.loads(websocket.send_text.await_args.args[0])["current_alter"] == "dexen"
+
+    @pytest.mark.asyncio
+    async def test_same_version_published_once(self, engine):
+        """Test that publishing again without a new switch sends nothing"""
+        hub = ChannelHub()
+        hub.subscribe(ALTER_CHANNEL, AsyncMock())
+        broadcaster = AlterBroadcaster(engine, hub)
+
+        engine.switch_alter("dexen")
+        assert await broadcaster.publish_current() == 1
+        assert await broadcaster.publish_current() == 0
+
+    @pytest.mark.asyncio
+    async def test_event_built_once_per_version(self, engine):
+        """Test that the fragments are rendered once per version, not per client"""
+        broadcaster = AlterBroadcaster(engine, ChannelHub())
+        assert await broadcaster.current_event() is await broadcaster.current_event()
+
+
+class TestLiveRoute:
+    """Tests for the /alter/live websocket"""
+
+    @pytest.fixture
+    def client(self, engine):
+        from modules.alter.routes import alter as alter_routes
+        hub = ChannelHub()
+        broadcaster = AlterBroadcaster(engine, hub, interval=60)
+        app = FastAPI()
+        app.include_router(alter_routes.router, prefix="/alter")
+        with patch.object(alter_routes, "template_engine", engine), \
+                patch.object(alter_routes, "alter_broadcaster", broadcaster), \
+                patch.object(alter_routes, "hub", hub), \
+                TestClient(app) as client:
+            # One event loop for the websocket and the switch request, as in production
+            yield client
+
+    def test_stale_client_gets_current_state(self, client):
+        """Test that a page rendered at an old version is brought up to date on connect"""
+        with client.websocket_connect("/alter/live?version=0") as websocket:
+            assert websocket.receive_json()["version"] == 1
+
+    def test_switch_broadcast_to_open_pages(self, client):
+        """Test that switching pushes the new state to connected pages"""
+        with client.websocket_connect("/alter/live?version=1") as websocket:
+            assert client.get("/alter/switch/dexen").json()["success"] is True
+            event = websocket.receive_json()
+            assert event["current_alter"] == "dexen"
+            assert event["version"] == 2
+
+
+class TestModulePages:
+    """Tests that pages rendered outside the engine can be re-themed live"""
+
+    def test_module_page_matches_switch_event(self, engine, tmp_path):
+        """Test that a module page rendered through the shared registry carries what the live script replaces"""
+        from starlette.requests import Request
+
+        (tmp_path / "modules" / "forums" / "static").mkdir(parents=True)
+        pages = tmp_path / "pages"
+        pages.mkdir()
+        (pages / "page.html").write_text(
+            '<body data-alter-version="{{ alter_version }}">{{ stylesheets(current_alter, "forums") }}'
+            '{% include "partials/alter_nav.html" %}{% include "partials/alter_footer.html" %}</body>'
+        )
+        templates = TemplateRegistry(cache_dir=str(tmp_path / "cache")).register(str(pages))
+        engine.switch_alter("dexen")
+
+        request = Request({"type": "http", "method": "GET", "path": "/forums/", "headers": []})
+        with patch("modules.alter.engine.get_template_engine", return_value=engine):
+            page = templates.TemplateResponse(request, "page.html").body.decode()
+        event = build_switch_event(engine.snapshot())
+
+        assert f'data-alter-version="{event["version"]}"' in page
+        assert event["stylesheets"]["forums"] in page
+        assert event["nav"] in page
+        assert event["footer"] in page
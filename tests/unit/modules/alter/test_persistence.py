@@ -0,0 +1,126 @@
+"""
+Unit tests for modules/alter/persistence.py
+Tests for atomic, coalesced alters CSV persistence
+"""
+import pytest
+import time
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from modules.alter.persistence import (
+    AltersCsv,
+    DEFAULT_ALTERS,
+    format_alters_csv,
+    parse_alters_csv,
+    write_file_atomic
+)
+
+
+@pytest.fixture
+def alters_csv(tmp_path):
+    """AltersCsv on a temporary file with a long write delay so tests flush explicitly"""
+    alters_csv = AltersCsv(str(tmp_path / "alters.csv"), write_delay=60)
+    yield alters_csv
+    alters_csv.flush()
+
+
+class TestAltersCsvFormat:
+    """Tests for parsing and formatting the CSV"""
+
+    def test_round_trip(self):
+        """Test that formatted status parses back unchanged"""
+        status = {"seles": False, "dexen": True}
+        assert parse_alters_csv(format_alters_csv(status)) == status
+
+    @pytest.mark.parametrize("text", [
+        "",
+        "name,is_fronting\n",
+        "alter,front\nseles,1\n",
+        "name,is_fronting\nseles\n",
+    ])
+    def test_rejects_corrupt_files(self, text):
+        """Test that empty, truncated or malformed files are rejected"""
+        with pytest.raises(ValueError):
+            parse_alters_csv(text)
+
+
+class TestWriteFileAtomic:
+    """Tests for write_file_atomic"""
+
+    def test_replaces_contents(self, tmp_path):
+        """Test that the file is replaced and no temporary files are left"""
+        target = tmp_path / "alters.csv"
+        target.write_text("old")
+        write_file_atomic(target, "new")
+        assert target.read_text() == "new"
+        assert [p.name for p in tmp_path.iterdir()] == ["alters.csv"]
+
+    def test_failed_write_keeps_old_file(self, tmp_path):
+        """Test that an interrupted write leaves the original file intact"""
+        target = tmp_path / "alters.csv"
+        target.write_text("old")
+        with patch("modules.alter.persistence.os.replace", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                write_file_atomic(target, "new")
+        assert target.read_text() == "old"
+        assert [p.name for p in tmp_path.iterdir()] == ["alters.csv"]
+
+
+class TestAltersCsv:
+    """Tests for AltersCsv load and coalesced saves"""
+
+    def test_load_creates_default(self, alters_csv):
+        """Test that a missing file is created with the default alters"""
+        assert alters_csv.load() == DEFAULT_ALTERS
+        assert alters_csv.path.exists()
+
+    def test_corrupt_file_keeps_last_good(self, alters_csv):
+        """Test that a corrupt file falls back to the last good status"""
+        alters_csv.path.write_text(format_alters_csv({"seles": False, "yuki": True}))
+        good = alters_csv.load()
+
+        alters_csv.path.write_text("name,is_fron")
+        assert alters_csv.load() == good
+        assert alters_csv.path.read_text() == "name,is_fron"
+
+    def test_corrupt_file_without_history_uses_defaults(self, alters_csv):
+        """Test that a corrupt file on first load falls back to the defaults"""
+        alters_csv.path.write_text("\x00\x00")
+        assert alters_csv.load() == DEFAULT_ALTERS
+
+    def test_save_does_not_write_synchronously(self, alters_csv):
+        """Test that save returns before touching the file"""
+        alters_csv.save({"dexen": True})
+        assert not alters_csv.path.exists()
+
+    def test_rapid_saves_coalesce(self, alters_csv):
+        """Test that several saves before the write produce one write of the latest status"""
+        with patch("modules.alter.persistence.write_file_atomic") as write:
+            alters_csv.save({"seles": True, "dexen": False})
+            alters_csv.save({"seles": False, "dexen": True})
+            alters_csv.flush()
+            alters_csv.flush()
+        write.assert_called_once_with(alters_csv.path, format_alters_csv({"seles": False, "dexen": True}))
+
+    def test_cancel_drops_pending_write(self, alters_csv):
+        """Test that a cancelled save is never written, not even by a later flush"""
+        with patch("modules.alter.persistence.write_file_atomic") as write:
+            alters_csv.save({"dexen": True})
+            alters_csv.cancel()
+            alters_csv.flush()
+        write.assert_not_called()
+        assert alters_csv._timer is None
+
+    def test_timer_writes_in_background(self, tmp_path):
+        """Test that the pending status is written once the delay elapses"""
+        alters_csv = AltersCsv(str(tmp_path / "alters.csv"), write_delay=0)
+        alters_csv.save({"yuki": True})
+        deadline = time.monotonic() + 5
+        while alters_csv.last_good is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert parse_alters_csv(alters_csv.path.read_text()) == {"yuki": True}
+        assert alters_csv.last_good == {"yuki": True}
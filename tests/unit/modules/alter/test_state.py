@@ -0,0 +1,97 @@
+"""
+Unit tests for modules/alter/state.py
+Tests for the database-backed, versioned alter state store
+"""
+import pytest
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from sqlalchemy import create_engine
+from modules.alter.state import AlterStateStore
+
+SEED = {"seles": True, "dexen": False, "yuki": False}
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """SQLite engine on a temporary database file"""
+    return create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+
+
+@pytest.fixture
+def store(db_engine):
+    """Store seeded with three alters"""
+    store = AlterStateStore(db_engine, seed=lambda: dict(SEED))
+    yield store
+    store.close()
+
+
+class TestAlterStateStore:
+    """Tests for AlterStateStore"""
+
+    def test_seeds_empty_table(self, store):
+        """Test that the seed populates the alters and starts at version 1"""
+        state = store.get()
+        assert state.alters_status == SEED
+        assert state.current_alter == "seles"
+        assert state.version == 1
+
+    def test_seed_only_used_once(self, db_engine, store):
+        """Test that an already-populated table is not reseeded"""
+        store.switch("dexen")
+        other = AlterStateStore(db_engine, seed=lambda: {"nobody": True})
+        assert other.get().current_alter == "dexen"
+        other.close()
+
+    def test_switch_bumps_version(self, store):
+        """Test that each switch increments the version and moves the front"""
+        state = store.switch("yuki")
+        assert state.version == 2
+        assert state.alters_status == {"seles": False, "dexen": False, "yuki": True}
+        assert store.switch("dexen").version == 3
+
+    def test_switch_unknown_alter(self, store):
+        """Test that switching to an unknown alter changes nothing"""
+        assert store.switch("nobody") is None
+        assert store.get().version == 1
+
+    def test_other_process_sees_switch(self, db_engine, store):
+        """Test that a store on another connection picks up a switch"""
+        store.get()
+        other = AlterStateStore(db_engine)
+        assert other.get().current_alter == "seles"
+
+        store.switch("yuki")
+        state = other.get()
+        assert state.current_alter == "yuki"
+        assert state.version == 2
+        other.close()
+
+    def test_unchanged_database_skips_queries(self, store):
+        """Test that revalidation without commits elsewhere does not query the tables"""
+        state = store.get()
+        with patch.object(store, "_read_version") as read_version, \
+                patch.object(store, "_read_state") as read_state:
+            assert store.get() is state
+            read_version.assert_not_called()
+            read_state.assert_not_called()
+
+    def test_unrelated_commit_keeps_cached_state(self, db_engine, store):
+        """Test that commits which don't bump the version reuse the cached alters"""
+        state = store.get()
+        with db_engine.begin() as connection:
+            connection.exec_driver_sql("CREATE TABLE other (id INTEGER)")
+        with patch.object(store, "_read_state") as read_state:
+            assert store.get() is state
+            read_state.assert_not_called()
+
+    def test_in_memory_database_without_probe(self):
+        """Test that databases without a file fall back to comparing the version row"""
+        store = AlterStateStore(create_engine("sqlite://"), seed=lambda: dict(SEED))
+        assert store.switch("dexen").current_alter == "dexen"
+        assert store._probe is None
+        assert store.get().version == 2
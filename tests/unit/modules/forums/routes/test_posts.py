@@ -3,7 +3,7 @@ Unit tests for modules/forums/routes/posts.py
 Tests for forum posts routes
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 from pathlib import Path
 
@@ -161,4 +161,142 @@ class TestPostsRoutesEdgeCases:
         result1 = get_post(42)
         result2 = get_post(42)
         
-        assert result1 == result2
\ No newline at end of file
+        assert result1 == result2
+
+class TestCreatePostPublishing:
+    """Tests for the live update create_post publishes to readers of the thread"""
+
+    @pytest.fixture
+    def db(self):
+        """In-memory database holding one thread"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from utils.db import Base
+        from modules.forums.models import ForumThread
+
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(ForumThread(id=1, title="Thread", content="Body", author="alice"))
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_create_post_publishes_rendered_fragment(self, db):
+        """Test that a new post is pushed to the thread channel as its rendered post_item fragment"""
+        import json
+        from modules.forums.routes import posts
+        from modules.rtc.hub import ChannelHub, thread_channel
+
+        hub = ChannelHub()
+        reader = AsyncMock()
+        hub.subscribe(thread_channel(1), reader)
+
+        with patch.object(posts, "hub", hub), \
+                patch.object(posts, "render_post_item", return_value="<li>fragment</li>") as render:
+            response = await posts.create_post(content="hello", thread_id=1, author="bob", parent_post_id=None, db=db)
+            await hub.flush()
+
+        assert response.status_code == 303
+        post = db.query(posts.ForumPost).one()
+        render.assert_called_once_with(post, 1)
+        reader.send_text.assert_awaited_once()
+        assert json.loads(reader.send_text.await_args.args[0]) == {
+            "type": "post",
+            "post_id": post.id,
+            "parent_post_id": None,
+            "html": "<li>fragment</li>",
+        }
+
+    @pytest.mark.asyncio
+    async def test_create_post_skips_rendering_without_readers(self, db):
+        """Test that nothing is rendered or published when nobody follows the thread"""
+        from modules.forums.routes import posts
+        from modules.rtc.hub import ChannelHub
+
+        hub = ChannelHub()
+        with patch.object(posts, "hub", hub), patch.object(posts, "render_post_item") as render:
+            await posts.create_post(content="hello", thread_id=1, author="bob", parent_post_id=None, db=db)
+
+        render.assert_not_called()
+        assert db.query(posts.ForumPost).count() == 1
+
+
+class TestCreatePostRoute:
+    """Tests for posting through POST /forums/posts/ and reading the thread page it redirects to"""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        """Forums app over a database holding one empty thread, with a fresh hub"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from modules.alter.engine import EngineSnapshot
+        from modules.forums import router as forums_router
+        from modules.forums.models import ForumThread
+        from modules.forums.routes import posts
+        from modules.rtc.hub import ChannelHub
+        from utils.db import Base, get_db
+
+        # Template directories are relative to the codebase; compiled templates stay out of it
+        monkeypatch.setattr(posts.templates.env.bytecode_cache, "directory", str(tmp_path))
+        monkeypatch.chdir(Path(__file__).parent.parent.parent.parent.parent.parent / "codebase")
+        engine = create_engine(f"sqlite:///{tmp_path / 'forums.db'}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as session:
+            session.add(ForumThread(id=1, title="Hello thread", content="Body", author="alice"))
+            session.commit()
+
+        def override_get_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI()
+        app.include_router(forums_router)
+        app.dependency_overrides[get_db] = override_get_db
+        alter_engine = MagicMock()
+        alter_engine.snapshot.return_value = EngineSnapshot(1, "seles", {"seles": True}, None)
+        with patch.object(posts, "hub", ChannelHub()), \
+                patch("modules.alter.engine.get_template_engine", return_value=alter_engine), \
+                TestClient(app) as client:
+            yield client
+        engine.dispose()
+
+    def test_post_reaches_readers_and_thread_page(self, client):
+        """Test that a new post is pushed to readers as its post_item fragment and shown on the thread page"""
+        import json
+        from modules.forums.routes import posts
+        from modules.rtc.hub import thread_channel
+
+        reader = AsyncMock()
+        client.portal.call(posts.hub.subscribe, thread_channel(1), reader)
+
+        response = client.post("/forums/posts/", data={"content": "live hello", "thread_id": 1, "author": "bob"})
+        client.portal.call(posts.hub.flush)
+
+        assert response.status_code == 200
+        assert response.url.path == "/forums/threads/1"
+        assert 'id="post-1"' in response.text
+        assert "live hello" in response.text
+
+        event = json.loads(reader.send_text.await_args.args[0])
+        assert event["type"] == "post"
+        assert event["post_id"] == 1
+        assert event["html"].startswith('<div class="content-card" id="post-1"')
+        assert "live hello" in event["html"]
+
+    def test_post_to_missing_thread(self, client):
+        """Test that posting to an unknown thread is a 404 and publishes nothing"""
+        from modules.forums.routes import posts
+
+        response = client.post("/forums/posts/", data={"content": "hi", "thread_id": 99, "author": "bob"})
+
+        assert response.status_code == 404
+        assert not posts.hub.channels
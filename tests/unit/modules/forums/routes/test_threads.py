@@ -153,4 +153,162 @@ class TestThreadsRoutesEdgeCases:
         
         assert "message" in result
         assert "data" in result
-        assert len(result.keys()) == 2
\ No newline at end of file
+        assert len(result.keys()) == 2
+
+class TestGetNewPostsRoute:
+    """Tests for get_new_posts route"""
+
+    @pytest.fixture
+    def db(self):
+        """In-memory database holding one thread with three posts, the third a reply to the first"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from utils.db import Base
+        from modules.forums.models import ForumThread, ForumPost
+
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(ForumThread(id=1, title="Thread", content="Body", author="alice"))
+        session.add(ForumThread(id=2, title="Other", content="Body", author="bob"))
+        session.add_all([
+            ForumPost(id=1, thread_id=1, content="first", author="alice"),
+            ForumPost(id=2, thread_id=1, content="second", author="bob"),
+            ForumPost(id=3, thread_id=1, content="reply", author="carol", parent_post_id=1),
+            ForumPost(id=4, thread_id=2, content="elsewhere", author="bob"),
+        ])
+        session.commit()
+        yield session
+        session.close()
+        engine.dispose()
+
+    @staticmethod
+    def render(post, thread_id):
+        """Stand-in for render_post_item showing which posts were rendered and their nested replies"""
+        replies = ",".join(str(reply.id) for reply in post.replies)
+        return f"<post {post.id} replies=[{replies}]>"
+
+    def test_get_new_posts_only_returns_posts_after_cursor(self, db):
+        """Test that only posts of the thread newer than the cursor are rendered"""
+        from modules.forums.routes.threads import get_new_posts
+
+        with patch("modules.forums.routes.threads.render_post_item", side_effect=self.render):
+            response = get_new_posts(1, after=1, db=db)
+
+        assert response.body.decode() == "<post 2 replies=[]><post 3 replies=[]>"
+
+    def test_get_new_posts_empty_delta_returns_204(self, db):
+        """Test that an empty 204 is returned when nothing is newer than the cursor"""
+        from modules.forums.routes.threads import get_new_posts
+
+        with patch("modules.forums.routes.threads.render_post_item") as render:
+            response = get_new_posts(1, after=3, db=db)
+
+        assert response.status_code == 204
+        assert response.body == b""
+        render.assert_not_called()
+
+    def test_get_new_posts_sets_last_post_id_header(self, db):
+        """Test that the X-Last-Post-Id header carries the newest post ID as the next cursor"""
+        from modules.forums.routes.threads import get_new_posts
+
+        with patch("modules.forums.routes.threads.render_post_item", side_effect=self.render):
+            response = get_new_posts(1, after=0, db=db)
+
+        assert response.status_code == 200
+        assert response.headers["X-Last-Post-Id"] == "3"
+
+    def test_get_new_posts_nests_replies_under_new_parents(self, db):
+        """Test that a reply whose parent is also new is rendered inside it rather than on its own"""
+        from modules.forums.routes.threads import get_new_posts
+
+        with patch("modules.forums.routes.threads.render_post_item", side_effect=self.render) as render:
+            response = get_new_posts(1, after=0, db=db)
+
+        assert response.body.decode() == "<post 1 replies=[3]><post 2 replies=[]>"
+        assert [call.args[0].id for call in render.call_args_list] == [1, 2]
+
+
+class TestThreadPage:
+    """Tests for rendering forums/thread.html through the GET /forums/threads/{id} route"""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        """Forums app over a database holding one thread with a post and a reply, with seles fronting"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from modules.alter.engine import EngineSnapshot
+        from modules.forums import router as forums_router
+        from modules.forums.models import ForumThread, ForumPost
+        from utils.db import Base, get_db
+
+        from modules.forums.routes.threads import templates
+
+        # Template directories are relative to the codebase; compiled templates stay out of it
+        monkeypatch.setattr(templates.env.bytecode_cache, "directory", str(tmp_path))
+        monkeypatch.chdir(Path(__file__).parent.parent.parent.parent.parent.parent / "codebase")
+        engine = create_engine(f"sqlite:///{tmp_path / 'forums.db'}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as session:
+            session.add(ForumThread(id=1, title="Hello thread", content="Body", author="alice"))
+            session.add_all([
+                ForumPost(id=1, thread_id=1, content="first post", author="bob"),
+                ForumPost(id=2, thread_id=1, content="a reply", author="carol", parent_post_id=1),
+            ])
+            session.commit()
+
+        def override_get_db():
+            db = Session()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app = FastAPI()
+        app.include_router(forums_router)
+        app.dependency_overrides[get_db] = override_get_db
+        alter_engine = MagicMock()
+        alter_engine.snapshot.return_value = EngineSnapshot(5, "seles", {"seles": True, "dexen": False}, None)
+        with patch("modules.alter.engine.get_template_engine", return_value=alter_engine):
+            yield TestClient(app)
+        engine.dispose()
+
+    def test_thread_page_renders(self, client):
+        """Test that the thread page renders its posts, nested replies and the live update script"""
+        response = client.get("/forums/threads/1")
+
+        assert response.status_code == 200
+        assert "Hello thread" in response.text
+        assert 'id="post-1"' in response.text
+        assert 'id="post-2" data-parent-post-id="1"' in response.text
+        assert "/rtc/ws/threads/1" in response.text
+
+    def test_thread_page_has_fronting_state(self, client):
+        """Test that the shared layout gets the fronting alter, its version and the alter nav"""
+        response = client.get("/forums/threads/1")
+
+        assert 'data-alter-version="5"' in response.text
+        assert "Dexen" in response.text
+        assert 'data-stylesheet-module="forums"' in response.text
+        assert "/static/css/seles.css" in response.text
+
+    def test_thread_page_links_alter_forum_bundle(self, client, tmp_path, monkeypatch):
+        """Test that with the asset pipeline on the page links the fronting alter's forum bundle"""
+        import utils.assets
+        from utils.assets import AssetManifest, CssBundler
+
+        manifest = AssetManifest(str(tmp_path / "assets"))
+        manifest.enabled = True
+        monkeypatch.setattr(utils.assets, "css_bundler", CssBundler(manifest))
+
+        response = client.get("/forums/threads/1")
+
+        assert "/assets/bundles/seles-forums." in response.text
+        assert "/assets/bundles/global" not in response.text
+
+    def test_missing_thread(self, client):
+        """Test that an unknown thread is a 404"""
+        assert client.get("/forums/threads/99").status_code == 404
@@ -0,0 +1,53 @@
+"""
+Unit tests for modules/rtc/routes/history.py
+Tests for the chat history endpoint
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent.parent / "codebase"))
+
+
+class TestGetRoomHistory:
+    """Tests for get_room_history"""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from modules.rtc.history import ChatHistory
+        from modules.rtc.routes import history as history_routes
+
+        app = FastAPI()
+        app.include_router(history_routes.router, prefix="/rooms")
+        history = ChatHistory(create_engine(f"sqlite:///{tmp_path / 'app.db'}"), buffer_size=2)
+        with patch.object(history_routes, "history", history), TestClient(app) as client:
+            client.portal.call(self.fill, history)
+            yield client
+
+    @staticmethod
+    async def fill(history):
+        for n in range(1, 6):
+            await history.append("lobby", n)
+        await history.flush()
+
+    def test_latest_page(self, client):
+        """Test that the first page holds the newest messages and a cursor"""
+        body = client.get("/rooms/lobby/history", params={"limit": 2}).json()
+        assert [message["data"] for message in body["messages"]] == [4, 5]
+        assert body["next_before"] == 4
+
+    def test_follow_cursor_to_start(self, client):
+        """Test that following the cursor reaches the first message"""
+        body = client.get("/rooms/lobby/history", params={"before": 4, "limit": 10}).json()
+        assert [message["seq"] for message in body["messages"]] == [1, 2, 3]
+        assert body["next_before"] is None
+
+    def test_invalid_limit(self, client):
+        """Test that oversized pages are refused"""
+        assert client.get("/rooms/lobby/history", params={"limit": 1000}).status_code == 400
+        assert client.get("/rooms/lobby/history", params={"limit": 0}).status_code == 400
@@ -0,0 +1,117 @@
+"""
+Unit tests for modules/rtc/routes/presence.py
+Tests for the presence snapshot endpoints
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent.parent / "codebase"))
+
+
+class TestPresenceRoutes:
+    """Tests for the presence snapshot routes"""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from modules.rtc.history import ChatHistory
+        from modules.rtc.hub import ChannelHub
+        from modules.rtc.presence import Presence
+        from modules.rtc.routes import presence as presence_routes
+        from modules.rtc.routes import ws
+
+        app = FastAPI()
+        app.include_router(ws.router, prefix="/ws")
+        app.include_router(presence_routes.router, prefix="/presence")
+        presence = Presence()
+        history = ChatHistory(create_engine(f"sqlite:///{tmp_path / 'app.db'}"))
+        with patch.object(ws, "hub", ChannelHub()), patch.object(ws, "history", history), \
+                patch.object(ws, "presence", presence), patch.object(presence_routes, "presence", presence), \
+                TestClient(app) as client:
+            yield client
+
+    def test_thread_viewers(self, client):
+        """Test that open thread sockets are counted as viewers"""
+        assert client.get("/presence/threads/1").json() == {"thread_id": 1, "viewing": 0}
+        with client.websocket_connect("/ws/threads/1"), client.websocket_connect("/ws/threads/1") as second:
+            second.send_text("ping")
+            assert client.get("/presence/threads/1").json()["viewing"] == 2
+        assert client.get("/presence/threads/1").json()["viewing"] == 0
+
+    def test_room_members(self, client):
+        """Test that members who authenticate in their first frame are listed by name"""
+        from utils.security import create_access_token
+
+        token = create_access_token({"sub": "alice"})
+        with client.websocket_connect("/ws/ws") as alice, client.websocket_connect("/ws/ws") as guest:
+            alice.send_json({"action": "auth", "token": token})
+            assert alice.receive_json() == {"type": "authenticated", "user": "alice"}
+            for websocket in (alice, guest):
+                websocket.send_json({"action": "join", "room": "lobby"})
+                websocket.receive_json()
+            assert client.get("/presence/rooms/lobby").json() == {"room": "lobby", "online": 2, "users": ["alice"]}
+            guest.send_json({"action": "leave", "room": "lobby"})
+            guest.receive_json()
+            assert client.get("/presence/rooms/lobby").json()["online"] == 1
+
+    def test_invalid_token(self, client):
+        """Test that a bad token is refused and leaves the member anonymous"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "auth", "token": "not-a-token"})
+            assert websocket.receive_json() == {"type": "error", "error": "Invalid token"}
+            websocket.send_json({"action": "join", "room": "lobby"})
+            websocket.receive_json()
+            assert client.get("/presence/rooms/lobby").json() == {"room": "lobby", "online": 1, "users": []}
+
+    def test_token_not_read_from_url(self, client):
+        """Test that a token in the query string is ignored, so it never needs to be logged"""
+        from utils.security import create_access_token
+
+        token = create_access_token({"sub": "alice"})
+        with client.websocket_connect(f"/ws/ws?token={token}") as websocket:
+            websocket.send_json({"action": "join", "room": "lobby"})
+            websocket.receive_json()
+            assert client.get("/presence/rooms/lobby").json()["users"] == []
+
+    def test_thread_viewer_authenticates(self, client):
+        """Test that a thread socket sending an auth frame is named in the thread's presence"""
+        from modules.rtc.hub import thread_channel
+        from modules.rtc.routes import ws
+        from utils.security import create_access_token
+
+        token = create_access_token({"sub": "alice"})
+        with client.websocket_connect("/ws/threads/1") as websocket:
+            websocket.send_json({"action": "auth", "token": token})
+            websocket.send_text("ping")
+            # Presence routes answer on the app's loop, after both frames were handled
+            assert client.get("/presence/threads/1").json()["viewing"] == 1
+            assert client.portal.call(ws.presence.snapshot, thread_channel(1)) == {"online": 1, "users": ["alice"]}
+
+    @pytest.mark.parametrize("path, method", [("/presence/threads/1", "count"), ("/presence/rooms/lobby", "snapshot")])
+    def test_read_on_event_loop(self, client, path, method):
+        """Test that presence is read on the app's loop thread, not in the threadpool"""
+        import threading
+        from modules.rtc.routes import presence as presence_routes
+
+        loop_thread = client.portal.call(threading.get_ident)
+        read_on = []
+        original = getattr(presence_routes.presence, method)
+
+        def record(channel):
+            read_on.append(threading.get_ident())
+            return original(channel)
+
+        with patch.object(presence_routes.presence, method, side_effect=record):
+            assert client.get(path).status_code == 200
+        assert read_on == [loop_thread]
+
+    def test_ping(self, client):
+        """Test that idle clients can heartbeat without a room"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "ping"})
+            assert websocket.receive_json() == {"type": "pong"}
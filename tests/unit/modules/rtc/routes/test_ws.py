@@ -208,4 +208,233 @@ class TestRtcRoutesEdgeCases:
         
         result = get_rtc_info()
         
-        assert len(result["features"]) > 0
\ No newline at end of file
+        assert len(result["features"]) > 0
+
+
+class TestChatRooms:
+    """Tests for room commands on the websocket endpoint"""
+    
+    @pytest.fixture
+    def client(self, tmp_path):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from modules.rtc.history import ChatHistory
+        from modules.rtc.hub import ChannelHub
+        from modules.rtc.routes import ws
+        
+        app = FastAPI()
+        app.include_router(ws.router, prefix="/ws")
+        # Entering the client runs every websocket session on one event loop, as in production
+        history = ChatHistory(create_engine(f"sqlite:///{tmp_path / 'app.db'}"))
+        with patch.object(ws, "hub", ChannelHub()), patch.object(ws, "history", history), TestClient(app) as client:
+            yield client
+    
+    def test_join_send_and_receive(self, client):
+        """Test that a message sent to a room reaches every member"""
+        with client.websocket_connect("/ws/ws") as alice, client.websocket_connect("/ws/ws") as bob:
+            alice.send_json({"action": "join", "room": "lobby"})
+            assert alice.receive_json() == {
+                "type": "joined", "room": "lobby", "room_id": 1, "members": 1, "seq": 0, "history": []
+            }
+            bob.send_json({"action": "join", "room": "lobby"})
+            assert bob.receive_json()["members"] == 2
+            
+            alice.send_json({"action": "send", "room": "lobby", "data": {"text": "hi"}})
+            expected = {"type": "message", "room": "lobby", "seq": 1, "data": {"text": "hi"}}
+            assert bob.receive_json() == expected
+            assert alice.receive_json() == expected
+    
+    def test_send_requires_membership(self, client):
+        """Test that clients can only talk in rooms they joined"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "send", "room": "lobby", "data": "hi"})
+            assert websocket.receive_json()["error"] == "Not in room"
+    
+    def test_leave(self, client):
+        """Test that a client that left a room stops receiving it"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "join", "room": "lobby"})
+            websocket.receive_json()
+            websocket.send_json({"action": "leave", "room": "lobby"})
+            assert websocket.receive_json() == {"type": "left", "room": "lobby"}
+            websocket.send_json({"action": "send", "room": "lobby", "data": "hi"})
+            assert websocket.receive_json()["error"] == "Not in room"
+    
+    def test_invalid_room(self, client):
+        """Test that missing or oversized room names are refused"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "join"})
+            assert websocket.receive_json()["error"] == "Invalid room"
+            websocket.send_json({"action": "join", "room": "x" * 65})
+            assert websocket.receive_json()["error"] == "Invalid room"
+    
+    def test_room_limit(self, client):
+        """Test that one connection can't join unlimited rooms"""
+        with patch("config.RTC_MAX_ROOMS", 1), client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "join", "room": "a"})
+            websocket.receive_json()
+            websocket.send_json({"action": "join", "room": "b"})
+            assert websocket.receive_json()["error"] == "Too many rooms"
+    
+    def test_joiners_replayed_recent_messages(self, client):
+        """Test that a joiner gets the room's latest messages with its join reply"""
+        with client.websocket_connect("/ws/ws") as alice:
+            alice.send_json({"action": "join", "room": "lobby"})
+            alice.receive_json()
+            for n in range(3):
+                alice.send_json({"action": "send", "room": "lobby", "data": n})
+                alice.receive_json()
+            with client.websocket_connect("/ws/ws") as bob:
+                bob.send_json({"action": "join", "room": "lobby"})
+                replay = bob.receive_json()["history"]
+        assert [(message["seq"], message["data"]) for message in replay] == [(1, 0), (2, 1), (3, 2)]
+    
+    def test_resume_replays_missed_messages(self, client):
+        """Test that a client rejoining with its last seq gets only what it missed"""
+        with client.websocket_connect("/ws/ws") as alice:
+            alice.send_json({"action": "join", "room": "lobby"})
+            alice.receive_json()
+            for n in range(5):
+                alice.send_json({"action": "send", "room": "lobby", "data": n})
+                alice.receive_json()
+            with client.websocket_connect("/ws/ws?room=lobby&resume_from=3") as bob:
+                reply = bob.receive_json()
+        assert reply["resync"] is False
+        assert reply["seq"] == 5
+        assert [message["seq"] for message in reply["history"]] == [4, 5]
+    
+    def test_resume_too_far_back_resyncs(self, client):
+        """Test that a client that missed too much is told to resync"""
+        with patch("config.RTC_RESUME_MAX_GAP", 2), client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "join", "room": "lobby"})
+            websocket.receive_json()
+            for n in range(5):
+                websocket.send_json({"action": "send", "room": "lobby", "data": n})
+                websocket.receive_json()
+            websocket.send_json({"action": "join", "room": "lobby", "resume_from": 1})
+            reply = websocket.receive_json()
+        assert reply["resync"] is True
+        assert len(reply["history"]) == 5
+    
+    def test_invalid_resume_from(self, client):
+        """Test that a malformed resume point is refused"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_json({"action": "join", "room": "lobby", "resume_from": "3"})
+            assert websocket.receive_json()["error"] == "Invalid resume_from"
+    
+    def test_plain_text_still_echoed(self, client):
+        """Test that old clients sending plain text keep getting echoes"""
+        with client.websocket_connect("/ws/ws") as websocket:
+            websocket.send_text("hello")
+            assert websocket.receive_text() == "Echo: hello"
+
+
+class TestBinaryProtocol:
+    """Tests for clients that negotiate binary frames"""
+    
+    @pytest.fixture
+    def client(self, tmp_path):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import create_engine
+        from modules.rtc.history import ChatHistory
+        from modules.rtc.hub import ChannelHub
+        from modules.rtc.routes import ws
+        
+        app = FastAPI()
+        app.include_router(ws.router, prefix="/ws")
+        history = ChatHistory(create_engine(f"sqlite:///{tmp_path / 'app.db'}"))
+        with patch.object(ws, "hub", ChannelHub()), patch.object(ws, "history", history), TestClient(app) as client:
+            yield client
+    
+    def test_binary_and_json_members_share_room(self, client):
+        """Test that one room serves binary and JSON clients alike"""
+        from modules.rtc.protocol import decode_binary, encode_binary
+        
+        with client.websocket_connect("/ws/ws?protocol=binary") as alice, client.websocket_connect("/ws/ws") as bob:
+            alice.send_json({"action": "join", "room": "lobby"})
+            joined = decode_binary(alice.receive_bytes())
+            assert joined.type == "joined"
+            room_id = joined.body["room_id"]
+            bob.send_json({"action": "join", "room": "lobby"})
+            bob.receive_json()
+            
+            alice.send_bytes(encode_binary({"type": "message", "data": {"text": "hi"}}, room_id=room_id))
+            assert bob.receive_json() == {"type": "message", "room": "lobby", "seq": 1, "data": {"text": "hi"}}
+            frame = decode_binary(alice.receive_bytes())
+            assert frame == ("message", room_id, 1, {"data": {"text": "hi"}})
+    
+    def test_deflated_frames(self, client):
+        """Test that large events reach binary-deflate clients compressed"""
+        from modules.rtc.protocol import FLAG_DEFLATE, decode_binary
+        
+        with client.websocket_connect("/ws/ws?protocol=binary-deflate") as websocket:
+            websocket.send_json({"action": "join", "room": "lobby"})
+            websocket.receive_bytes()
+            websocket.send_json({"action": "send", "room": "lobby", "data": "ha" * 1000})
+            raw = websocket.receive_bytes()
+            assert raw[0] & FLAG_DEFLATE
+            assert len(raw) < 2000
+            assert decode_binary(raw).body == {"data": "ha" * 1000}
+    
+    def test_invalid_frame(self, client):
+        """Test that garbage and messages to unknown rooms get an error, not an echo"""
+        from modules.rtc.protocol import decode_binary, encode_binary
+        
+        with client.websocket_connect("/ws/ws?protocol=binary") as websocket:
+            websocket.send_bytes(b"\x00")
+            assert decode_binary(websocket.receive_bytes()).body["error"] == "Invalid frame"
+            websocket.send_bytes(encode_binary({"type": "message", "data": 1}, room_id=99))
+            assert decode_binary(websocket.receive_bytes()).body["error"] == "Invalid frame"
+    
+    def test_unknown_protocol_falls_back_to_json(self, client):
+        """Test that clients asking for an unknown codec get JSON"""
+        with client.websocket_connect("/ws/ws?protocol=msgpack") as websocket:
+            websocket.send_text("hello")
+            assert websocket.receive_text() == "Echo: hello"
+
+
+class TestThreadUpdates:
+    """Tests for the thread_updates websocket"""
+    
+    @pytest.fixture
+    def client(self):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from modules.rtc.hub import ChannelHub
+        from modules.rtc.presence import Presence
+        from modules.rtc.routes import ws
+        
+        app = FastAPI()
+        app.include_router(ws.router, prefix="/ws")
+        with patch.object(ws, "hub", ChannelHub()), patch.object(ws, "presence", Presence()), \
+                TestClient(app) as client:
+            yield client
+    
+    def test_subscribed_while_connected(self, client):
+        """Test that the socket joins its thread's channel on connect and receives what is published there"""
+        from modules.rtc.hub import thread_channel
+        from modules.rtc.routes import ws
+        
+        channel = thread_channel(7)
+        with client.websocket_connect("/ws/threads/7") as websocket:
+            # Portal calls run on the app's loop, after the handler has subscribed
+            assert client.portal.call(ws.hub.subscriber_count, channel) == 1
+            assert client.portal.call(ws.hub.subscriber_count, thread_channel(8)) == 0
+            client.portal.call(ws.hub.publish, channel, {"type": "post", "post_id": 1})
+            assert websocket.receive_json() == {"type": "post", "post_id": 1}
+    
+    def test_unsubscribed_on_disconnect(self, client):
+        """Test that closing the socket removes it from the hub and from presence"""
+        from modules.rtc.hub import thread_channel
+        from modules.rtc.routes import ws
+        
+        channel = thread_channel(7)
+        with client.websocket_connect("/ws/threads/7"), client.websocket_connect("/ws/threads/7"):
+            assert client.portal.call(ws.hub.subscriber_count, channel) == 2
+        
+        assert client.portal.call(ws.hub.subscriber_count, channel) == 0
+        assert channel not in ws.hub.channels
+        assert not ws.hub.connections
+        assert ws.presence.count(channel) == 0
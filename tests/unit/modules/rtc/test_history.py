@@ -0,0 +1,278 @@
+"""
+Unit tests for modules/rtc/history.py
+Tests for the chat room ring buffers and batched history writes
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from modules.rtc.history import ChatHistory
+from utils.db import ChatMessage
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    """SQLite engine on a temporary database file"""
+    return create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+
+
+def saved_count(db_engine):
+    """Count the messages written to the database"""
+    with Session(db_engine) as db:
+        return db.scalar(select(func.count(ChatMessage.id)))
+
+
+class TestRingBuffer:
+    """Tests for the in-memory recent messages of each room"""
+
+    @pytest.mark.asyncio
+    async def test_messages_numbered_per_room(self, db_engine):
+        """Test that each room numbers its messages from 1"""
+        history = ChatHistory(db_engine)
+        assert (await history.append("a", "x"))["seq"] == 1
+        assert (await history.append("a", "y"))["seq"] == 2
+        assert (await history.append("b", "z"))["seq"] == 1
+
+    @pytest.mark.asyncio
+    async def test_buffer_keeps_latest(self, db_engine):
+        """Test that the ring buffer holds only the newest messages"""
+        history = ChatHistory(db_engine, buffer_size=3)
+        for n in range(5):
+            await history.append("lobby", n)
+        assert [message["data"] for message in await history.recent("lobby")] == [2, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_warm_room_served_without_query(self, db_engine):
+        """Test that joiners of a room in memory never hit the database"""
+        history = ChatHistory(db_engine)
+        await history.append("lobby", "hi")
+        with patch.object(history, "_read_page", side_effect=AssertionError("queried")):
+            assert len(await history.recent("lobby")) == 1
+
+    @pytest.mark.asyncio
+    async def test_cold_room_reloaded(self, db_engine):
+        """Test that a room not in memory is reloaded and keeps numbering"""
+        history = ChatHistory(db_engine, buffer_size=2)
+        for n in range(3):
+            await history.append("lobby", n)
+        await history.flush()
+
+        restarted = ChatHistory(db_engine, buffer_size=2)
+        assert [message["data"] for message in await restarted.recent("lobby")] == [1, 2]
+        assert (await restarted.append("lobby", 3))["seq"] == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_share_query(self, db_engine):
+        """Test that joiners racing into a cold room load it once"""
+        history = ChatHistory(db_engine)
+        with patch.object(history, "_read_page", wraps=history._read_page) as read_page:
+            rooms = await asyncio.gather(*(history.room("lobby") for _ in range(5)))
+        assert read_page.call_count == 1
+        assert all(room is rooms[0] for room in rooms)
+
+    @pytest.mark.asyncio
+    async def test_rooms_with_unsaved_messages_not_evicted(self, db_engine):
+        """Test that only fully saved rooms are dropped from memory"""
+        history = ChatHistory(db_engine, max_rooms=1, flush_interval=60)
+        await history.append("a", "x")
+        await history.append("b", "y")
+        assert set(history.rooms) == {"a", "b"}
+        await history.flush()
+        await history.room("c")
+        assert len(history.rooms) == 1
+
+
+class TestBatchedWrites:
+    """Tests for writing messages to the database"""
+
+    @pytest.mark.asyncio
+    async def test_writes_batched(self, db_engine):
+        """Test that a burst of messages is written in one transaction"""
+        history = ChatHistory(db_engine, flush_interval=0.05)
+        with patch.object(history, "_write", wraps=history._write) as write:
+            for n in range(20):
+                await history.append("lobby", n)
+            assert saved_count(db_engine) == 0
+            await asyncio.sleep(0.15)
+        assert write.call_count == 1
+        assert saved_count(db_engine) == 20
+
+    @pytest.mark.asyncio
+    async def test_batch_size_triggers_early_write(self, db_engine):
+        """Test that a full batch is written without waiting for the interval"""
+        history = ChatHistory(db_engine, flush_interval=60, batch_size=5)
+        for n in range(5):
+            await history.append("lobby", n)
+        await asyncio.sleep(0.1)
+        assert saved_count(db_engine) == 5
+
+    @pytest.mark.asyncio
+    async def test_failed_write_retried(self, db_engine):
+        """Test that messages survive a failed write and are written later"""
+        history = ChatHistory(db_engine, flush_interval=60)
+        await history.append("lobby", "hi")
+        with patch.object(history, "_write", side_effect=RuntimeError("locked")):
+            await history.flush()
+        assert len(history.pending) == 1
+        assert history.rooms["lobby"].unsaved == 1
+        await history.flush()
+        assert saved_count(db_engine) == 1
+        assert history.rooms["lobby"].unsaved == 0
+
+    @pytest.mark.asyncio
+    async def test_pending_bounded(self, db_engine):
+        """Test that the oldest unsaved messages are dropped while the database is down"""
+        history = ChatHistory(db_engine, flush_interval=60, max_pending=2)
+        for n in range(3):
+            await history.append("lobby", n)
+        with patch.object(history, "_write", side_effect=RuntimeError("down")):
+            await history.flush()
+        assert [message["data"] for _, message in history.pending] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_written_at_exit(self, db_engine):
+        """Test that queued messages are written by the exit hook"""
+        history = ChatHistory(db_engine, flush_interval=60)
+        await history.append("lobby", "bye")
+        history._write_at_exit()
+        assert saved_count(db_engine) == 1
+
+
+class TestWorkers:
+    """Tests for numbering a room written to by several worker processes"""
+
+    @pytest.mark.asyncio
+    async def test_batch_continues_after_other_worker(self, db_engine):
+        """Test that a worker's batch is numbered after messages another worker saved first"""
+        first, second = ChatHistory(db_engine, flush_interval=60), ChatHistory(db_engine, flush_interval=60)
+        await first.room("lobby")
+        await second.room("lobby")
+        for n in range(3):
+            await first.append("lobby", f"first {n}")
+        for n in range(2):
+            await second.append("lobby", f"second {n}")
+        await first.flush()
+        await second.flush()
+
+        with Session(db_engine) as db:
+            rows = db.execute(select(ChatMessage.seq, ChatMessage.data).order_by(ChatMessage.seq)).all()
+        assert [seq for seq, _ in rows] == [1, 2, 3, 4, 5]
+        assert [data for _, data in rows][3:] == ['"second 0"', '"second 1"']
+        assert second.rooms["lobby"].last_seq == 5
+        assert [message["seq"] for message in await second.recent("lobby")] == [4, 5]
+
+    @pytest.mark.asyncio
+    async def test_messages_queued_during_write_renumbered(self, db_engine):
+        """Test that numbers handed out while a renumbered batch was written move with it"""
+        first, second = ChatHistory(db_engine, flush_interval=60), ChatHistory(db_engine, flush_interval=60)
+        await first.room("lobby")
+        await second.room("lobby")
+        await first.append("lobby", "first")
+        await first.flush()
+        await second.append("lobby", "second")
+        write = second._write
+
+        def write_then_append(batch):
+            shifts = write(batch)
+            second.pending.append(("lobby", {"seq": 2, "data": "late", "created_at": "2026-01-01T00:00:00"}))
+            return shifts
+
+        with patch.object(second, "_write", side_effect=write_then_append):
+            await second.flush()
+        assert [message["seq"] for _, message in second.pending] == [3]
+
+    @pytest.mark.asyncio
+    async def test_paging_after_renumbering_includes_other_worker(self, db_engine):
+        """Test that paging a renumbered room returns the other worker's messages from the database"""
+        first, second = ChatHistory(db_engine, flush_interval=60), ChatHistory(db_engine, flush_interval=60)
+        await second.append("lobby", "early")
+        await second.flush()
+        await first.room("lobby")
+        await first.append("lobby", "first")
+        await first.flush()
+        await second.append("lobby", "second")
+        await second.flush()
+
+        page = await second.page("lobby", limit=10)
+        assert [(message["seq"], message["data"]) for message in page] == [(1, "early"), (2, "first"), (3, "second")]
+
+
+class TestSince:
+    """Tests for replaying missed messages to resuming clients"""
+
+    @pytest.mark.asyncio
+    async def test_gap_served_from_memory(self, db_engine):
+        """Test that a recent gap is replayed without a query"""
+        history = ChatHistory(db_engine)
+        for n in range(1, 6):
+            await history.append("lobby", n)
+        with patch.object(history, "_read_page", side_effect=AssertionError("queried")):
+            missed = await history.since("lobby", 3)
+        assert [message["seq"] for message in missed] == [4, 5]
+
+    @pytest.mark.asyncio
+    async def test_gap_beyond_buffer_served_from_database(self, db_engine):
+        """Test that messages older than the ring buffer come from the database"""
+        history = ChatHistory(db_engine, buffer_size=2)
+        for n in range(1, 8):
+            await history.append("lobby", n)
+        await history.flush()
+        missed = await history.since("lobby", 2)
+        assert [message["seq"] for message in missed] == [3, 4, 5, 6, 7]
+
+    @pytest.mark.asyncio
+    async def test_up_to_date(self, db_engine):
+        """Test that a client with the newest message misses nothing"""
+        history = ChatHistory(db_engine)
+        await history.append("lobby", "hi")
+        assert await history.since("lobby", 1) == []
+
+    @pytest.mark.asyncio
+    async def test_resync(self, db_engine):
+        """Test that large gaps and unknown numbers ask for a resync"""
+        history = ChatHistory(db_engine)
+        for n in range(10):
+            await history.append("lobby", n)
+        assert await history.since("lobby", 2, max_gap=5) is None
+        assert await history.since("lobby", 11) is None
+        assert await history.since("lobby", -1) is None
+
+
+class TestPage:
+    """Tests for paging back through a room's messages"""
+
+    @pytest.mark.asyncio
+    async def test_pages_span_memory_and_database(self, db_engine):
+        """Test paging from the ring buffer back into the database"""
+        history = ChatHistory(db_engine, buffer_size=3)
+        for n in range(1, 11):
+            await history.append("lobby", n)
+        await history.flush()
+
+        page = await history.page("lobby", limit=4)
+        assert [message["seq"] for message in page] == [7, 8, 9, 10]
+        page = await history.page("lobby", before=7, limit=4)
+        assert [message["seq"] for message in page] == [3, 4, 5, 6]
+        page = await history.page("lobby", before=3, limit=4)
+        assert [message["seq"] for message in page] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_unsaved_messages_paged(self, db_engine):
+        """Test that messages pushed out of the buffer before being written still page"""
+        history = ChatHistory(db_engine, buffer_size=2, flush_interval=60)
+        for n in range(1, 6):
+            await history.append("lobby", n)
+        page = await history.page("lobby", limit=10)
+        assert [message["data"] for message in page] == [1, 2, 3, 4, 5]
+
+    @pytest.mark.asyncio
+    async def test_unknown_room(self, db_engine):
+        """Test that a room nobody talked in has no messages"""
+        assert await ChatHistory(db_engine).page("nobody") == []
@@ -0,0 +1,345 @@
+"""
+Unit tests for modules/rtc/hub.py
+Tests for the RTC channel subscription hub
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from modules.rtc.hub import ChannelHub, CoalescePolicy, chat_channel, thread_channel
+from modules.rtc.protocol import BINARY_CODEC, DEFLATE_CODEC, Frame, decode_binary
+
+
+def sent_events(websocket):
+    """Decode the JSON text frames a mock websocket was sent"""
+    return [json.loads(call.args[0]) for call in websocket.send_text.await_args_list]
+
+
+class BlockedSocket:
+    """Websocket stand-in whose sends wait until released"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text):
+        await self.release.wait()
+        self.sent.append(json.loads(text)["n"])
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class TestThreadChannel:
+    """Tests for thread_channel helper"""
+
+    def test_thread_channel_name(self):
+        """Test that thread channels are namespaced by thread id"""
+        assert thread_channel(42) == "thread:42"
+
+    def test_chat_channel_name(self):
+        """Test that client-named rooms live in their own namespace"""
+        assert chat_channel("lobby") == "chat:lobby"
+
+
+class TestChannelHub:
+    """Tests for ChannelHub subscription management and publishing"""
+
+    def test_subscribe_and_unsubscribe(self):
+        """Test that subscribers are tracked and empty channels are dropped"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+
+        hub.subscribe("thread:1", websocket)
+        assert hub.subscriber_count("thread:1") == 1
+
+        hub.unsubscribe("thread:1", websocket)
+        assert hub.subscriber_count("thread:1") == 0
+        assert "thread:1" not in hub.channels
+
+    def test_unsubscribe_unknown_channel(self):
+        """Test that unsubscribing from an unknown channel is a no-op"""
+        hub = ChannelHub()
+        hub.unsubscribe("thread:404", AsyncMock())
+        assert hub.channels == {}
+
+    @pytest.mark.asyncio
+    async def test_publish_fans_out_to_channel_only(self):
+        """Test that events reach every subscriber of the channel and no others"""
+        hub = ChannelHub()
+        first, second, other = AsyncMock(), AsyncMock(), AsyncMock()
+        hub.subscribe("thread:1", first)
+        hub.subscribe("thread:1", second)
+        hub.subscribe("thread:2", other)
+
+        event = {"type": "post", "post_id": 7}
+        delivered = await hub.publish("thread:1", event)
+        await hub.flush()
+
+        assert delivered == 2
+        assert sent_events(first) == [event]
+        assert sent_events(second) == [event]
+        other.send_text.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_publish_drops_failed_subscribers(self):
+        """Test that subscribers whose send fails are unsubscribed"""
+        hub = ChannelHub()
+        healthy, broken = AsyncMock(), AsyncMock()
+        broken.send_text.side_effect = RuntimeError("closed")
+        hub.subscribe("thread:1", healthy)
+        hub.subscribe("thread:1", broken)
+
+        await hub.publish("thread:1", {"type": "post"})
+        await hub.flush()
+
+        assert hub.subscriber_count("thread:1") == 1
+        assert broken not in hub.connections
+
+    @pytest.mark.asyncio
+    async def test_publish_without_subscribers(self):
+        """Test that publishing to an empty channel delivers nothing"""
+        hub = ChannelHub()
+        assert await hub.publish("thread:1", {"type": "post"}) == 0
+
+    def test_disconnect_leaves_every_channel(self):
+        """Test that disconnecting removes a websocket from all its channels"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+        hub.subscribe("thread:1", websocket)
+        hub.subscribe("alter", websocket)
+
+        hub.disconnect(websocket)
+
+        assert hub.channels == {}
+        assert hub.connections == {}
+
+    @pytest.mark.asyncio
+    async def test_event_serialised_once(self):
+        """Test that fan-out encodes the event once for all members"""
+        hub = ChannelHub()
+        members = [AsyncMock() for _ in range(3)]
+        for websocket in members:
+            hub.subscribe("thread:1", websocket)
+
+        await hub.publish("thread:1", {"type": "post"})
+        await hub.flush()
+
+        frames = [websocket.send_text.await_args.args[0] for websocket in members]
+        assert frames[0] is frames[1] is frames[2]
+
+    @pytest.mark.asyncio
+    async def test_send_queues_behind_broadcasts(self):
+        """Test that a direct send is delivered after events already queued"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+        hub.subscribe("thread:1", websocket)
+
+        await hub.publish("thread:1", {"n": 1})
+        assert hub.send(websocket, {"n": 2}) is True
+        assert hub.send(AsyncMock(), {"n": 3}) is False
+        await hub.flush()
+
+        assert sent_events(websocket) == [{"n": 1}, {"n": 2}]
+
+    @pytest.mark.asyncio
+    async def test_idle_connections_have_no_writer(self):
+        """Test that writer tasks exist only while something is queued"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+        hub.subscribe("thread:1", websocket)
+        assert hub.connections[websocket].writer is None
+
+        await hub.publish("thread:1", {"n": 1})
+        assert hub.connections[websocket].writer is not None
+        await hub.flush()
+        assert hub.connections[websocket].writer is None
+
+    @pytest.mark.asyncio
+    async def test_slow_consumer_downsampled(self):
+        """Test that a full queue drops its oldest messages instead of blocking the publisher"""
+        hub = ChannelHub(queue_size=2, max_dropped=10)
+        slow, fast = BlockedSocket(), AsyncMock()
+        hub.subscribe("chat:busy", slow)
+        hub.subscribe("chat:busy", fast)
+
+        for n in range(6):
+            await hub.publish("chat:busy", {"n": n})
+            await asyncio.sleep(0)
+        slow.release.set()
+        await hub.flush()
+
+        assert [event["n"] for event in sent_events(fast)] == list(range(6))
+        # The first message was already being sent; of the rest only the newest two survive
+        assert slow.sent == [0, 4, 5]
+
+    @pytest.mark.asyncio
+    async def test_stuck_consumer_disconnected(self):
+        """Test that a consumer that keeps falling behind is dropped and closed"""
+        hub = ChannelHub(queue_size=2, max_dropped=3)
+        stuck = BlockedSocket()
+        hub.subscribe("chat:busy", stuck)
+
+        for n in range(7):
+            await hub.publish("chat:busy", {"n": n})
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        assert hub.subscriber_count("chat:busy") == 0
+        assert stuck not in hub.connections
+        assert stuck.closed_with == 1013
+
+    @pytest.mark.asyncio
+    async def test_fan_out_to_thousand_members(self):
+        """Test that publishing to 1k members only queues: it never suspends, sends nothing and encodes once"""
+        hub = ChannelHub()
+        members = [AsyncMock() for _ in range(1000)]
+        for websocket in members:
+            hub.subscribe("chat:big", websocket)
+
+        with patch("modules.rtc.hub.json.dumps", wraps=json.dumps) as dumps:
+            publishing = hub.publish("chat:big", {"type": "message", "data": "hello"})
+            # A coroutine that never awaits a send finishes on its first step
+            with pytest.raises(StopIteration) as finished:
+                publishing.send(None)
+            assert finished.value.value == 1000
+            assert not any(websocket.send_text.await_count for websocket in members)
+            await hub.flush()
+
+        assert dumps.call_count == 1
+        assert all(websocket.send_text.await_count == 1 for websocket in members)
+
+
+class TestCoalescing:
+    """Tests for per-room batching of events"""
+
+    @pytest.mark.asyncio
+    async def test_events_batched_per_tick(self):
+        """Test that a burst of events in a coalescing room goes out as one frame"""
+        hub = ChannelHub()
+        hub.set_policy("chat:*", CoalescePolicy(interval=0.02, max_batch=32))
+        websocket = AsyncMock()
+        hub.subscribe("chat:busy", websocket)
+
+        for n in range(10):
+            await hub.publish("chat:busy", {"n": n})
+        await hub.flush()
+
+        assert websocket.send_text.await_count == 1
+        frame = sent_events(websocket)[0]
+        assert frame["type"] == "batch"
+        assert [event["n"] for event in frame["events"]] == list(range(10))
+
+    @pytest.mark.asyncio
+    async def test_batch_size_capped(self):
+        """Test that batches never exceed the policy's maximum"""
+        hub = ChannelHub()
+        hub.set_policy("chat:busy", CoalescePolicy(interval=0.01, max_batch=4))
+        websocket = AsyncMock()
+        hub.subscribe("chat:busy", websocket)
+
+        for n in range(10):
+            await hub.publish("chat:busy", {"n": n})
+        await hub.flush()
+
+        assert [len(frame["events"]) for frame in sent_events(websocket)] == [4, 4, 2]
+
+    @pytest.mark.asyncio
+    async def test_other_rooms_unbatched(self):
+        """Test that rooms without a policy still get one frame per event, in order"""
+        hub = ChannelHub()
+        hub.set_policy("chat:*", CoalescePolicy(interval=0.01, max_batch=32))
+        websocket = AsyncMock()
+        hub.subscribe("chat:busy", websocket)
+        hub.subscribe("thread:1", websocket)
+
+        await hub.publish("chat:busy", {"n": 1})
+        await hub.publish("chat:busy", {"n": 2})
+        await hub.publish("thread:1", {"type": "post"})
+        await hub.flush()
+
+        frames = sent_events(websocket)
+        assert frames == [{"type": "batch", "events": [{"n": 1}, {"n": 2}]}, {"type": "post"}]
+
+    def test_exact_policy_beats_pattern(self):
+        """Test policy lookup order and that existing rooms pick up changes"""
+        hub = ChannelHub()
+        hub.subscribe("chat:lobby", AsyncMock())
+        hub.set_policy("chat:*", CoalescePolicy(0.05, 32))
+        hub.set_policy("chat:lobby", CoalescePolicy(0.2, 8))
+
+        assert hub.channels["chat:lobby"].policy == CoalescePolicy(0.2, 8)
+        assert hub.policy_for("chat:other") == CoalescePolicy(0.05, 32)
+        hub.set_policy("chat:lobby", None)
+        assert hub.channels["chat:lobby"].policy == CoalescePolicy(0.05, 32)
+
+
+class TestBinaryDelivery:
+    """Tests for members receiving binary frames"""
+
+    @pytest.mark.asyncio
+    async def test_codecs_per_member(self):
+        """Test that each member gets the event in its own codec, encoded once per codec"""
+        hub = ChannelHub()
+        json_member, binary_members = AsyncMock(), [AsyncMock() for _ in range(2)]
+        hub.subscribe("chat:lobby", json_member)
+        for websocket in binary_members:
+            hub.subscribe("chat:lobby", websocket, BINARY_CODEC)
+
+        await hub.publish("chat:lobby", {"type": "message", "data": "hi"})
+        await hub.flush()
+
+        assert sent_events(json_member) == [{"type": "message", "data": "hi"}]
+        frames = [websocket.send_bytes.await_args.args[0] for websocket in binary_members]
+        assert frames[0] is frames[1]
+        assert decode_binary(frames[0]) == Frame("message", hub.room_id("chat:lobby"), 0, {"data": "hi"})
+
+    @pytest.mark.asyncio
+    async def test_binary_batch(self):
+        """Test that coalesced events reach binary members as one deflated batch frame"""
+        hub = ChannelHub()
+        hub.set_policy("chat:*", CoalescePolicy(interval=0.01, max_batch=32))
+        websocket = AsyncMock()
+        hub.subscribe("chat:busy", websocket, DEFLATE_CODEC)
+
+        for n in range(40):
+            await hub.publish("chat:busy", {"type": "message", "data": "same text", "n": n})
+        await hub.flush()
+
+        batches = [decode_binary(call.args[0]) for call in websocket.send_bytes.await_args_list]
+        assert [batch.type for batch in batches] == ["batch", "batch"]
+        assert [frame.body["n"] for batch in batches for frame in batch.body] == list(range(40))
+
+    @pytest.mark.asyncio
+    async def test_seq_in_header(self):
+        """Test that an event's sequence number moves into the binary header"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+        hub.subscribe("chat:lobby", websocket, BINARY_CODEC)
+
+        await hub.publish("chat:lobby", {"type": "message", "room": "lobby", "seq": 9, "data": "hi"})
+        await hub.flush()
+
+        frame = decode_binary(websocket.send_bytes.await_args.args[0])
+        assert (frame.seq, frame.body) == (9, {"data": "hi"})
+
+    def test_room_ids(self):
+        """Test that rooms get ids that can be looked up and are released with the room"""
+        hub = ChannelHub()
+        websocket = AsyncMock()
+        hub.subscribe("chat:a", websocket)
+        hub.subscribe("chat:b", websocket)
+        room_id = hub.room_id("chat:b")
+
+        assert room_id != hub.room_id("chat:a")
+        assert hub.channel_of(room_id) == "chat:b"
+        hub.disconnect(websocket)
+        assert hub.channel_of(room_id) is None
+        assert hub.rooms_by_id == {}
@@ -0,0 +1,174 @@
+"""
+Unit tests for modules/rtc/presence.py
+Tests for the heartbeat timer wheel and per-channel presence counts
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from modules.rtc.presence import Presence, TimerWheel
+
+
+class FakeClock:
+    """Clock the test moves by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerWheel:
+    """Tests for TimerWheel"""
+
+    def test_fires_after_delay(self):
+        """Test that a timer fires on the first advance past its delay"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=16, tick=1.0, clock=clock)
+        wheel.schedule("a", 5)
+        clock.now += 4
+        assert wheel.advance() == []
+        clock.now += 1
+        assert wheel.advance() == ["a"]
+        assert len(wheel) == 0
+
+    def test_reschedule_postpones(self):
+        """Test that rearming a timer replaces its old deadline"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=16, tick=1.0, clock=clock)
+        wheel.schedule("a", 5)
+        clock.now += 4
+        wheel.schedule("a", 5)
+        clock.now += 4
+        assert wheel.advance() == []
+        clock.now += 1
+        assert wheel.advance() == ["a"]
+
+    def test_cancel(self):
+        """Test that a cancelled timer never fires"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=16, tick=1.0, clock=clock)
+        wheel.schedule("a", 1)
+        assert wheel.cancel("a")
+        assert not wheel.cancel("a")
+        clock.now += 2
+        assert wheel.advance() == []
+
+    def test_delay_longer_than_a_turn(self):
+        """Test that timers due on a later turn of the wheel wait for it"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=4, tick=1.0, clock=clock)
+        wheel.schedule("a", 10)
+        for _ in range(9):
+            clock.now += 1
+            assert wheel.advance() == []
+        clock.now += 1
+        assert wheel.advance() == ["a"]
+
+    def test_catches_up_after_stall(self):
+        """Test that an advance long overdue fires everything due"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=4, tick=1.0, clock=clock)
+        for n in range(10):
+            wheel.schedule(n, n + 1)
+        clock.now += 100
+        assert sorted(wheel.advance()) == list(range(10))
+
+    def test_advance_visits_only_due_timers(self):
+        """Test that a tick only looks at the timers of its own slot"""
+        clock = FakeClock()
+        wheel = TimerWheel(slots=64, tick=1.0, clock=clock)
+        for n in range(50000):
+            wheel.schedule(n, 30)
+        wheel.schedule("soon", 1)
+        clock.now += 1
+        visited = sum(len(slot) for slot in wheel.slots[int(clock.now) % 64:int(clock.now) % 64 + 1])
+        assert visited == 1
+        assert wheel.advance() == ["soon"]
+
+
+class TestPresence:
+    """Tests for Presence"""
+
+    @pytest.mark.asyncio
+    async def test_counts_people_not_connections(self):
+        """Test that a named user with two tabs counts once, anonymous tabs each count"""
+        presence = Presence(timeout=60, tick=1.0, slots=128)
+        tabs = [AsyncMock() for _ in range(4)]
+        presence.connect(tabs[0], "alice")
+        presence.connect(tabs[1], "alice")
+        presence.connect(tabs[2])
+        presence.connect(tabs[3])
+        for websocket in tabs:
+            presence.enter(websocket, "thread:1")
+
+        assert presence.count("thread:1") == 3
+        assert presence.snapshot("thread:1") == {"online": 3, "users": ["alice"]}
+
+    @pytest.mark.asyncio
+    async def test_identify_moves_counts(self):
+        """Test that naming a session already in channels recounts it as that user"""
+        presence = Presence(timeout=60, tick=1.0, slots=128)
+        tab, other_tab = AsyncMock(), AsyncMock()
+        presence.connect(tab)
+        presence.connect(other_tab, "alice")
+        for websocket in (tab, other_tab):
+            presence.enter(websocket, "thread:1")
+        assert presence.snapshot("thread:1") == {"online": 2, "users": ["alice"]}
+
+        presence.identify(tab, "alice")
+        assert presence.snapshot("thread:1") == {"online": 1, "users": ["alice"]}
+        presence.disconnect(other_tab)
+        assert presence.snapshot("thread:1") == {"online": 1, "users": ["alice"]}
+        presence.disconnect(tab)
+        assert presence.channels == {}
+
+    @pytest.mark.asyncio
+    async def test_leave_and_disconnect(self):
+        """Test that leaving and disconnecting uncount a session and drop empty channels"""
+        presence = Presence(timeout=60, tick=1.0, slots=128)
+        websocket = AsyncMock()
+        presence.connect(websocket, "alice")
+        presence.enter(websocket, "chat:a")
+        presence.enter(websocket, "chat:b")
+        presence.leave(websocket, "chat:a")
+        assert presence.count("chat:a") == 0
+        presence.disconnect(websocket)
+        assert presence.channels == {}
+        assert len(presence.wheel) == 0
+
+    @pytest.mark.asyncio
+    async def test_silent_sessions_expire(self):
+        """Test that a session without heartbeats stops counting until it is heard from"""
+        clock = FakeClock()
+        presence = Presence(timeout=30, tick=1.0, slots=64, clock=clock)
+        quiet, chatty = AsyncMock(), AsyncMock()
+        for websocket in (quiet, chatty):
+            presence.connect(websocket)
+            presence.enter(websocket, "thread:1")
+
+        clock.now += 20
+        presence.touch(chatty)
+        clock.now += 10
+        assert presence.expire() == 1
+        assert presence.count("thread:1") == 1
+
+        presence.touch(quiet)
+        assert presence.count("thread:1") == 2
+
+    @pytest.mark.asyncio
+    async def test_ticker_expires_sessions(self):
+        """Test that the ticker task expires sessions and stops when none are left"""
+        presence = Presence(timeout=0.05, tick=0.01, slots=64)
+        websocket = AsyncMock()
+        presence.connect(websocket)
+        presence.enter(websocket, "thread:1")
+        await asyncio.sleep(0.15)
+        assert presence.count("thread:1") == 0
+        assert presence._ticker.done()
@@ -0,0 +1,107 @@
+"""
+Unit tests for modules/rtc/protocol.py
+Tests for the binary RTC wire format
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent.parent / "codebase"))
+
+from modules.rtc.protocol import (
+    FLAG_DEFLATE, HEADER, JSON_CODEC, Frame, decode_binary, encode_batch, encode_binary, select_codec
+)
+
+
+class TestEncodeBinary:
+    """Tests for binary frame encoding and decoding"""
+
+    def test_round_trip(self):
+        """Test that the header carries type, room and sequence number"""
+        frame = encode_binary({"type": "message", "room": "lobby", "data": "hi"}, room_id=7, seq=42)
+        assert decode_binary(frame) == Frame("message", 7, 42, {"data": "hi"})
+
+    def test_smaller_than_json(self):
+        """Test that known keys move into the fixed header"""
+        event = {"type": "message", "room": "lobby", "data": "hi"}
+        assert len(encode_binary(event, room_id=7)) < len('{"type":"message","room":"lobby","data":"hi"}')
+
+    def test_unknown_type_kept_in_payload(self):
+        """Test that event types without a code survive the round trip"""
+        frame = decode_binary(encode_binary({"type": "typing", "who": "a"}))
+        assert frame.type == "typing"
+        assert frame.body == {"type": "typing", "who": "a"}
+
+    def test_room_kept_without_room_id(self):
+        """Test that events outside a numbered room keep their room name"""
+        frame = decode_binary(encode_binary({"type": "message", "room": "lobby"}))
+        assert frame.body == {"room": "lobby"}
+
+    def test_deflate_large_payloads(self):
+        """Test that large payloads are compressed and flagged"""
+        frame = encode_binary({"type": "message", "data": "ha" * 1000}, deflate=True)
+        assert frame[0] & FLAG_DEFLATE
+        assert len(frame) < 200
+        assert decode_binary(frame).body == {"data": "ha" * 1000}
+
+    def test_small_payloads_not_deflated(self):
+        """Test that payloads under the threshold are sent as they are"""
+        frame = encode_binary({"type": "message", "data": "hi"}, deflate=True)
+        assert not frame[0] & FLAG_DEFLATE
+
+    def test_incompressible_payloads_not_deflated(self):
+        """Test that payloads deflate would grow are sent as they are"""
+        with patch("config.RTC_DEFLATE_MIN_SIZE", 0):
+            frame = encode_binary({"type": "message", "data": "x"}, deflate=True)
+        assert not frame[0] & FLAG_DEFLATE
+
+    def test_truncated_frame(self):
+        """Test that frames shorter than the header are rejected"""
+        with pytest.raises(ValueError):
+            decode_binary(b"\x00\x01")
+
+    def test_corrupt_compressed_payload(self):
+        """Test that a deflate flag on garbage is rejected"""
+        with pytest.raises(ValueError):
+            decode_binary(HEADER.pack(FLAG_DEFLATE, 1, 0, 0) + b"\xff\xff\xff")
+
+
+class TestEncodeBatch:
+    """Tests for batch frames"""
+
+    def test_round_trip(self):
+        """Test that a batch decodes to its frames in order"""
+        frames = [encode_binary({"type": "message", "n": n}, room_id=3, seq=n) for n in range(3)]
+        batch = decode_binary(encode_batch(frames))
+        assert batch.type == "batch"
+        assert batch.body == [Frame("message", 3, n, {"n": n}) for n in range(3)]
+
+    def test_deflated_as_a_whole(self):
+        """Test that a batch of small frames compresses even though each frame is too small to"""
+        frames = [encode_binary({"type": "message", "data": "hello"}, room_id=3, seq=n) for n in range(50)]
+        batch = encode_batch(frames, deflate=True)
+        assert batch[0] & FLAG_DEFLATE
+        assert len(batch) < sum(len(frame) for frame in frames) / 4
+        assert len(decode_binary(batch).body) == 50
+
+    def test_truncated_batch(self):
+        """Test that a batch whose length prefix overruns is rejected"""
+        batch = encode_batch([encode_binary({"type": "message"})])
+        with pytest.raises(ValueError):
+            decode_binary(batch[:-1])
+
+
+class TestSelectCodec:
+    """Tests for codec negotiation"""
+
+    def test_known_codecs(self):
+        """Test that supported codecs are accepted"""
+        assert select_codec("binary") == "binary"
+        assert select_codec("binary-deflate") == "binary-deflate"
+
+    def test_fallback(self):
+        """Test that unknown or missing codecs fall back to JSON"""
+        assert select_codec("msgpack") == JSON_CODEC
+        assert select_codec(None) == JSON_CODEC
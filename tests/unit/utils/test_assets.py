@@ -0,0 +1,305 @@
+"""
+Unit tests for utils/assets.py
+Tests for the fingerprinted, precompressed static asset pipeline
+"""
+import gzip
+import pytest
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import utils.assets
+from utils.assets import (
+    AssetManifest,
+    CssBundler,
+    ImmutableStaticFiles,
+    IMMUTABLE_CACHE_CONTROL,
+    fingerprint_name,
+    find_static_dirs,
+    minify_css,
+    setup_assets
+)
+
+CSS = "body { color: #333; }\n" * 40
+
+
+@pytest.fixture
+def static_dirs(tmp_path):
+    """Global and module static directories with one stylesheet each"""
+    global_css = tmp_path / "static" / "css"
+    global_css.mkdir(parents=True)
+    (global_css / "main.css").write_text(CSS)
+    (global_css / "tiny.css").write_text("a{}")
+
+    module_css = tmp_path / "modules" / "forums" / "static" / "css"
+    module_css.mkdir(parents=True)
+    (module_css / "forums.css").write_text(CSS + ".thread {}\n")
+
+    return {"": str(tmp_path / "static"), "forums": str(tmp_path / "modules" / "forums" / "static")}
+
+
+@pytest.fixture
+def manifest(tmp_path, static_dirs):
+    """Manifest built from the fixture static directories"""
+    manifest = AssetManifest(str(tmp_path / "build"))
+    manifest.build(static_dirs)
+    return manifest
+
+
+class TestFingerprinting:
+    """Tests for fingerprinting helpers"""
+
+    def test_fingerprint_name_keeps_extension(self):
+        """Test that the digest is inserted before the extension"""
+        assert fingerprint_name("css/main.css", "abc123") == "css/main.abc123.css"
+
+    def test_find_static_dirs(self, tmp_path, monkeypatch, static_dirs):
+        """Test discovery of the global and module static directories"""
+        monkeypatch.chdir(tmp_path)
+        assert find_static_dirs() == {"": "static", "forums": "modules/forums/static"}
+
+
+class TestAssetManifest:
+    """Tests for AssetManifest build, load and URL generation"""
+
+    def test_build_maps_logical_paths(self, manifest):
+        """Test that global and module assets get fingerprinted entries"""
+        assert set(manifest.assets) == {"css/main.css", "css/tiny.css", "forums/css/forums.css"}
+        assert manifest.assets["css/main.css"].startswith("css/main.")
+
+    def test_build_writes_gzip_variant(self, manifest):
+        """Test that compressible files get a matching precompressed copy"""
+        target = Path(manifest.build_dir) / manifest.assets["css/main.css"]
+        compressed = target.with_name(target.name + ".gz")
+        assert gzip.decompress(compressed.read_bytes()) == target.read_bytes()
+
+    def test_build_skips_gzip_for_tiny_files(self, manifest):
+        """Test that files too small to benefit are not precompressed"""
+        target = Path(manifest.build_dir) / manifest.assets["css/tiny.css"]
+        assert not target.with_name(target.name + ".gz").exists()
+
+    def test_content_change_changes_url(self, tmp_path, manifest, static_dirs):
+        """Test that editing a file produces a new fingerprinted URL"""
+        before = manifest.url("css/main.css")
+        (tmp_path / "static" / "css" / "main.css").write_text(CSS + "p {}\n")
+        manifest.build(static_dirs)
+        assert manifest.url("css/main.css") != before
+
+    def test_load_reuses_built_manifest(self, manifest):
+        """Test that another process can load the manifest without rebuilding"""
+        other = AssetManifest(manifest.build_dir)
+        assert other.load() is True
+        assert other.assets == manifest.assets
+
+    def test_load_missing_manifest(self, tmp_path):
+        """Test that loading without a build falls back to an empty manifest"""
+        manifest = AssetManifest(str(tmp_path / "nothing"))
+        assert manifest.load() is False
+        assert manifest.assets == {}
+
+    def test_url_falls_back_to_static(self, tmp_path):
+        """Test that unknown assets keep their plain /static URL"""
+        manifest = AssetManifest(str(tmp_path / "build"))
+        assert manifest.url("css/main.css") == "/static/css/main.css"
+
+
+class TestImmutableStaticFiles:
+    """Tests for serving fingerprinted assets"""
+
+    @pytest.fixture
+    def client(self, manifest):
+        app = FastAPI()
+        app.mount("/assets", ImmutableStaticFiles(directory=manifest.build_dir), name="assets")
+        return TestClient(app)
+
+    def test_serves_gzip_variant(self, client, manifest):
+        """Test that gzip-capable clients get the precompressed copy"""
+        response = client.get(manifest.url("css/main.css"), headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/css")
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.text == CSS
+
+    def test_serves_identity_without_gzip(self, client, manifest):
+        """Test that clients not accepting gzip get the plain file"""
+        response = client.get(manifest.url("css/main.css"), headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+    def test_serves_identity_when_gzip_refused(self, client, manifest):
+        """Test that gzip;q=0 is honoured as a refusal"""
+        response = client.get(manifest.url("css/main.css"), headers={"Accept-Encoding": "gzip;q=0, identity"})
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert response.text == CSS
+
+    def test_missing_asset_not_cached(self, client):
+        """Test that 404s are not marked immutable"""
+        response = client.get("/assets/css/missing.abc.css")
+        assert response.status_code == 404
+        assert response.headers.get("cache-control") != IMMUTABLE_CACHE_CONTROL
+
+
+class TestMinifyCss:
+    """Tests for minify_css"""
+
+    def test_strips_comments_and_whitespace(self):
+        """Test that comments and redundant whitespace are removed"""
+        css = "/* header */\nbody {\n    color: #333;\n    margin: 0;\n}\n\na, b { x: y; }\n"
+        assert minify_css(css) == "body{color: #333;margin: 0}a,b{x: y}"
+
+    def test_keeps_descendant_selectors(self):
+        """Test that significant selector whitespace is preserved"""
+        assert minify_css(".nav  a:hover { color: red; }") == ".nav a:hover{color: red}"
+
+    def test_keeps_strings_verbatim(self):
+        """Test that quoted strings keep their punctuation, whitespace runs and comment-like text"""
+        css = 'a::before { content: "x ; {  } /* y */" ; font-family: \'Open  Sans\' , serif; }'
+        assert minify_css(css) == 'a::before{content: "x ; {  } /* y */";font-family: \'Open  Sans\',serif}'
+
+    def test_keeps_url_arguments_verbatim(self):
+        """Test that unquoted url() arguments are not rewritten"""
+        css = "a { background: url(data:image/svg+xml;utf8,a{b}) ; }"
+        assert minify_css(css) == "a{background: url(data:image/svg+xml;utf8,a{b})}"
+
+    def test_comment_separates_tokens(self):
+        """Test that a removed comment still leaves the tokens around it apart"""
+        assert minify_css("a { margin: 1px/**/2px; }") == "a{margin: 1px 2px}"
+
+
+class TestCssBundler:
+    """Tests for per-alter CSS bundles"""
+
+    @pytest.fixture
+    def bundler(self, tmp_path, monkeypatch, static_dirs):
+        """Bundler over the fixture project with a theme and alter stylesheet"""
+        css_dir = tmp_path / "static" / "css"
+        (css_dir / "theme-toggle.css").write_text(":root { --bg: #fff; }")
+        (css_dir / "seles.css").write_text("/* seles */ body { color: pink; }")
+        monkeypatch.chdir(tmp_path)
+        manifest = AssetManifest(str(tmp_path / "build"))
+        manifest.enabled = True
+        return CssBundler(manifest)
+
+    def bundle_text(self, bundler, url):
+        return (Path(bundler.manifest.build_dir) / url[len("/assets/"):]).read_text()
+
+    def test_bundle_concatenates_in_cascade_order(self, bundler):
+        """Test that main, theme-toggle and the alter stylesheet are bundled in order"""
+        text = self.bundle_text(bundler, bundler.url("seles"))
+        assert text.index("color: #333") < text.index("--bg") < text.index("pink")
+        assert "/* seles */" not in text
+
+    def test_module_bundle_appends_module_css(self, bundler):
+        """Test that a module bundle includes the module's stylesheet"""
+        text = self.bundle_text(bundler, bundler.url("seles", "forums"))
+        assert ".thread" in text
+        assert text.index("pink") < text.index(".thread")
+
+    def test_global_bundle_skips_alter_css(self, bundler):
+        """Test that the global bundle only has the shared stylesheets"""
+        assert bundler.stylesheet_paths("global") == CssBundler.BASE_STYLESHEETS
+
+    def test_bundle_recorded_in_manifest(self, bundler):
+        """Test that bundles are registered as fingerprinted assets"""
+        url = bundler.url("seles")
+        assert bundler.manifest.url("bundles/seles.css") == url
+
+    def test_source_change_rebuilds_bundle(self, bundler, tmp_path):
+        """Test that editing a source stylesheet produces a new bundle"""
+        before = bundler.url("seles")
+        (tmp_path / "static" / "css" / "seles.css").write_text("body { color: teal; }")
+        bundler.check_interval = 0
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("utils.assets._file_mtimes", lambda paths: (None,) * len(paths))
+            after = bundler.url("seles")
+        assert after != before
+        assert "teal" in self.bundle_text(bundler, after)
+
+    def test_cached_within_interval(self, bundler):
+        """Test that repeat lookups within the check interval reuse the bundle"""
+        first = bundler.url("seles")
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("utils.assets.find_static_dirs", lambda: pytest.fail("re-scanned sources"))
+            assert bundler.url("seles") == first
+
+    def test_load_all_reuses_prebuilt_bundles(self, bundler):
+        """Test that bundles found in a prebuilt manifest are served without being rebuilt"""
+        built = bundler.url("seles", "forums")
+        bundler.manifest.save()
+        manifest = AssetManifest(bundler.manifest.build_dir)
+        manifest.load()
+        loaded = CssBundler(manifest)
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(loaded, "build", lambda *args: pytest.fail("rebuilt a prebuilt bundle"))
+            assert loaded.load_all(["seles", "global"], [None, "forums"]) == 1
+            assert loaded.url("seles", "forums") == built
+
+    def test_links_single_bundle(self, bundler):
+        """Test that pages get a single stylesheet link when the pipeline is on"""
+        links = bundler.links("seles", "forums")
+        assert links.count("<link") == 1
+        assert "/assets/bundles/seles-forums." in links
+
+    def test_links_fall_back_when_pipeline_off(self, bundler):
+        """Test that individual /static links are used when assets aren't mounted"""
+        bundler.manifest.enabled = False
+        links = bundler.links(None)
+        assert links.count("<link") == 2
+        assert '/static/css/main.css' in links
+
+
+class TestSetupAssets:
+    """Tests for mounting the asset pipeline on the app"""
+
+    @pytest.fixture
+    def project(self, tmp_path, monkeypatch, static_dirs):
+        """Fixture project with fresh process-wide manifest and bundler"""
+        (tmp_path / "static" / "css" / "theme-toggle.css").write_text(":root { --bg: #fff; }")
+        monkeypatch.chdir(tmp_path)
+        manifest = AssetManifest(str(tmp_path / "build"))
+        monkeypatch.setattr(utils.assets, "asset_manifest", manifest)
+        monkeypatch.setattr(utils.assets, "css_bundler", CssBundler(manifest))
+        return tmp_path
+
+    def test_startup_builds_assets_and_bundles(self, project):
+        """Test that startup mode fingerprints the static files and builds every bundle"""
+        manifest = setup_assets(FastAPI(), mode="startup", alters=["seles"])
+
+        assert manifest.enabled
+        assert "css/main.css" in manifest.assets
+        assert {"bundles/seles.css", "bundles/seles-forums.css", "bundles/global.css"} <= set(manifest.assets)
+
+    def test_prebuilt_reads_bundles_from_manifest(self, project, monkeypatch):
+        """Test that prebuilt mode takes bundle URLs from manifest.json without building anything"""
+        setup_assets(FastAPI(), mode="startup", alters=["seles"])
+        built = utils.assets.css_bundler.url("seles", "forums")
+
+        manifest = AssetManifest(str(project / "build"))
+        bundler = CssBundler(manifest)
+        monkeypatch.setattr(utils.assets, "asset_manifest", manifest)
+        monkeypatch.setattr(utils.assets, "css_bundler", bundler)
+        monkeypatch.setattr(manifest, "build", lambda *args: pytest.fail("rebuilt the manifest"))
+        monkeypatch.setattr(bundler, "build", lambda *args: pytest.fail("rebuilt a bundle"))
+        monkeypatch.setattr(bundler, "build_all", lambda *args: pytest.fail("rebuilt the bundles"))
+
+        setup_assets(FastAPI(), mode="prebuilt", alters=["seles"])
+
+        assert manifest.enabled
+        assert bundler.url("seles", "forums") == built
+
+    def test_off_leaves_static_urls(self, project):
+        """Test that turning the pipeline off neither builds nor mounts anything"""
+        app = FastAPI()
+        manifest = setup_assets(app, mode="off")
+
+        assert not manifest.enabled
+        assert not manifest.assets
+        assert all(route.path != "/assets" for route in app.routes)
@@ -0,0 +1,184 @@
+"""
+Unit tests for utils/compression.py
+Tests for the gzip response compression middleware
+"""
+import gzip
+import pytest
+import sys
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
+
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from utils.compression import CompressionMiddleware, accepts_gzip, is_compressible, no_compression
+
+PAGE = "<p>" + "reply " * 500 + "</p>"
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+@pytest.fixture
+def client():
+    """App with a mix of compressible, incompressible and streamed routes"""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, exclude_paths=("/raw",))
+
+    @app.get("/page", response_class=HTMLResponse)
+    def page():
+        return PAGE
+
+    @app.get("/small", response_class=HTMLResponse)
+    def small():
+        return "<p>hi</p>"
+
+    @app.get("/image")
+    def image():
+        return Response(b"\x89PNG" + b"\x00" * 2000, media_type="image/png")
+
+    @app.get("/precompressed")
+    def precompressed():
+        return Response(gzip.compress(PAGE.encode()), media_type="text/html", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/partial")
+    def partial():
+        return Response(PAGE[:1000], status_code=206, media_type="text/html",
+                        headers={"Content-Range": f"bytes 0-999/{len(PAGE)}"})
+
+    @app.get("/range-header")
+    def range_header():
+        return Response(PAGE, media_type="text/html",
+                        headers={"Content-Range": f"bytes 0-{len(PAGE) - 1}/{len(PAGE)}"})
+
+    @app.get("/opt-out", response_class=HTMLResponse)
+    @no_compression
+    def opt_out():
+        return PAGE
+
+    @app.get("/raw/page", response_class=HTMLResponse)
+    def raw_page():
+        return PAGE
+
+    @app.get("/stream")
+    def stream():
+        def chunks():
+            for i in range(50):
+                yield f"<li>post {i} {'x' * 40}</li>"
+        return StreamingResponse(chunks(), media_type="text/html")
+
+    return TestClient(app)
+
+
+class TestAcceptEncoding:
+    """Tests for accepts_gzip and is_compressible helpers"""
+
+    @pytest.mark.parametrize("header,expected", [
+        ("gzip, deflate, br", True),
+        ("br;q=1.0, gzip;q=0.8", True),
+        ("*", True),
+        ("gzip;q=0", False),
+        ("identity", False),
+        ("", False),
+    ])
+    def test_accepts_gzip(self, header, expected):
+        """Test Accept-Encoding parsing including q-values"""
+        assert accepts_gzip(header) is expected
+
+    @pytest.mark.parametrize("content_type,expected", [
+        ("text/html; charset=utf-8", True),
+        ("application/json", True),
+        ("application/ld+json", True),
+        ("image/svg+xml", True),
+        ("image/png", False),
+        ("font/woff2", False),
+        ("text/event-stream", False),
+    ])
+    def test_is_compressible(self, content_type, expected):
+        """Test that text types compress and binary or streaming types do not"""
+        assert is_compressible(content_type) is expected
+
+
+class TestCompressionMiddleware:
+    """Tests for CompressionMiddleware"""
+
+    def test_compresses_large_html(self, client):
+        """Test that large HTML responses are gzipped"""
+        response = client.get("/page", headers=GZIP)
+        assert response.headers["content-encoding"] == "gzip"
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert int(response.headers["content-length"]) < len(PAGE)
+        assert response.text == PAGE
+
+    def test_skips_without_accept_encoding(self, client):
+        """Test that clients not accepting gzip get the identity body"""
+        response = client.get("/page", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.text == PAGE
+
+    def test_skips_below_threshold(self, client):
+        """Test that small responses are sent uncompressed"""
+        response = client.get("/small", headers=GZIP)
+        assert "content-encoding" not in response.headers
+
+    def test_skips_compressed_media_types(self, client):
+        """Test that images are not recompressed"""
+        response = client.get("/image", headers=GZIP)
+        assert "content-encoding" not in response.headers
+
+    def test_skips_already_encoded(self, client):
+        """Test that precompressed responses pass through untouched"""
+        response = client.get("/precompressed", headers=GZIP)
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) == len(gzip.compress(PAGE.encode()))
+        assert response.text == PAGE
+
+    def test_skips_partial_content(self, client):
+        """Test that 206 responses keep their identity bytes"""
+        response = client.get("/partial", headers=GZIP)
+        assert response.status_code == 206
+        assert "content-encoding" not in response.headers
+        assert response.text == PAGE[:1000]
+
+    def test_skips_content_range(self, client):
+        """Test that any response carrying Content-Range is not compressed"""
+        response = client.get("/range-header", headers=GZIP)
+        assert "content-encoding" not in response.headers
+        assert response.text == PAGE
+
+    def test_route_opt_out(self, client):
+        """Test that routes marked with no_compression are not compressed"""
+        response = client.get("/opt-out", headers=GZIP)
+        assert "content-encoding" not in response.headers
+        assert response.text == PAGE
+
+    def test_excluded_paths(self, client):
+        """Test that excluded path prefixes are not compressed"""
+        response = client.get("/raw/page", headers=GZIP)
+        assert "content-encoding" not in response.headers
+
+    def test_static_files_excluded(self, tmp_path):
+        """Test that files under an excluded /static mount are served as is, ranges and validators included"""
+        from fastapi.staticfiles import StaticFiles
+
+        (tmp_path / "main.css").write_text("body { color: #333; }\n" * 100)
+        app = FastAPI()
+        app.mount("/static", StaticFiles(directory=str(tmp_path)), name="static")
+        app.add_middleware(CompressionMiddleware, minimum_size=500, exclude_paths=("/static",))
+        client = TestClient(app)
+
+        response = client.get("/static/main.css", headers=GZIP)
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-length"] == str(len(response.content))
+        assert not response.headers["etag"].startswith("W/")
+
+        partial = client.get("/static/main.css", headers={**GZIP, "Range": "bytes=0-3"})
+        assert partial.status_code == 206
+        assert partial.content == b"body"
+
+    def test_streaming_response(self, client):
+        """Test that streamed bodies are compressed chunk by chunk"""
+        response = client.get("/stream", headers=GZIP)
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text.count("<li>") == 50
@@ -273,6 +273,51 @@ class TestDatabaseInitialization:
         # Should be called twice without error
         assert mock_metadata.create_all.call_count == 2
 
+    def test_ensure_indexes_adds_missing_indexes(self):
+        """Test that indexes missing from an existing table are created, and that a second run is a no-op"""
+        from sqlalchemy import create_engine, inspect, text
+        from utils.db import ensure_indexes
+
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            # A chat_messages table created before its index was declared
+            connection.execute(text(
+                "CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, room VARCHAR, seq INTEGER, "
+                "data TEXT, created_at DATETIME)"
+            ))
+
+        ensure_indexes(engine)
+        ensure_indexes(engine)
+
+        indexes = inspect(engine).get_indexes("chat_messages")
+        assert [index["name"] for index in indexes] == ["ix_chat_messages_room_seq"]
+        assert indexes[0]["column_names"] == ["room", "seq"]
+        # Tables that don't exist are left for create_all
+        assert not inspect(engine).has_table("alters")
+
+
+    def test_ensure_indexes_makes_index_unique(self):
+        """Test that an index since declared unique replaces its non-unique predecessor"""
+        from sqlalchemy import create_engine, inspect, text
+        from sqlalchemy.exc import IntegrityError
+        from utils.db import ensure_indexes
+
+        engine = create_engine("sqlite:///:memory:")
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, room VARCHAR, seq INTEGER, "
+                "data TEXT, created_at DATETIME)"
+            ))
+            connection.execute(text("CREATE INDEX ix_chat_messages_room_seq ON chat_messages (room, seq)"))
+
+        ensure_indexes(engine)
+
+        indexes = inspect(engine).get_indexes("chat_messages")
+        assert [(index["name"], index["unique"]) for index in indexes] == [("ix_chat_messages_room_seq", 1)]
+        with pytest.raises(IntegrityError):
+            with engine.begin() as connection:
+                connection.execute(text("INSERT INTO chat_messages (room, seq) VALUES ('lobby', 1), ('lobby', 1)"))
+
 
 class TestSessionLocal:
     """Tests for database session"""
@@ -15,12 +15,21 @@ from utils.loader import (
     validate_path,
     resolve_template_path,
     resolve_static_path,
-    get_module_resources
+    get_module_resources,
+    clear_template_cache,
+    get_loader_context,
+    init_loader_context,
+    LoaderContext
 )
 
 
 class TestValidatePath:
     """Tests for validate_path function"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_context(self, monkeypatch):
+        """Let each test create the loader context from its own working directory"""
+        monkeypatch.setattr('utils.loader._context', None)
     
     def test_validate_path_within_project_root(self, tmp_path):
         """Test that paths within project root are validated"""
@@ -75,6 +84,135 @@ class TestValidatePath:
             assert result is True  # Path is within root, even if doesn't exist
 
 
+class TestLoaderContext:
+    """Tests for LoaderContext root capture, memoization and batch validation"""
+
+    def test_root_resolved_once(self, tmp_path):
+        """Test that validations don't re-resolve the project root"""
+        context = LoaderContext(tmp_path)
+        with patch('utils.loader.Path.cwd') as mock_cwd:
+            context.validate("templates/index.html")
+            context.validate("static/css/main.css")
+            mock_cwd.assert_not_called()
+
+    def test_repeat_validation_is_memoized(self, tmp_path):
+        """Test that a repeat validation is served from the LRU cache"""
+        context = LoaderContext(tmp_path, recheck_interval=3600)
+        assert context.validate("templates/index.html") is True
+        assert context.validate("templates/index.html") is True
+        assert context._resolve.cache_info().hits == 1
+
+    def test_relative_paths_resolve_against_root(self, tmp_path):
+        """Test that relative paths are interpreted inside the project root"""
+        context = LoaderContext(tmp_path)
+        assert context.validate("modules/forums/templates/x.html") is True
+        assert context.validate("../outside.txt") is False
+
+    def test_symlink_escaping_root_rejected(self, tmp_path):
+        """Test that a symlink pointing outside the root fails validation"""
+        project = tmp_path / "project"
+        project.mkdir()
+        outside = tmp_path / "secret.txt"
+        outside.touch()
+        (project / "link.txt").symlink_to(outside)
+
+        context = LoaderContext(project)
+        assert context.validate("link.txt") is False
+
+    def test_clear_picks_up_relinked_symlink(self, tmp_path):
+        """Test that clearing the cache re-resolves changed symlinks"""
+        project = tmp_path / "project"
+        project.mkdir()
+        (project / "inside.txt").touch()
+        outside = tmp_path / "secret.txt"
+        outside.touch()
+        link = project / "link.txt"
+        link.symlink_to(project / "inside.txt")
+
+        context = LoaderContext(project)
+        assert context.validate("link.txt") is True
+
+        link.unlink()
+        link.symlink_to(outside)
+        context.clear()
+        assert context.validate("link.txt") is False
+
+    def test_relinked_symlink_picked_up_after_interval(self, tmp_path):
+        """Test that a changed symlink is re-resolved once the recheck interval passes"""
+        project = tmp_path / "project"
+        project.mkdir()
+        (project / "inside.txt").touch()
+        outside = tmp_path / "secret.txt"
+        outside.touch()
+        link = project / "link.txt"
+        link.symlink_to(project / "inside.txt")
+
+        context = LoaderContext(project, recheck_interval=2.0)
+        with patch('utils.loader.time.monotonic', return_value=100.0):
+            assert context.validate("link.txt") is True
+
+        link.unlink()
+        link.symlink_to(outside)
+        with patch('utils.loader.time.monotonic', return_value=100.5):
+            assert context.validate("link.txt") is True
+        with patch('utils.loader.time.monotonic', return_value=102.0):
+            assert context.validate("link.txt") is False
+
+    def test_validate_many(self, tmp_path):
+        """Test batch validation of several paths"""
+        context = LoaderContext(tmp_path)
+        result = context.validate_many(["templates/a.html", "/etc/passwd"])
+        assert result == {"templates/a.html": True, "/etc/passwd": False}
+
+    def test_validate_module_resources_reports_escapes(self, tmp_path):
+        """Test that the resource tree walk reports paths escaping the root"""
+        project = tmp_path / "project"
+        templates = project / "modules" / "forums" / "templates" / "forums"
+        templates.mkdir(parents=True)
+        (templates / "index.html").touch()
+        outside = tmp_path / "outside"
+        outside.mkdir()
+        (project / "modules" / "forums" / "static").mkdir()
+        (project / "modules" / "forums" / "static" / "css").symlink_to(outside)
+
+        context = LoaderContext(project)
+        unsafe = context.validate_module_resources("forums")
+
+        assert unsafe == [os.path.join("modules", "forums", "static", "css")]
+        # The safe template was validated and cached along the way
+        assert context.validate("modules/forums/templates/forums/index.html") is True
+        assert context._resolve.cache_info().hits >= 1
+
+    def test_validate_module_resources_missing_module(self, tmp_path):
+        """Test that a module without resource directories is trivially safe"""
+        context = LoaderContext(tmp_path)
+        assert context.validate_module_resources("nonexistent") == []
+
+
+class TestProcessContext:
+    """Tests for the process-wide loader context"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_context(self, monkeypatch):
+        """Start every test without a process-wide context"""
+        monkeypatch.setattr('utils.loader._context', None)
+
+    def test_init_resolves_root_once(self, tmp_path):
+        """Test that validations after startup never look at the working directory"""
+        context = init_loader_context(tmp_path)
+        with patch('utils.loader.Path.cwd') as mock_cwd:
+            assert get_loader_context() is context
+            assert validate_path("templates/index.html") is True
+            mock_cwd.assert_not_called()
+
+    def test_created_from_working_directory_on_first_use(self, tmp_path, monkeypatch):
+        """Test that the first lookup creates the context from the working directory"""
+        monkeypatch.chdir(tmp_path)
+        context = get_loader_context()
+        assert context.root == tmp_path.resolve()
+        assert get_loader_context() is context
+
+
 class TestResolveTemplatePath:
     """Tests for resolve_template_path function"""
     
@@ -164,6 +302,58 @@ class TestResolveTemplatePath:
             assert result == "templates/index.html"
 
 
+class TestTemplateResolutionCache:
+    """Tests for the resolve_template_path resolution cache"""
+
+    @pytest.fixture(autouse=True)
+    def project(self, tmp_path, monkeypatch):
+        """Temporary project root with a global templates directory"""
+        (tmp_path / "templates").mkdir()
+        (tmp_path / "templates" / "index.html").write_text("home")
+        monkeypatch.chdir(tmp_path)
+        clear_template_cache()
+        with patch('utils.loader._current_alter', return_value="seles"):
+            yield tmp_path
+        clear_template_cache()
+
+    def test_cached_lookup_skips_filesystem(self):
+        """Test that a repeat lookup is served without touching the filesystem"""
+        assert resolve_template_path("index.html") == "templates/index.html"
+
+        with patch('utils.loader.os.path.exists') as mock_exists, \
+             patch('utils.loader.validate_path') as mock_validate:
+            assert resolve_template_path("index.html") == "templates/index.html"
+            mock_exists.assert_not_called()
+            mock_validate.assert_not_called()
+
+    def test_misses_are_cached(self):
+        """Test that a missing template is negatively cached"""
+        assert resolve_template_path("missing.html") is None
+
+        with patch('utils.loader.os.path.exists') as mock_exists:
+            assert resolve_template_path("missing.html") is None
+            mock_exists.assert_not_called()
+
+    def test_cache_is_keyed_by_alter(self, project):
+        """Test that switching alters resolves against the new alter's templates"""
+        alter_dir = project / "modules" / "alter" / "templates" / "dexen"
+        alter_dir.mkdir(parents=True)
+        (alter_dir / "profile.html").write_text("dexen")
+
+        assert resolve_template_path("profile.html") is None
+        with patch('utils.loader._current_alter', return_value="dexen"):
+            assert resolve_template_path("profile.html") == "modules/alter/templates/dexen/profile.html"
+
+    def test_directory_change_invalidates_entry(self, project):
+        """Test that adding a template is picked up once its directory changes"""
+        assert resolve_template_path("new.html") is None
+        (project / "templates" / "new.html").write_text("new")
+
+        with patch('utils.loader.TEMPLATE_CACHE_CHECK_INTERVAL', 0), \
+             patch('utils.loader._dir_mtimes', return_value=(-1.0,)):
+            assert resolve_template_path("new.html") == "templates/new.html"
+
+
 class TestResolveStaticPath:
     """Tests for resolve_static_path function"""
     
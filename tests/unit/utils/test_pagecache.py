@@ -0,0 +1,247 @@
+"""
+Unit tests for utils/pagecache.py
+Tests for the alter-aware full-page microcache
+"""
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+from fastapi.testclient import TestClient
+from utils.pagecache import LocalVersions, PageCache, PageCacheMiddleware, SharedVersions, parse_cache_paths
+
+RULES = {"/": "home", "/forums": "forums"}
+
+
+def make_app(state, cache):
+    """App with counted renders and a mutable fronting alter, cached in the given PageCache"""
+    app = FastAPI()
+    app.add_middleware(PageCacheMiddleware, cache=cache, rules=RULES, vary=lambda: state["alter"])
+
+    @app.get("/", response_class=HTMLResponse)
+    def home():
+        state["renders"] += 1
+        return f"home for {state['alter'][0]} #{state['renders']}"
+
+    @app.get("/forums/threads/{thread_id}", response_class=HTMLResponse)
+    async def thread(thread_id: int):
+        state["renders"] += 1
+        await asyncio.sleep(0.05)
+        return f"thread {thread_id} #{state['renders']}"
+
+    @app.post("/forums/posts/")
+    def create_post():
+        return {"success": True}
+
+    @app.post("/forums/fail")
+    def fail():
+        return HTMLResponse("no", status_code=400)
+
+    @app.get("/forums/private", response_class=HTMLResponse)
+    def private():
+        state["renders"] += 1
+        return HTMLResponse("mine", headers={"Cache-Control": "private"})
+
+    @app.get("/admin", response_class=HTMLResponse)
+    def admin():
+        state["renders"] += 1
+        return "admin"
+
+    return app
+
+
+@pytest.fixture
+def site(tmp_path):
+    """App with counted renders and a mutable fronting alter"""
+    state = {"renders": 0, "alter": ("seles", 1)}
+    cache = PageCache(ttl=5, max_bytes=1 << 20, max_entries=16, versions=SharedVersions(tmp_path / "versions.bin"))
+    state["app"], state["cache"] = make_app(state, cache), cache
+    return state
+
+
+class TestPageCache:
+    """Tests for PageCache storage"""
+
+    def test_parse_cache_paths(self):
+        """Test parsing of prefix=namespace pairs"""
+        assert parse_cache_paths("/=home, /forums=forums,/rtc") == {"/": "home", "/forums": "forums", "/rtc": "/rtc"}
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after the TTL"""
+        cache = PageCache(ttl=0.01, max_bytes=1000, max_entries=10)
+        cache.put("a", 200, [], b"x")
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.size == 0
+
+    def test_bounded_by_bytes(self):
+        """Test that least recently used entries are evicted to stay under the byte limit"""
+        cache = PageCache(ttl=5, max_bytes=100, max_entries=10)
+        cache.put("a", 200, [], b"x" * 20)
+        cache.put("b", 200, [], b"x" * 20)
+        cache.get("a")
+        for key in "cdef":
+            cache.put(key, 200, [], b"x" * 20)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.size <= 100
+
+    def test_bounded_by_entries(self):
+        """Test that the entry count limit is enforced"""
+        cache = PageCache(ttl=5, max_bytes=1000, max_entries=2)
+        for key in "abc":
+            cache.put(key, 200, [], b"x")
+        assert list(cache.entries) == ["b", "c"]
+
+    def test_oversized_page_not_cached(self):
+        """Test that a page larger than a quarter of the cache is refused"""
+        cache = PageCache(ttl=5, max_bytes=100, max_entries=10)
+        assert cache.put("a", 200, [], b"x" * 30) is False
+
+
+class TestVersions:
+    """Tests for namespace versions shared between workers"""
+
+    def test_bump_seen_by_other_worker(self, tmp_path):
+        """Test that a bump through one mapping is read through another"""
+        first, second = SharedVersions(tmp_path / "versions.bin"), SharedVersions(tmp_path / "versions.bin")
+        assert second.get("forums") == 0
+        assert first.bump("forums") == 1
+        assert second.get("forums") == 1
+        assert second.bump("forums") == 2
+        assert first.get("forums") == 2
+        assert first.get("home") == 0
+
+    def test_concurrent_bumps_not_lost(self, tmp_path):
+        """Test that bumps racing from several threads all count"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        versions = [SharedVersions(tmp_path / "versions.bin") for _ in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda n: versions[n % 4].bump("forums"), range(200)))
+        assert versions[0].get("forums") == 200
+
+    def test_existing_file_sets_table_size(self, tmp_path):
+        """Test that a worker adopts the table size of the file another worker created"""
+        SharedVersions(tmp_path / "versions.bin", slots=8).bump("forums")
+        versions = SharedVersions(tmp_path / "versions.bin", slots=64)
+        assert versions.get("forums") == 1
+        assert versions.slots == 8
+
+    def test_foreign_file_rejected(self, tmp_path):
+        """Test that a file that isn't a version table is not overwritten"""
+        (tmp_path / "versions.bin").write_bytes(b"x" * 64)
+        with pytest.raises(ValueError):
+            SharedVersions(tmp_path / "versions.bin").get("forums")
+
+    def test_local_versions(self):
+        """Test the per-process versions used when no version file is configured"""
+        versions = LocalVersions()
+        assert versions.bump("forums") == 1
+        assert versions.get("forums") == 1
+        assert versions.get("home") == 0
+
+    def test_default_versions(self, tmp_path):
+        """Test that the version file setting chooses shared or per-process versions"""
+        from unittest.mock import patch
+
+        with patch("config.PAGE_CACHE_VERSIONS_FILE", str(tmp_path / "versions.bin")):
+            assert isinstance(PageCache().versions, SharedVersions)
+        with patch("config.PAGE_CACHE_VERSIONS_FILE", ""):
+            assert isinstance(PageCache().versions, LocalVersions)
+
+
+class TestPageCacheMiddleware:
+    """Tests for PageCacheMiddleware"""
+
+    def test_repeat_get_served_from_cache(self, site):
+        """Test that a second anonymous GET is a cache hit"""
+        client = TestClient(site["app"])
+        first = client.get("/")
+        second = client.get("/")
+        assert first.headers["x-page-cache"] == "miss"
+        assert second.headers["x-page-cache"] == "hit"
+        assert second.text == first.text
+        assert site["renders"] == 1
+
+    def test_query_is_part_of_key(self, site):
+        """Test that different query strings are cached separately"""
+        client = TestClient(site["app"])
+        client.get("/forums/threads/1?page=1")
+        client.get("/forums/threads/1?page=2")
+        assert site["renders"] == 2
+
+    def test_alter_switch_changes_key(self, site):
+        """Test that a new fronting alter or state version renders afresh"""
+        client = TestClient(site["app"])
+        client.get("/")
+        site["alter"] = ("dexen", 2)
+        assert client.get("/").text == "home for dexen #2"
+
+    def test_write_bumps_namespace(self, site):
+        """Test that a successful forums write invalidates forum pages only"""
+        client = TestClient(site["app"])
+        client.get("/")
+        client.get("/forums/threads/1")
+        client.post("/forums/posts/")
+        assert client.get("/forums/threads/1").headers["x-page-cache"] == "miss"
+        assert client.get("/").headers["x-page-cache"] == "hit"
+
+    def test_write_invalidates_other_worker(self, site, tmp_path):
+        """Test that a write handled by one worker invalidates the pages another worker cached"""
+        other_state = {"renders": 0, "alter": ("seles", 1)}
+        other_cache = PageCache(ttl=5, max_bytes=1 << 20, max_entries=16, versions=SharedVersions(tmp_path / "versions.bin"))
+        other = TestClient(make_app(other_state, other_cache))
+        client = TestClient(site["app"])
+
+        other.get("/forums/threads/1")
+        assert other.get("/forums/threads/1").headers["x-page-cache"] == "hit"
+        client.post("/forums/posts/")
+        assert other.get("/forums/threads/1").headers["x-page-cache"] == "miss"
+
+    def test_failed_write_keeps_cache(self, site):
+        """Test that a rejected write does not invalidate anything"""
+        client = TestClient(site["app"])
+        client.get("/forums/threads/1")
+        client.post("/forums/fail")
+        assert site["cache"].version("forums") == 0
+        assert client.get("/forums/threads/1").headers["x-page-cache"] == "hit"
+
+    def test_requests_with_cookies_bypass(self, site):
+        """Test that requests carrying cookies are never served from the cache"""
+        client = TestClient(site["app"])
+        client.get("/")
+        response = client.get("/", headers={"Cookie": "session=abc"})
+        assert "x-page-cache" not in response.headers
+        assert site["renders"] == 2
+
+    def test_private_responses_not_cached(self, site):
+        """Test that responses marked private are not stored"""
+        client = TestClient(site["app"])
+        client.get("/forums/private")
+        client.get("/forums/private")
+        assert site["renders"] == 2
+
+    def test_other_paths_untouched(self, site):
+        """Test that paths outside the rules are not cached"""
+        client = TestClient(site["app"])
+        client.get("/admin")
+        assert "x-page-cache" not in client.get("/admin").headers
+        assert site["renders"] == 2
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self, site):
+        """Test that a burst of concurrent misses renders the page once"""
+        transport = httpx.ASGITransport(app=site["app"])
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.get("/forums/threads/7") for _ in range(20)))
+        assert site["renders"] == 1
+        assert {response.text for response in responses} == {"thread 7 #1"}
+        assert [response.headers["x-page-cache"] for response in responses].count("miss") == 1
@@ -0,0 +1,296 @@
+"""
+Unit tests for utils/ratelimit.py
+Tests for the memory-mapped rate limit storage shared by workers and the
+per-component token bucket middleware
+"""
+import os
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
+
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import MagicMock
+from utils.ratelimit import MmapStorage, RateLimitMiddleware, RateLimitPolicy, TokenBuckets, client_address, collect_policies
+
+FORUMS = {
+    "name": "forums",
+    "routes": ["/forums/*"],
+    "rate_limit": {"rate": 1, "burst": 10, "costs": {"GET /forums/threads/search": 5, "POST /forums/*": 3}},
+}
+RTC = {"name": "rtc", "routes": ["/rtc/*"], "rate_limit": {"rate": 1, "burst": 4, "costs": {"WEBSOCKET /rtc/*": 2}}}
+
+
+@pytest.fixture
+def uri(tmp_path):
+    """URI of a counter file in a temporary directory"""
+    return f"mmap://{tmp_path / 'limits' / 'ratelimits.bin'}"
+
+
+class TestMmapStorage:
+    """Tests for MmapStorage"""
+
+    def test_registered_scheme(self, uri):
+        """Test that mmap:// URIs resolve to MmapStorage"""
+        assert isinstance(storage_from_string(uri), MmapStorage)
+
+    def test_incr_and_get(self, uri):
+        """Test that increments accumulate within a window"""
+        storage = MmapStorage(uri)
+        assert storage.incr("a", 60) == 1
+        assert storage.incr("a", 60, amount=2) == 3
+        assert storage.get("a") == 3
+        assert storage.get("b") == 0
+
+    def test_window_expires(self, uri):
+        """Test that a counter starts over after its window ends"""
+        storage = MmapStorage(uri)
+        storage.incr("a", 0.05)
+        assert storage.get_expiry("a") > time.time()
+        time.sleep(0.06)
+        assert storage.get("a") == 0
+        assert storage.incr("a", 60) == 1
+
+    def test_clear_and_reset(self, uri):
+        """Test clearing one key and resetting every key"""
+        storage = MmapStorage(uri)
+        storage.incr("a", 60)
+        storage.incr("b", 60)
+        storage.clear("a")
+        assert storage.get("a") == 0
+        assert storage.reset() == 1
+        assert storage.get("b") == 0
+
+    def test_counts_shared_between_instances(self, uri):
+        """Test that two workers mapping the same file see each other's hits"""
+        first, second = MmapStorage(uri), MmapStorage(uri)
+        first.incr("a", 60)
+        second.incr("a", 60)
+        assert first.get("a") == 2
+
+    def test_existing_file_decides_size(self, uri):
+        """Test that a worker adopts the slot count of an existing file"""
+        MmapStorage(uri, slots=32).incr("a", 60)
+        storage = MmapStorage(uri)
+        assert storage.get("a") == 1
+        assert storage.slots == 32
+
+    def test_full_table_recycles_oldest_window(self, uri):
+        """Test that a crowded table reuses the slot whose window ends first"""
+        storage = MmapStorage(uri, slots=4)
+        for number in range(5):
+            storage.incr(f"key{number}", 60 + number)
+        assert storage.get("key4") == 1
+        assert storage.get("key0") == 0
+
+    def test_counts_shared_with_forked_worker(self, uri):
+        """Test that a forked worker reopens the file and increments the same counters"""
+        storage = MmapStorage(uri)
+        storage.incr("a", 60)
+        pid = os.fork()
+        if pid == 0:
+            storage.incr("a", 60)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert storage.get("a") == 2
+
+    def test_enforces_fixed_window_limit(self, uri):
+        """Test the storage behind the limiter slowapi uses"""
+        limiter = FixedWindowRateLimiter(MmapStorage(uri))
+        item = parse("3/minute")
+        assert [limiter.hit(item, "client") for _ in range(4)] == [True, True, True, False]
+        assert limiter.hit(item, "other") is True
+
+
+class TestRateLimitPolicy:
+    """Tests for RateLimitPolicy"""
+
+    def test_from_descriptor(self):
+        """Test reading a policy from a component descriptor"""
+        policy = RateLimitPolicy.from_descriptor(FORUMS)
+        assert policy.name == "forums"
+        assert policy.burst == 10
+        assert policy.costs[0] == ("GET", "/forums/threads/search", 5.0)
+
+    def test_descriptor_without_policy(self):
+        """Test that components without a rate_limit key are not limited"""
+        assert RateLimitPolicy.from_descriptor({"name": "admin", "routes": ["/admin/*"]}) is None
+        assert collect_policies([FORUMS, {"name": "admin"}, RTC]) == [
+            RateLimitPolicy.from_descriptor(FORUMS), RateLimitPolicy.from_descriptor(RTC)
+        ]
+
+    def test_cost_larger_than_burst_rejected(self):
+        """Test that a request that could never fit in the bucket is a configuration error"""
+        descriptor = {"name": "x", "routes": ["/x/*"], "rate_limit": {"rate": 1, "burst": 2, "costs": {"GET /x/*": 3}}}
+        with pytest.raises(ValueError):
+            RateLimitPolicy.from_descriptor(descriptor)
+
+    def test_costs(self):
+        """Test that the first matching cost applies and others cost 1"""
+        policy = RateLimitPolicy.from_descriptor(FORUMS)
+        assert policy.cost_for("GET", "/forums/threads/search") == 5
+        assert policy.cost_for("POST", "/forums/posts/") == 3
+        assert policy.cost_for("GET", "/forums/threads/1") == 1
+
+    def test_matches_mount_point(self):
+        """Test that a "/prefix/*" route also covers the bare prefix"""
+        policy = RateLimitPolicy.from_descriptor(FORUMS)
+        assert policy.matches("/forums")
+        assert policy.matches("/forums/threads/1")
+        assert not policy.matches("/static/forums/style.css")
+
+
+class TestTokenBuckets:
+    """Tests for TokenBuckets"""
+
+    def test_take_until_empty_then_refill(self):
+        """Test that a bucket empties and refills at its rate"""
+        now = [0.0]
+        buckets = TokenBuckets(max_buckets=10, clock=lambda: now[0])
+        assert buckets.take("a", 3, rate=1, burst=4) == 0
+        assert buckets.take("a", 3, rate=1, burst=4) == pytest.approx(2)
+        now[0] = 2.0
+        assert buckets.take("a", 3, rate=1, burst=4) == 0
+
+    def test_refill_capped_at_burst(self):
+        """Test that an idle bucket holds no more than its burst"""
+        now = [0.0]
+        buckets = TokenBuckets(max_buckets=10, clock=lambda: now[0])
+        buckets.take("a", 1, rate=1, burst=2)
+        now[0] = 100.0
+        buckets.take("a", 2, rate=1, burst=2)
+        assert buckets.take("a", 1, rate=1, burst=2) > 0
+
+    def test_bounded(self):
+        """Test that the least recently used buckets are dropped"""
+        buckets = TokenBuckets(max_buckets=2)
+        for key in "abc":
+            buckets.take(key, 1, rate=1, burst=5)
+        assert list(buckets.buckets) == ["b", "c"]
+
+
+class TestClientAddress:
+    """Tests for client_address"""
+
+    def scope(self, peer, forwarded=None):
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return {"client": (peer, 1234), "headers": headers}
+
+    def test_peer_address(self):
+        """Test that direct clients are keyed by their own address"""
+        assert client_address(self.scope("10.0.0.5"), trusted_proxies=[]) == "10.0.0.5"
+
+    def test_forwarded_ignored_from_untrusted_peer(self):
+        """Test that clients cannot pick their bucket with a forged header"""
+        assert client_address(self.scope("10.0.0.5", "1.2.3.4"), trusted_proxies=["127.0.0.1"]) == "10.0.0.5"
+
+    def test_forwarded_from_trusted_proxy(self):
+        """Test that the rightmost untrusted hop is the client"""
+        scope = self.scope("127.0.0.1", "6.6.6.6, 1.2.3.4, 10.0.0.1")
+        assert client_address(scope, trusted_proxies=["127.0.0.1", "10.0.0.1"]) == "1.2.3.4"
+
+    def test_trusted_proxy_without_header(self):
+        """Test that a proxy request without the header is keyed by the proxy"""
+        assert client_address(self.scope("127.0.0.1"), trusted_proxies=["127.0.0.1"]) == "127.0.0.1"
+
+
+class TestComponentPolicies:
+    """Tests for the policies the components declare"""
+
+    def test_busy_reader_never_limited(self):
+        """Test that a reader opening a thread page every 2 s, with both sockets per page, is never refused"""
+        from components.alter_comp import setup_alter
+        from components.rtc_comp import setup_rtc
+
+        rtc = RateLimitPolicy.from_descriptor(setup_rtc(MagicMock()))
+        alter = RateLimitPolicy.from_descriptor(setup_alter(MagicMock()))
+        now = [0.0]
+        buckets = TokenBuckets(max_buckets=10, clock=lambda: now[0])
+        for page in range(300):
+            now[0] = page * 2.0
+            for policy, path in ((rtc, "/rtc/ws/threads/1"), (alter, "/alter/live")):
+                cost = policy.cost_for("WEBSOCKET", path)
+                assert buckets.take(policy.name, cost, policy.rate, policy.burst) == 0
+
+    def test_reconnect_burst_allowed(self):
+        """Test that a dozen quick reconnects after a network drop fit in the burst"""
+        from components.rtc_comp import setup_rtc
+
+        rtc = RateLimitPolicy.from_descriptor(setup_rtc(MagicMock()))
+        buckets = TokenBuckets(max_buckets=10, clock=lambda: 0.0)
+        assert all(
+            buckets.take("rtc", rtc.cost_for("WEBSOCKET", "/rtc/ws/threads/1"), rtc.rate, rtc.burst) == 0
+            for _ in range(12)
+        )
+
+
+class TestRateLimitMiddleware:
+    """Tests for RateLimitMiddleware"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+
+        @app.get("/forums/threads/search")
+        def search():
+            return {"results": []}
+
+        @app.get("/forums/threads/{thread_id}")
+        def thread(thread_id: int):
+            return {"id": thread_id}
+
+        @app.get("/")
+        def home():
+            return {"home": True}
+
+        @app.websocket("/rtc/ws")
+        async def ws(websocket: WebSocket):
+            await websocket.accept()
+            await websocket.send_text("hi")
+            await websocket.close()
+
+        app.add_middleware(RateLimitMiddleware, policies=collect_policies([FORUMS, RTC]), buckets=TokenBuckets(max_buckets=100))
+        return TestClient(app)
+
+    def test_expensive_requests_exhaust_bucket_first(self, client):
+        """Test that two searches use up the burst that would allow ten page views"""
+        assert client.get("/forums/threads/search").status_code == 200
+        assert client.get("/forums/threads/search").status_code == 200
+        response = client.get("/forums/threads/search")
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+        assert response.json() == {"error": "Rate limit exceeded: forums"}
+
+    def test_page_views_cost_one(self, client):
+        """Test that cheap requests get the whole burst"""
+        statuses = [client.get("/forums/threads/1").status_code for _ in range(11)]
+        assert statuses == [200] * 10 + [429]
+
+    def test_unlimited_paths_pass(self, client):
+        """Test that paths outside every component are never limited"""
+        assert all(client.get("/").status_code == 200 for _ in range(20))
+
+    def test_clients_have_separate_buckets(self, client):
+        """Test that one client's scraping does not limit another client"""
+        for _ in range(2):
+            client.get("/forums/threads/search")
+        other = TestClient(client.app, client=("10.0.0.2", 1234))
+        assert other.get("/forums/threads/search").status_code == 200
+
+    def test_websocket_handshake_limited(self, client):
+        """Test that excess websocket connections are refused before being accepted"""
+        for _ in range(2):
+            with client.websocket_connect("/rtc/ws") as websocket:
+                assert websocket.receive_text() == "hi"
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            with client.websocket_connect("/rtc/ws"):
+                pass
+        assert excinfo.value.code == 1008
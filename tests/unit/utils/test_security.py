@@ -8,6 +8,8 @@ import sys
 from pathlib import Path
 import time
 import hashlib
+import asyncio
+import threading
 
 # Add codebase to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
@@ -17,8 +19,18 @@ from utils.security import (
     get_password_hash,
     generate_secret_key,
     create_access_token,
-    verify_access_token
+    verify_access_token,
+    verify_password_async,
+    get_password_hash_async,
+    PasswordHashBusy,
+    PasswordHashPool,
+    select_bcrypt_rounds,
+    tune_password_hashing,
+    verify_password_and_update,
+    InvalidToken,
+    TokenSigner
 )
+from passlib.context import CryptContext
 
 
 class TestPasswordHashing:
@@ -321,11 +333,106 @@ class TestVerifyAccessToken:
     
     def test_verify_access_token_none(self):
         """Test verifying None as token"""
-        # This is a simplified implementation, so it returns valid
-        # In a real implementation, this should be properly handled
         result = verify_access_token(None)
         
         assert result is not None
+        assert result.get("valid") is False
+    
+    def test_verify_access_token_returns_payload(self):
+        """Test that verification returns the token's claims"""
+        token = create_access_token({"user_id": "123"})
+        
+        result = verify_access_token(token)
+        assert result["payload"]["user_id"] == "123"
+        assert "exp" in result["payload"]
+    
+    def test_verify_access_token_rejects_invalid(self):
+        """Test that garbage and tampered tokens are reported invalid"""
+        token = create_access_token({"user_id": "123"})
+        key_id, body, signature = token.split(".")
+        forged = create_access_token({"user_id": "999"}).split(".")[1]
+        
+        for bad in ["", "not_a_valid_token_12345", "malformed.token.here", f"{key_id}.{forged}.{signature}"]:
+            assert verify_access_token(bad)["valid"] is False
+    
+    def test_verify_access_token_expired(self):
+        """Test that expired tokens are rejected"""
+        token = create_access_token({"user_id": "123"}, expires_delta=-1)
+        
+        result = verify_access_token(token)
+        assert result == {"valid": False, "error": "Token has expired"}
+
+
+# base64url alphabet, to build non-canonical spellings of a signature
+BASE64URL = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+class TestTokenSigner:
+    """Tests for HMAC token signing, key rotation and the verified-token cache"""
+    
+    def test_round_trip(self):
+        """Test that a signed payload verifies to the same claims"""
+        signer = TokenSigner("secret", [], cache_size=4)
+        token = signer.sign({"user_id": 1, "exp": time.time() + 60})
+        assert signer.verify(token)["user_id"] == 1
+    
+    def test_other_secret_rejected(self):
+        """Test that a token signed with another secret does not verify"""
+        token = TokenSigner("secret", [], cache_size=4).sign({"exp": time.time() + 60})
+        with pytest.raises(InvalidToken):
+            TokenSigner("other", [], cache_size=4).verify(token)
+    
+    def test_key_rotation(self):
+        """Test that tokens signed before a rotation verify until the old secret is dropped"""
+        token = TokenSigner("old", [], cache_size=4).sign({"exp": time.time() + 60})
+        rotated = TokenSigner("new", ["old"], cache_size=4)
+        
+        assert rotated.verify(token)["exp"] > time.time()
+        assert rotated.sign({}).split(".")[0] != token.split(".")[0]
+        with pytest.raises(InvalidToken):
+            TokenSigner("new", [], cache_size=4).verify(token)
+    
+    @pytest.mark.parametrize("mangle", [
+        lambda sig: sig + "=",
+        lambda sig: sig[:-1] + BASE64URL[BASE64URL.index(sig[-1]) + 1],
+        lambda sig: sig[:10] + "\n" + sig[10:],
+    ])
+    def test_non_canonical_signature_rejected(self, mangle):
+        """Test that other spellings of a valid signature do not verify"""
+        signer = TokenSigner("secret", [], cache_size=4)
+        token = signer.sign({"exp": time.time() + 60})
+        signing_input, signature = token.rsplit(".", 1)
+        with pytest.raises(InvalidToken):
+            signer.verify(f"{signing_input}.{mangle(signature)}")
+        assert signer.verify(token)
+    
+    def test_repeat_verification_cached(self):
+        """Test that a verified token is not checked cryptographically again"""
+        signer = TokenSigner("secret", [], cache_size=4)
+        token = signer.sign({"exp": time.time() + 60})
+        signer.verify(token)
+        
+        with patch("utils.security.hmac.new", side_effect=AssertionError("signature recomputed")):
+            signer.verify(token)
+    
+    def test_cached_token_still_expires(self):
+        """Test that a cached token is rejected once it expires"""
+        signer = TokenSigner("secret", [], cache_size=4)
+        token = signer.sign({"exp": time.time() + 60})
+        signer.verify(token)
+        
+        with patch("utils.security.time.time", return_value=time.time() + 120):
+            with pytest.raises(InvalidToken):
+                signer.verify(token)
+        assert token not in signer._cache
+    
+    def test_cache_bounded(self):
+        """Test that the verified-token cache keeps only the most recent tokens"""
+        signer = TokenSigner("secret", [], cache_size=2)
+        tokens = [signer.sign({"n": n, "exp": time.time() + 60}) for n in range(3)]
+        for token in tokens:
+            signer.verify(token)
+        assert list(signer._cache) == tokens[1:]
 
 
 class TestSecurityIntegration:
@@ -382,4 +489,108 @@ class TestSecurityIntegration:
         # Generate multiple tokens - they should all be unique due to secret keys
         tokens = [create_access_token(data) for _ in range(5)]
         
-        assert len(tokens) == len(set(tokens))  # All unique
\ No newline at end of file
+        assert len(tokens) == len(set(tokens))  # All unique
+
+
+class TestAdaptiveCost:
+    """Tests for benchmark-driven bcrypt cost and rehash on verify"""
+    
+    def test_select_rounds_meets_target(self):
+        """Test that the highest cost within the target is chosen"""
+        # 10 ms at cost 8 means 80 ms at cost 11 and 160 ms at cost 12
+        assert select_bcrypt_rounds(100, min_rounds=4, max_rounds=31, measure=lambda rounds: 10.0) == 11
+    
+    def test_select_rounds_clamped(self):
+        """Test that slow and fast hosts stay within the configured bounds"""
+        assert select_bcrypt_rounds(100, min_rounds=10, max_rounds=14, measure=lambda rounds: 200.0) == 10
+        assert select_bcrypt_rounds(100, min_rounds=10, max_rounds=14, measure=lambda rounds: 0.01) == 14
+    
+    def test_tune_sets_context_cost(self):
+        """Test that tuning changes the cost new hashes are made at"""
+        context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        with patch("utils.security.pwd_context", context), patch("utils.security._tuned_rounds", None):
+            assert tune_password_hashing(12) == 12
+        assert context.to_dict()["bcrypt__default_rounds"] == 12
+    
+    def test_outdated_hash_rehashed_on_verify(self):
+        """Test that a correct password with an old-cost hash gets a replacement hash"""
+        context = CryptContext(schemes=["sha256_crypt"], sha256_crypt__default_rounds=1000)
+        old_hash = context.hash("secret")
+        context.update(sha256_crypt__default_rounds=2000, sha256_crypt__min_rounds=2000, sha256_crypt__max_rounds=2000)
+        
+        with patch("utils.security.pwd_context", context), patch("utils.security._tuned_rounds", 2000):
+            valid, new_hash = verify_password_and_update("secret", old_hash)
+            assert valid is True
+            assert context.verify("secret", new_hash)
+            assert not context.needs_update(new_hash)
+            assert verify_password_and_update("secret", new_hash) == (True, None)
+            assert verify_password_and_update("wrong", old_hash) == (False, None)
+
+
+class TestPasswordHashPool:
+    """Tests for the bounded password hash pool and async helpers"""
+    
+    @pytest.mark.asyncio
+    async def test_async_helpers_run_off_loop(self):
+        """Test that the async helpers run the sync functions on pool threads"""
+        threads = []
+        
+        def fake_hash(password):
+            threads.append(threading.current_thread().name)
+            return "hashed:" + password
+        
+        pool = PasswordHashPool(workers=1, queue_depth=1)
+        with patch("utils.security.password_hash_pool", pool), \
+                patch("utils.security.get_password_hash", fake_hash), \
+                patch("utils.security.verify_password", lambda plain, hashed: hashed == "hashed:" + plain):
+            hashed = await get_password_hash_async("secret")
+            assert await verify_password_async("secret", hashed) is True
+            assert await verify_password_async("wrong", hashed) is False
+        pool.shutdown()
+        
+        assert threads[0].startswith("password-hash")
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_sheds_load(self):
+        """Test that requests beyond workers plus queue depth are refused immediately"""
+        release = threading.Event()
+        pool = PasswordHashPool(workers=1, queue_depth=1)
+        
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHashBusy):
+            await pool.run(release.wait)
+        
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert pool.pending == 0
+        pool.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_keeps_slot_until_done(self):
+        """Test that a cancelled wait frees its slot only when the hash finishes"""
+        release = threading.Event()
+        pool = PasswordHashPool(workers=1, queue_depth=0)
+        
+        task = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.sleep(0)
+        assert pool.pending == 1
+        
+        release.set()
+        await asyncio.sleep(0.05)
+        assert pool.pending == 0
+        pool.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_errors_propagate(self):
+        """Test that a failing hash raises in the caller and frees its slot"""
+        def broken():
+            raise ValueError("bad hash")
+        
+        pool = PasswordHashPool(workers=1, queue_depth=0)
+        with pytest.raises(ValueError):
+            await pool.run(broken)
+        assert pool.pending == 0
+        pool.shutdown()
@@ -0,0 +1,117 @@
+"""
+Unit tests for utils/templating.py
+Tests for the shared Jinja2 template registry
+"""
+import pytest
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add codebase to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent / "codebase"))
+
+from utils.templating import TemplateRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registry rooted in a temporary directory with a global base template"""
+    global_dir = tmp_path / "templates"
+    global_dir.mkdir()
+    (global_dir / "base.html").write_text("<main>{% block content %}{% endblock %}</main>")
+    return TemplateRegistry(global_dir=str(global_dir), cache_dir=str(tmp_path / "cache"))
+
+
+class TestTemplateRegistry:
+    """Tests for TemplateRegistry"""
+
+    def test_register_creates_directory(self, registry, tmp_path):
+        """Test that registering a missing directory creates it"""
+        module_dir = tmp_path / "modules" / "forums" / "templates"
+        registry.register(str(module_dir))
+        assert module_dir.is_dir()
+
+    def test_search_path_puts_global_last(self, registry, tmp_path):
+        """Test that module directories are searched before the global one"""
+        forums = str(tmp_path / "forums")
+        admin = str(tmp_path / "admin")
+        registry.register(forums)
+        registry.register(admin)
+        assert registry.search_path == [forums, admin, registry.global_dir]
+
+    def test_register_is_idempotent(self, registry, tmp_path):
+        """Test that registering a directory twice keeps one entry"""
+        forums = str(tmp_path / "forums")
+        registry.register(forums)
+        registry.register(forums)
+        assert registry.module_dirs == [forums]
+
+    def test_register_returns_shared_instance(self, registry, tmp_path):
+        """Test that every module gets the same templates instance"""
+        first = registry.register(str(tmp_path / "forums"))
+        second = registry.register(str(tmp_path / "admin"))
+        assert first is second
+
+    def test_late_registration_updates_loader(self, registry, tmp_path):
+        """Test that directories registered after first use are searchable"""
+        templates = registry.templates
+        module_dir = tmp_path / "rtc"
+        module_dir.mkdir()
+        (module_dir / "page.html").write_text("{% extends 'base.html' %}{% block content %}rtc{% endblock %}")
+        registry.register(str(module_dir))
+        assert templates.get_template("page.html").render() == "<main>rtc</main>"
+
+    def test_bytecode_cache_persists_compiled_templates(self, registry, tmp_path):
+        """Test that rendering writes compiled templates to the cache directory"""
+        registry.templates.get_template("base.html").render()
+        assert any((tmp_path / "cache").iterdir())
+
+    def test_create_templates_shares_bytecode_cache(self, registry, tmp_path):
+        """Test that extra environments reuse the registry's bytecode cache"""
+        templates = registry.create_templates([registry.global_dir])
+        assert templates.env.bytecode_cache is registry.bytecode_cache
+        assert templates.env.bytecode_cache is registry.templates.env.bytecode_cache
+
+
+class TestAlterContext:
+    """Tests for the fronting state every page is rendered with"""
+
+    @pytest.fixture
+    def templates(self, registry, tmp_path):
+        """Shared templates with a page printing the fronting state"""
+        page_dir = tmp_path / "pages"
+        page_dir.mkdir()
+        (page_dir / "page.html").write_text(
+            "{{ current_alter }}|{% for name, fronting in alters_status|dictsort %}{{ name }}={{ fronting }},{% endfor %}"
+            "|{{ alter_version }}|{{ extra }}"
+        )
+        return registry.register(str(page_dir))
+
+    @staticmethod
+    def request():
+        from starlette.requests import Request
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+    @staticmethod
+    def snapshot(current_alter, version):
+        from modules.alter.engine import EngineSnapshot
+        return EngineSnapshot(version, current_alter, {current_alter: True, "dexen": False}, None)
+
+    def test_module_pages_get_current_state(self, templates):
+        """Test that pages rendered outside the alter engine still get the fronting state"""
+        engine = MagicMock()
+        engine.snapshot.return_value = self.snapshot("seles", 4)
+        with patch("modules.alter.engine.get_template_engine", return_value=engine):
+            response = templates.TemplateResponse(self.request(), "page.html", {"extra": "x"})
+
+        assert response.body.decode() == "seles|dexen=False,seles=True,|4|x"
+
+    def test_engine_snapshot_reused(self, templates):
+        """Test that a page rendered by the alter engine keeps the snapshot it was rendered with"""
+        request = self.request()
+        request.state.alter_snapshot = self.snapshot("yuki", 7)
+        with patch("modules.alter.engine.get_template_engine", side_effect=AssertionError("took a new snapshot")):
+            response = templates.TemplateResponse(request, "page.html")
+
+        assert response.body.decode().startswith("yuki|")
+        assert response.body.decode().endswith("|7|")